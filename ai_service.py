@@ -1,17 +1,37 @@
-import streamlit as st
-import google.generativeai as genai
 from PIL import Image
-import json
 import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
 
-# --- Configuration ---
 try:
-    # Use Streamlit's secrets management for the API key
-    GEMINI_API_KEY = st.secrets["gemini"]["api_key"]
-    genai.configure(api_key=GEMINI_API_KEY)
-except (KeyError, FileNotFoundError):
-    st.error("🚨 Gemini API Key not found. Please add it to your `.streamlit/secrets.toml` file.")
-    st.stop()
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+import analysis_cache
+import analysis_parser
+import image_store
+import metrics
+from analysis_parser import AnalysisParseError
+
+# --- Configuration ---
+# Nothing is read or configured at import time: the Gemini client is created
+# on first use (`get_client`), so importing this module stays cheap for the
+# API, queue workers and scripts. The key comes from the GEMINI_API_KEY
+# environment variable, else from Streamlit's secrets.toml ([gemini] api_key).
+# ECOCYCLE_AI_BACKEND=fake swaps Gemini for the local FakeBackend in every
+# process (API, queue workers, Streamlit), e.g. for load tests.
+AI_BACKEND = os.environ.get("ECOCYCLE_AI_BACKEND", "gemini")
+DEFAULT_MODEL_NAME = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+SECRETS_FILES = (
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+)
 
 
 # --- System Prompt ---
@@ -53,12 +73,263 @@ You are an expert in Organic Waste Upcycling, Animal Feed, and Composting. Your
 }
 """
 
+# Sent (text only, no image) when a reply could not be parsed
+REPAIR_PROMPT = """
+The following reply was supposed to be a single JSON object with the keys
+is_organic_waste, rejection_reason, main_composition, estimated_weight_kg,
+suitability_tags, safety_warning and handling_tip, but it is not valid JSON.
+Return ONLY the corrected JSON object, keeping the original values.
+
+Reply:
+"""
+
 # --- AI Model ---
-MODEL = genai.GenerativeModel('gemini-2.5-flash')
+# Structured output: the model must answer with JSON matching the schema, so
+# replies parse on the first try instead of needing fence stripping.
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": analysis_parser.RESPONSE_SCHEMA,
+}
+
+MODEL_CALL_SECONDS = metrics.Histogram("ecocycle_model_call_seconds", "Latency of model backend calls.", ("model",))
+MODEL_CALL_ERRORS = metrics.Counter("ecocycle_model_call_errors_total", "Failed model backend calls.", ("model", "error"))
+MODEL_TOKENS = metrics.Counter("ecocycle_model_tokens_total", "Tokens billed by Gemini.", ("model", "kind"))
+ANALYSIS_PARSE_FAILURES = metrics.Counter(
+    "ecocycle_analysis_parse_failures_total", "Model replies that could not be parsed, by attempt.", ("attempt",)
+)
+ANALYSIS_STAGE_SECONDS = metrics.Histogram("ecocycle_analysis_stage_seconds", "Time per analyze_image stage.", ("stage",))
+
+class AIConfigError(RuntimeError):
+    """No Gemini API key is configured."""
+
+def load_api_key() -> str:
+    """Returns the Gemini API key from the environment, secrets.toml or `st.secrets`. Raises AIConfigError if there is none."""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if api_key:
+        return api_key
+    for path in SECRETS_FILES:
+        if tomllib and os.path.exists(path):
+            with open(path, "rb") as f:
+                api_key = tomllib.load(f).get("gemini", {}).get("api_key")
+            if api_key:
+                return api_key
+    if "streamlit" in sys.modules:
+        # Streamlit secrets can come from other locations than SECRETS_FILES
+        try:
+            return sys.modules["streamlit"].secrets["gemini"]["api_key"]
+        except (KeyError, FileNotFoundError):
+            pass
+    raise AIConfigError(
+        "Gemini API Key not found. Set GEMINI_API_KEY or add [gemini] api_key to `.streamlit/secrets.toml`."
+    )
+
+class AIClient:
+    """
+    The Gemini model backend. The SDK is imported here, not at module import.
+
+    A model backend is any object with `generate(prompt_parts) -> str`; see
+    FakeBackend for the local stand-in and `set_backend` to install one.
+    """
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL_NAME):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name, generation_config=GENERATION_CONFIG)
+
+    def generate(self, prompt_parts: list) -> str:
+        """Sends prompt parts (text, PIL Images, inline image parts) and returns the reply text."""
+        response = self._model.generate_content(prompt_parts)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            MODEL_TOKENS.inc(usage.prompt_token_count or 0, model=self.model_name, kind="prompt")
+            MODEL_TOKENS.inc(usage.candidates_token_count or 0, model=self.model_name, kind="output")
+        return response.text
+
+# Replies of FakeBackend: valid analyses in the structured output format
+FAKE_REPLIES = tuple(json.dumps(reply, ensure_ascii=False) for reply in (
+    {
+        "is_organic_waste": True, "rejection_reason": None, "main_composition": "Nasi, Sayuran, Tulang Ayam",
+        "estimated_weight_kg": 1.5, "suitability_tags": ["Maggot BSF", "Pupuk Kompos"],
+        "safety_warning": "Aman", "handling_tip": "Pisahkan tulang sebelum diberikan ke maggot.",
+    },
+    {
+        "is_organic_waste": True, "rejection_reason": None, "main_composition": "Kulit Pisang, Sayur Layu",
+        "estimated_weight_kg": 3.2, "suitability_tags": ["Pupuk Kompos", "Biogas", "Maggot BSF"],
+        "safety_warning": "Aman", "handling_tip": "Cacah kecil agar cepat terurai.",
+    },
+    {
+        "is_organic_waste": True, "rejection_reason": None, "main_composition": "Ampas Tahu, Dedak",
+        "estimated_weight_kg": 5.0, "suitability_tags": ["Ayam/Unggas", "Ikan Lele"],
+        "safety_warning": "Berikan segera sebelum basi.", "handling_tip": "Simpan di wadah tertutup.",
+    },
+))
+
+class FakeBackendError(RuntimeError):
+    """A failure injected by FakeBackend; `code` 429 makes it a retryable rate limit."""
+
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+class FakeBackend:
+    """
+    Local stand-in for Gemini that costs no quota: sleeps `latency_s` (plus up
+    to `latency_jitter_s`), fails a fraction `error_rate` of calls and otherwise
+    returns one of `replies`. The reply is chosen by the image bytes, so a photo
+    always gets the same analysis; latency and failures come from a seeded RNG.
+    """
+
+    def __init__(self, latency_s: float = 0.0, latency_jitter_s: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_errors: bool = True, replies: tuple = FAKE_REPLIES, seed: int = 0):
+        self.model_name = "fake"
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.error_rate = error_rate
+        self.rate_limit_errors = rate_limit_errors
+        self.replies = replies
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        """Configured by ECOCYCLE_FAKE_LATENCY_MS, ECOCYCLE_FAKE_JITTER_MS and ECOCYCLE_FAKE_ERROR_RATE."""
+        return cls(
+            latency_s=float(os.environ.get("ECOCYCLE_FAKE_LATENCY_MS", 0)) / 1000,
+            latency_jitter_s=float(os.environ.get("ECOCYCLE_FAKE_JITTER_MS", 0)) / 1000,
+            error_rate=float(os.environ.get("ECOCYCLE_FAKE_ERROR_RATE", 0)),
+        )
+
+    def generate(self, prompt_parts: list) -> str:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_s + self._rng.uniform(0, self.latency_jitter_s)
+            failed = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            raise FakeBackendError("Injected fake backend failure", code=429 if self.rate_limit_errors else 500)
+        key = 0
+        for part in prompt_parts:
+            if isinstance(part, dict):
+                key = zlib.crc32(part["data"], key)
+            elif isinstance(part, Image.Image):
+                key = zlib.crc32(part.tobytes(), key)
+        return self.replies[key % len(self.replies)]
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared model backend, creating it (per AI_BACKEND) on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FakeBackend.from_env() if AI_BACKEND == "fake" else AIClient(load_api_key())
+    return _client
+
+def configure(api_key: str = None, model_name: str = DEFAULT_MODEL_NAME):
+    """Replaces the shared client, e.g. to use another key or model."""
+    set_backend(AIClient(api_key or load_api_key(), model_name))
+
+def set_backend(backend):
+    """Installs a model backend (anything with `generate(prompt_parts) -> str`) for every later analysis."""
+    global _client
+    with _client_lock:
+        _client = backend
+
+# Extra model calls after an unparseable reply: first a cheap text-only repair
+# of the reply, then a full re-analysis of the image.
+MAX_PARSE_RETRIES = 2
+# If set, every raw model reply is appended here (JSON lines), e.g. to grow
+# the parser regression corpus in benchmarks/data/.
+RESPONSE_LOG_FILE = os.environ.get("ECOCYCLE_RESPONSE_LOG")
+
+# Photos are downscaled and re-encoded before upload: phone cameras produce
+# 12MP+ images, while the model needs far fewer pixels to recognise food waste.
+MODEL_IMAGE_MAX_EDGE = 1024
+MODEL_IMAGE_FORMAT = 'JPEG'  # or 'WEBP'
+MODEL_IMAGE_QUALITY = 85
+
+def preprocess_image(image: Image.Image) -> dict:
+    """
+    Prepares a photo for the model: applies its EXIF orientation, resizes it to
+    `MODEL_IMAGE_MAX_EDGE` and re-encodes it as `MODEL_IMAGE_FORMAT`.
+
+    Returns:
+        An inline image part (`mime_type` + `data`) for `generate_content`.
+    """
+    data = image_store.encode_image(
+        image, max_edge=MODEL_IMAGE_MAX_EDGE, quality=MODEL_IMAGE_QUALITY, image_format=MODEL_IMAGE_FORMAT
+    )
+    return {"mime_type": f"image/{MODEL_IMAGE_FORMAT.lower()}", "data": data}
+
+def _generate(prompt_parts: list) -> str:
+    client = get_client()
+    start = time.perf_counter()
+    try:
+        raw_text = client.generate(prompt_parts)
+    except Exception as e:
+        MODEL_CALL_ERRORS.inc(model=client.model_name, error=type(e).__name__)
+        raise
+    finally:
+        MODEL_CALL_SECONDS.observe(time.perf_counter() - start, model=client.model_name)
+    if RESPONSE_LOG_FILE:
+        with open(RESPONSE_LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"raw": raw_text}) + "\n")
+    return raw_text
+
+def _generate_analysis(image_part) -> dict:
+    """
+    Sends the prompt and an image (PIL Image or inline part) to the model and
+    parses its JSON reply, retrying up to MAX_PARSE_RETRIES times if it cannot
+    be parsed. Raises AnalysisParseError when every attempt fails.
+    """
+    # For Gemini Pro Vision, the prompt and image are sent together
+    raw_text = _generate([SYSTEM_PROMPT, image_part])
+    for attempt in range(MAX_PARSE_RETRIES + 1):
+        try:
+            return analysis_parser.parse_analysis(raw_text)
+        except AnalysisParseError:
+            ANALYSIS_PARSE_FAILURES.inc(attempt=("first", "repair", "reanalysis")[min(attempt, 2)])
+            if attempt == MAX_PARSE_RETRIES:
+                raise
+            if attempt == 0:
+                raw_text = _generate([REPAIR_PROMPT + raw_text])
+            else:
+                raw_text = _generate([SYSTEM_PROMPT, image_part])
+
+def analyze_image(image: Image.Image) -> dict:
+    """
+    Preprocesses an image and returns the model's analysis, served from
+    `analysis_cache` for the same or a near-identical photo. Raises on API
+    and AnalysisParseError; UI-free, so it can run on worker threads.
+    """
+    with ANALYSIS_STAGE_SECONDS.time(stage="preprocess"):
+        image_part = preprocess_image(image)
+    with ANALYSIS_STAGE_SECONDS.time(stage="phash"), Image.open(io.BytesIO(image_part["data"])) as model_image:
+        phash = analysis_cache.perceptual_hash(model_image)
+    with ANALYSIS_STAGE_SECONDS.time(stage="cache_get"):
+        cached = analysis_cache.get(phash)
+    if cached is not None:
+        return cached
+    with ANALYSIS_STAGE_SECONDS.time(stage="model"):
+        analysis_result = _generate_analysis(image_part)
+    with ANALYSIS_STAGE_SECONDS.time(stage="cache_put"):
+        analysis_cache.put(phash, analysis_result)
+    return analysis_result
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for quota/rate-limit responses (HTTP 429, `ResourceExhausted`) that are worth retrying later."""
+    return getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted"
 
 def analyze_waste_multipurpose(image: Image.Image) -> dict:
     """
     Analyzes a waste image using the Gemini Pro Vision model.
+    Results are cached by perceptual hash (`analysis_cache`), so re-analysing
+    the same or a near-identical photo skips the API call.
 
     Args:
         image: A PIL Image object of the waste.
@@ -67,33 +338,16 @@ def analyze_waste_multipurpose(image: Image.Image) -> dict:
         A dictionary containing the structured analysis from the AI,
         or an error dictionary if the analysis fails.
     """
-    st.write("🤖 Menganalisis gambar sampah...")
     try:
-        # For Gemini Pro Vision, the prompt and image are sent together
-        prompt_parts = [SYSTEM_PROMPT, image]
-        response = MODEL.generate_content(prompt_parts)
-
-        # Clean up the response to get a clean JSON string
-        raw_text = response.text
-        clean_json_str = raw_text.strip().replace('```json', '').replace('```', '').strip()
-        
-        # Parse the JSON string into a Python dictionary
-        analysis_result = json.loads(clean_json_str)
-        
-        st.write("✅ Analisis AI selesai.")
-        return analysis_result
-
-    except json.JSONDecodeError:
-        st.error("🚨 Gagal memproses respons dari AI. Format JSON tidak valid.")
-        st.write("Raw response from AI:", response.text)
-        return {"error": "JSON Decode Error", "raw_text": response.text}
+        return analyze_image(image)
+    except AnalysisParseError as e:
+        print(f"Could not parse AI response: {e}")
+        return {"error": "JSON Decode Error", "raw_text": e.raw_text}
     except Exception as e:
-        st.error(f"🚨 Terjadi kesalahan saat menghubungi AI: {e}")
+        print(f"AI analysis failed: {e}")
         return {"error": str(e)}
 
 def image_to_blob(image: Image.Image) -> bytes:
-    """Converts a PIL Image to a bytes blob."""
-    with io.BytesIO() as output:
-        image.save(output, format="PNG")
-        contents = output.getvalue()
-    return contents
+    """Converts a PIL Image to a compressed JPEG bytes blob, ready for `image_store.put`."""
+    _, quality = image_store.VARIANTS['original']
+    return image_store.encode_image(image, quality=quality)
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+CACHE_FILE = "analysis_cache.db"
+
+# Maximum Hamming distance (out of 64 bits) between two perceptual hashes for
+# the images to count as the same photo. Re-encodes and small crops or
+# lighting changes stay within a few bits; different scenes are usually 20+.
+MAX_HAMMING_DISTANCE = 6
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 5000
+
+_HASH_SIZE = 8
+_lock = threading.Lock()
+_conn = None
+_conn_file = None
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-bit difference hash (dHash): the image is reduced to a 9x8 grayscale
+    thumbnail and each bit records whether a pixel is brighter than its right
+    neighbour. Robust to resizing, recompression and small colour shifts.
+    """
+    small = image.convert('L').resize((_HASH_SIZE + 1, _HASH_SIZE), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def _connection():
+    global _conn, _conn_file
+    if _conn is None or _conn_file != CACHE_FILE:
+        if _conn is not None:
+            _conn.close()
+        _conn = sqlite3.connect(CACHE_FILE, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode = WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                phash TEXT PRIMARY KEY,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache (last_used_at)")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        _conn.commit()
+        _conn_file = CACHE_FILE
+    return _conn
+
+
+def _count(conn, name: str):
+    conn.execute(
+        "INSERT INTO analysis_cache_stats (name, value) VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+
+
+def get(phash: int, max_distance: int = MAX_HAMMING_DISTANCE):
+    """
+    Returns the cached analysis of the closest stored image within
+    `max_distance` bits of `phash`, or None. Records a hit or a miss.
+    """
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        best = None
+        for stored_hash, result_json in conn.execute(
+            "SELECT phash, result_json FROM analysis_cache WHERE created_at > ?", (now - CACHE_TTL_SECONDS,)
+        ):
+            distance = hamming_distance(phash, int(stored_hash, 16))
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, stored_hash, result_json)
+        if best is None:
+            _count(conn, 'misses')
+            conn.commit()
+            return None
+        conn.execute("UPDATE analysis_cache SET last_used_at = ? WHERE phash = ?", (now, best[1]))
+        _count(conn, 'hits')
+        conn.commit()
+        return json.loads(best[2])
+
+
+def put(phash: int, result: dict):
+    """Stores an analysis result, then evicts expired and least recently used entries."""
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            """
+            INSERT INTO analysis_cache (phash, result_json, created_at, last_used_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (phash) DO UPDATE SET
+                result_json = excluded.result_json,
+                created_at = excluded.created_at,
+                last_used_at = excluded.last_used_at
+            """,
+            (f"{phash:016x}", json.dumps(result), now, now),
+        )
+        conn.execute("DELETE FROM analysis_cache WHERE created_at <= ?", (now - CACHE_TTL_SECONDS,))
+        conn.execute(
+            """
+            DELETE FROM analysis_cache WHERE phash IN (
+                SELECT phash FROM analysis_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (CACHE_MAX_ENTRIES,),
+        )
+        conn.commit()
+
+
+def stats() -> dict:
+    """Hit/miss counters (shared by every process using the cache file) and the current hit rate."""
+    with _lock:
+        conn = _connection()
+        counters = dict(conn.execute("SELECT name, value FROM analysis_cache_stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+    hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        'entries': entries,
+    }
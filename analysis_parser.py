@@ -0,0 +1,141 @@
+import json
+import re
+
+import db
+
+# Gemini response schema (OpenAPI subset) mirroring the JSON structure in
+# `ai_service.SYSTEM_PROMPT`. Used with response_mime_type="application/json",
+# the model is constrained to emit exactly this object.
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "is_organic_waste": {"type": "BOOLEAN"},
+        "rejection_reason": {"type": "STRING", "nullable": True},
+        "main_composition": {"type": "STRING"},
+        "estimated_weight_kg": {"type": "NUMBER"},
+        "suitability_tags": {
+            "type": "ARRAY",
+            "items": {"type": "STRING", "enum": [tag.value for tag in db.SuitabilityTag]},
+        },
+        "safety_warning": {"type": "STRING"},
+        "handling_tip": {"type": "STRING"},
+    },
+    "required": [
+        "is_organic_waste", "main_composition", "estimated_weight_kg",
+        "suitability_tags", "safety_warning", "handling_tip",
+    ],
+}
+
+DEFAULTS = {
+    "rejection_reason": None,
+    "main_composition": "N/A",
+    "estimated_weight_kg": 0.0,
+    "suitability_tags": [],
+    "safety_warning": "N/A",
+    "handling_tip": "N/A",
+}
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_PY_LITERAL_RE = re.compile(r"(?<![\w\"])(True|False|None)(?![\w\"])")
+_NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+_KNOWN_TAGS = {tag.value.lower(): tag.value for tag in db.SuitabilityTag}
+
+
+class AnalysisParseError(ValueError):
+    """The model reply contained no usable analysis object. `raw_text` holds the reply."""
+
+    def __init__(self, message: str, raw_text: str):
+        super().__init__(message)
+        self.raw_text = raw_text
+
+
+def _candidates(text: str):
+    """Yields JSON-looking snippets, most likely first."""
+    yield text
+    for match in _FENCE_RE.finditer(text):
+        yield match.group(1).strip()
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        yield text[start:end + 1]
+
+
+def _repair(snippet: str) -> str:
+    """Fixes the syntax slips models make most: trailing commas, Python literals, curly quotes."""
+    snippet = snippet.replace("“", '"').replace("”", '"')
+    snippet = _PY_LITERAL_RE.sub(lambda m: _PY_LITERALS[m.group(1)], snippet)
+    return _TRAILING_COMMA_RE.sub(r"\1", snippet)
+
+
+def _decode_object(text: str):
+    decoder = json.JSONDecoder()
+    for snippet in _candidates(text):
+        for attempt in (snippet, _repair(snippet)):
+            try:
+                value = json.loads(attempt)
+            except json.JSONDecodeError:
+                # Prose after the object: decode the first complete object only
+                start = attempt.find("{")
+                if start == -1:
+                    continue
+                try:
+                    value, _ = decoder.raw_decode(attempt, start)
+                except json.JSONDecodeError:
+                    continue
+            if isinstance(value, dict):
+                return value
+    return None
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "ya", "yes", "1")
+    return bool(value)
+
+
+def _as_weight(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER_RE.search(str(value or ""))
+    return float(match.group(0).replace(",", ".")) if match else 0.0
+
+
+def _as_tags(value) -> list:
+    if isinstance(value, str):
+        value = value.split(",")
+    tags = []
+    for tag in value or []:
+        known = _KNOWN_TAGS.get(str(tag).strip().lower())
+        if known and known not in tags:
+            tags.append(known)
+    return tags
+
+
+def normalize_analysis(analysis: dict) -> dict:
+    """Fills missing optional fields and coerces types to what the app expects."""
+    if "is_organic_waste" not in analysis:
+        raise ValueError("Missing is_organic_waste")
+    result = {**DEFAULTS, **analysis}
+    result["is_organic_waste"] = _as_bool(result["is_organic_waste"])
+    result["estimated_weight_kg"] = _as_weight(result["estimated_weight_kg"])
+    result["suitability_tags"] = _as_tags(result["suitability_tags"])
+    return result
+
+
+def parse_analysis(raw_text: str) -> dict:
+    """
+    Extracts the analysis object from a model reply. Accepts plain JSON (the
+    structured-output case, parsed on the fast path), code fences, surrounding
+    prose and common syntax slips, then normalizes field types.
+    Raises AnalysisParseError if no usable object is found.
+    """
+    text = (raw_text or "").strip()
+    analysis = _decode_object(text)
+    if analysis is None:
+        raise AnalysisParseError("No JSON object found in model response", raw_text)
+    try:
+        return normalize_analysis(analysis)
+    except ValueError as e:
+        raise AnalysisParseError(str(e), raw_text)
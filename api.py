@@ -1,9 +1,65 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import json
+from fastapi.middleware.gzip import GZipMiddleware
+import asyncio
+import io
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from PIL import Image, UnidentifiedImageError
+import analysis_cache
+import batch_ingest
 import db # Assuming db.py is in the same directory
+import geo
+import image_store
+import job_queue
+import live_updates
+import metrics
+import post_index
+import wire_format
 
-app = FastAPI()
+HTTP_REQUEST_SECONDS = metrics.Histogram(
+    "ecocycle_http_request_seconds", "Time to the response start per route.", ("method", "route", "status")
+)
+SERIALIZATION_SECONDS = metrics.Histogram("ecocycle_serialization_seconds", "Response body encoding time.", ("format",))
+COMPRESSION_SECONDS = metrics.Histogram("ecocycle_compression_seconds", "Response body compression time.", ("encoding",))
+IMAGE_BYTES_SERVED = metrics.Counter("ecocycle_image_bytes_served_total", "Image bytes sent, by storage.", ("source",))
+RESPONSE_CACHE_REQUESTS = metrics.Counter(
+    "ecocycle_response_cache_requests_total", "Versioned GETs by outcome (hit, miss, not_modified).", ("result",)
+)
+
+# Pub/sub feeding /waste_posts/stream
+post_broker = live_updates.PostBroker()
+
+# How often the lifecycle sweep (expiry + archival, see db.sweep_posts) runs
+SWEEP_INTERVAL_SECONDS = 300
+
+async def _sweep_periodically():
+    while True:
+        try:
+            result = await db.run_async(db.sweep_posts)
+            if any(result.values()):
+                print(f"Post lifecycle sweep: {result}")
+        except Exception as e:
+            print(f"Post lifecycle sweep failed: {e}")
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if post_index.ENABLED:
+        await db.run_async(post_index.build)
+    await post_broker.start()
+    sweeper = asyncio.create_task(_sweep_periodically())
+    yield
+    sweeper.cancel()
+    await post_broker.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS to allow requests from your React frontend
 # Adjust origins if your React app runs on a different port or domain
@@ -19,41 +75,554 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
+# Compresses every other response; post listings are compressed (with brotli
+# when accepted) on the db thread pool and pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=wire_format.COMPRESS_MIN_BYTES, compresslevel=wire_format.GZIP_LEVEL)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Times every request per route; with ECOCYCLE_PROFILE_SLOW_MS set, dumps profiles of slow ones."""
+    start = time.perf_counter()
+    with metrics.profile_request() as request_profile:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route_path, status=response.status_code)
+    if request_profile is not None and elapsed * 1000 >= metrics.PROFILE_SLOW_MS:
+        path = await asyncio.to_thread(request_profile.dump, f"{request.method} {route_path}", elapsed * 1000)
+        print(f"Slow request {request.method} {request.url.path}: {elapsed * 1000:.0f} ms, profile {path}")
+    return response
 
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to EcoCycle ID API"}
 
+def _parse_bbox(bbox: str):
+    """Parses a `min_lon,min_lat,max_lon,max_lat` query value (Leaflet's `toBBoxString()` order)."""
+    if not bbox:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(','))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'min_lon,min_lat,max_lon,max_lat'")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox minimum must not exceed maximum")
+    return (min_lon, min_lat, max_lon, max_lat)
+
+def _parse_filters(filters: str):
+    if not filters:
+        return []
+    return [f.strip() for f in filters.split(',')]
+
+def _parse_since(since: str):
+    """
+    `since` is either a post id or a timestamp (e.g. `2025-11-26 17:43:00` or ISO 8601).
+    Timestamps with an offset are converted to UTC, like `created_at`; naive ones are taken as UTC.
+    """
+    if not since:
+        return None
+    if since.isdigit():
+        return int(since)
+    try:
+        moment = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be a post id or a timestamp")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+def _parse_fields(fields: str) -> tuple:
+    """`fields=id,lat,lon,...` projection of the listed post columns; `id` is always included for paging."""
+    if not fields:
+        return db.POST_LIST_COLUMNS
+    names = tuple(dict.fromkeys(['id'] + _parse_filters(fields)))
+    unknown = [name for name in names if name not in db.POST_LIST_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields {unknown}; choose from {', '.join(db.POST_LIST_COLUMNS)}"
+        )
+    return names
+
+def _encode_json(data) -> bytes:
+    # Same output as FastAPI's default JSONResponse, via orjson when installed
+    return wire_format.encode_json(data)
+
+async def _db_json_response(func, *args, **kwargs):
+    """
+    Runs a db query and encodes its JSON body on the db thread pool, so neither
+    the query nor serializing a large result blocks the event loop.
+    """
+    def query_and_encode():
+        result = func(*args, **kwargs)
+        with SERIALIZATION_SECONDS.time(format=wire_format.JSON_MEDIA_TYPE):
+            return _encode_json(result)
+
+    body = await db.run_async(query_and_encode)
+    return Response(content=body, media_type="application/json")
+
+async def _paged_posts(request: Request, limit: int, fields: str, format: str, **query):
+    """
+    Runs a listing query and, when the page is full, sets `X-Next-Cursor` for `after_id`.
+    The body is encoded in the negotiated format (see wire_format) and compressed
+    on the db thread pool.
+    """
+    columns = _parse_fields(fields)
+    try:
+        media_type = wire_format.negotiate(request.headers.get("accept"), format)
+    except wire_format.NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    accept_encoding = request.headers.get("accept-encoding")
+
+    get_waste_posts = post_index.get_waste_posts if post_index.ENABLED else db.get_waste_posts
+
+    def query_and_encode():
+        posts = get_waste_posts(columns=columns, limit=limit, **query)
+        next_cursor = posts[-1]['id'] if limit is not None and len(posts) == limit else None
+        with SERIALIZATION_SECONDS.time(format=media_type):
+            body = wire_format.encode_rows(posts, columns, media_type)
+        start = time.perf_counter()
+        body, encoding = wire_format.compress(body, accept_encoding)
+        if encoding:
+            COMPRESSION_SECONDS.observe(time.perf_counter() - start, encoding=encoding)
+        return body, encoding, next_cursor
+
+    body, encoding, next_cursor = await db.run_async(query_and_encode)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+# Read endpoints whose output only changes with waste_posts are served through
+# _versioned_response: their bodies are kept here per URL and negotiation
+# headers, and all of them are dropped once db.get_data_version moves on.
+RESPONSE_CACHE_SIZE = 256
+_response_cache = OrderedDict()
+_response_cache_version = None
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/"5" matches "5"
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+async def _versioned_response(request: Request, build):
+    """
+    Conditional GET keyed on the waste_posts data version: sets ETag and
+    Last-Modified, answers a matching If-None-Match / If-Modified-Since with
+    304 after one version lookup, and otherwise serves the cached response for
+    this URL (compressed once per Accept-Encoding) or `await build()`s it.
+    Expired posts leave responses when the lifecycle sweep marks them (every
+    SWEEP_INTERVAL_SECONDS), as that write bumps the version.
+    """
+    global _response_cache_version
+    version, changed_at = await db.run_async(db.get_data_version_info)
+    etag = f'W/"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    last_modified = None
+    if changed_at:
+        changed = datetime.strptime(changed_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        # changed_at has one-second resolution: until that second is over a
+        # later write can keep the same value, so it is not a validator yet
+        if changed < datetime.now(timezone.utc).replace(microsecond=0):
+            last_modified = changed
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if _not_modified(request, etag, last_modified):
+        RESPONSE_CACHE_REQUESTS.inc(result="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    if version != _response_cache_version:
+        _response_cache.clear()
+        _response_cache_version = version
+    key = (request.url.path, request.url.query, request.headers.get("accept"), request.headers.get("accept-encoding"))
+    cached = _response_cache.get(key)
+    if cached is not None:
+        _response_cache.move_to_end(key)
+        RESPONSE_CACHE_REQUESTS.inc(result="hit")
+    else:
+        RESPONSE_CACHE_REQUESTS.inc(result="miss")
+        response = await build()
+        body = response.body
+        response_headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+        if "content-encoding" not in response_headers:
+            body, encoding = await db.run_async(wire_format.compress, body, request.headers.get("accept-encoding"))
+            if encoding:
+                response_headers["content-encoding"] = encoding
+                response_headers.setdefault("vary", "Accept-Encoding")
+        cached = (response.status_code, body, response_headers)
+        if response.status_code == 200 and RESPONSE_CACHE_SIZE > 0 and version == _response_cache_version:
+            _response_cache[key] = cached
+            while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+    status_code, body, response_headers = cached
+    return Response(content=body, status_code=status_code, headers={**response_headers, **headers})
+
 @app.get("/waste_posts")
-async def get_waste_posts_api():
+async def get_waste_posts_api(
+    request: Request,
+    bbox: str = None,
+    after_id: int = None,
+    since: str = None,
+    limit: int = Query(None, ge=1, le=1000),
+    fields: str = None,
+    format: str = None,
+):
     """
-    Returns a list of all waste posts from the database.
-    This endpoint currently does not support filtering.
+    Returns a list of waste posts from the database, newest first.
+    Pass `bbox=min_lon,min_lat,max_lon,max_lat` to only get posts inside the map viewport.
+    Page with `limit` and `after_id` (the `X-Next-Cursor` header of the previous page);
+    poll for new posts with `since=<last seen post id or created_at>`.
+    `fields=id,lat,lon,...` limits the columns returned. Besides JSON rows, the list is
+    available columnar (`Accept: application/vnd.ecocycle.columnar+json`) or as MessagePack
+    (`Accept: application/msgpack`); `format=json|columnar|msgpack` overrides Accept.
     """
-    posts = db.get_waste_posts()
-    # Remove binary image data to prevent JSON serialization errors
-    for post in posts:
-        if 'image_blob' in post:
-            del post['image_blob']
-    return posts
+    # List views only read metadata columns; images are served by /waste_posts/{post_id}/image
+    query = dict(bbox=_parse_bbox(bbox), after_id=after_id, since=_parse_since(since))
+    return await _versioned_response(request, lambda: _paged_posts(request, limit, fields, format, **query))
 
 @app.get("/waste_posts/filtered")
-async def get_filtered_waste_posts_api(filters: str = None):
+async def get_filtered_waste_posts_api(
+    request: Request,
+    filters: str = None,
+    bbox: str = None,
+    after_id: int = None,
+    since: str = None,
+    limit: int = Query(None, ge=1, le=1000),
+    fields: str = None,
+    format: str = None,
+):
     """
     Returns a list of waste posts from the database, optionally filtered by suitability tags.
     Filters should be a comma-separated string (e.g., "Maggot BSF,Ayam/Unggas").
+    Supports the same `bbox`, paging, `since`, `fields` and format parameters as `/waste_posts`.
+    """
+    query = dict(filters=_parse_filters(filters), bbox=_parse_bbox(bbox), after_id=after_id, since=_parse_since(since))
+    return await _versioned_response(request, lambda: _paged_posts(request, limit, fields, format, **query))
+
+# Idle SSE connections get a comment line this often so proxies keep them open
+STREAM_KEEPALIVE_SECONDS = 15
+
+async def _post_event_stream(subscription: live_updates.Subscription, last_event_id: int = None):
+    try:
+        sent_id = last_event_id or 0
+        if last_event_id:
+            # Reconnecting client: replay what it missed before switching to live events
+            missed = await db.run_async(
+                db.get_waste_posts, filters=list(subscription.tags), bbox=subscription.bbox, since=last_event_id
+            )
+            for post in reversed(missed):
+                sent_id = max(sent_id, post['id'])
+                yield live_updates.format_sse(post)
+        while True:
+            try:
+                post_id, message = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if post_id > sent_id:
+                sent_id = post_id
+                yield message
+    finally:
+        post_broker.unsubscribe(subscription)
+
+@app.get("/waste_posts/stream")
+async def stream_waste_posts_api(request: Request, bbox: str = None, filters: str = None):
+    """
+    Server-Sent Events stream of newly created waste posts (`event: post`, data is the post JSON).
+    Optionally scoped to a `bbox` and to suitability tags in `filters`.
+    Reconnecting clients send `Last-Event-ID` and first receive the posts they missed.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    subscription = post_broker.subscribe(bbox=_parse_bbox(bbox), tags=_parse_filters(filters))
+    return StreamingResponse(
+        _post_event_stream(subscription, int(last_event_id) if last_event_id and last_event_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/waste_posts/search")
+async def search_waste_posts_api(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    filters: str = None,
+    bbox: str = None,
+    limit: int = Query(db.SEARCH_DEFAULT_LIMIT, ge=1, le=200),
+):
+    """
+    Full-text search (e.g. `q=kulit pisang`) over the AI analysis of available
+    posts: composition, category, safety warning and handling tip. Results are
+    ranked best first and carry a `relevance` score. Supports the same `filters`
+    and `bbox` parameters as `/waste_posts/filtered`.
+    """
+    if not re.search(r"\w", q):
+        raise HTTPException(status_code=400, detail="q must contain at least one word")
+    filters, bbox = _parse_filters(filters), _parse_bbox(bbox)
+    return await _versioned_response(
+        request, lambda: _db_json_response(db.search_posts, q, filters=filters, bbox=bbox, limit=limit)
+    )
+
+@app.get("/waste_posts/nearby")
+async def get_nearby_waste_posts_api(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(2000, gt=0, le=50000),
+    limit: int = Query(50, ge=1, le=500),
+    filters: str = None,
+):
+    """
+    Returns waste posts within `radius_m` meters of (`lat`, `lon`), nearest first.
+    Each post includes its `distance_m`.
+    """
+    filters = _parse_filters(filters)
+    get_nearby_posts = post_index.get_nearby_posts if post_index.ENABLED else db.get_nearby_posts
+    return await _versioned_response(
+        request, lambda: _db_json_response(get_nearby_posts, lat, lon, radius_m, limit=limit, filters=filters)
+    )
+
+@app.get("/waste_posts/nearest")
+async def get_nearest_waste_posts_api(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=500),
+    provider_type: db.ProviderType = None,
+    max_distance_m: float = Query(None, gt=0),
+):
+    """
+    Returns the `k` waste posts nearest to (`lat`, `lon`), nearest first, optionally
+    only from one `provider_type` and within `max_distance_m`. Each post includes its `distance_m`.
+    """
+    return await _versioned_response(request, lambda: _db_json_response(
+        db.get_nearest_posts, lat, lon, k, provider_type=provider_type, max_distance_m=max_distance_m,
+    ))
+
+@app.get("/waste_posts/supply")
+async def get_waste_supply_api(
+    request: Request,
+    cell_m: float = Query(geo.GRID_CELL_M, ge=50, le=100000),
+    bbox: str = None,
+    provider_type: db.ProviderType = None,
+):
+    """
+    Returns the supply per square area of `cell_m` meters: post count, total
+    estimated weight (kg) and centroid, largest total first.
+    """
+    bbox = _parse_bbox(bbox)
+    return await _versioned_response(
+        request, lambda: _db_json_response(db.get_area_supply, cell_m, bbox=bbox, provider_type=provider_type)
+    )
+
+@app.get("/waste_posts/clusters")
+async def get_waste_post_clusters_api(
+    request: Request, z: int = Query(..., ge=0, le=db.CLUSTER_MAX_ZOOM), bbox: str = Query(...), filters: str = None,
+):
+    """
+    Returns pre-aggregated clusters for a map at zoom `z` showing `bbox`:
+    per grid cell the post count, total weight, dominant category and centroid.
+    `filters` (suitability tags, as in `/waste_posts/filtered`) counts only matching posts.
+    Above zoom `db.CLUSTER_MAX_ZOOM` clients should request individual posts with `/waste_posts?bbox=`.
+    """
+    bbox, filters = _parse_bbox(bbox), _parse_filters(filters)
+    return await _versioned_response(request, lambda: _db_json_response(db.get_clusters, z, bbox, filters=filters))
+
+# Strong references to running batches, which outlive their HTTP response if the client goes away
+_batch_tasks = set()
+
+async def _batch_progress_stream(task: asyncio.Task, progress: asyncio.Queue):
+    while not (task.done() and progress.empty()):
+        getter = asyncio.ensure_future(progress.get())
+        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            yield _encode_json(getter.result()) + b"\n"
+        else:
+            getter.cancel()
+    try:
+        results = task.result()
+    except Exception as e:
+        yield _encode_json({'status': 'error', 'detail': str(e)}) + b"\n"
+        return
+    post_ids = [r['post_id'] for r in results if 'post_id' in r]
+    yield _encode_json({'status': 'complete', 'post_ids': post_ids}) + b"\n"
+
+@app.post("/waste_posts/batch")
+async def create_waste_posts_batch_api(
+    files: list[UploadFile] = File(...),
+    provider_type: db.ProviderType = Form(...),
+    lat: float = Form(..., ge=-90, le=90),
+    lon: float = Form(..., ge=-180, le=180),
+    contact_info: str = Form(None),
+):
+    """
+    Analyses up to `batch_ingest.MAX_BATCH_SIZE` photos from one provider
+    location concurrently and posts the accepted ones in a single transaction.
+    Photos over `batch_ingest.MAX_PHOTO_BYTES` or `MAX_PHOTO_PIXELS` are refused (413).
+    The location is jittered before it is stored.
+
+    Responds with newline-delimited JSON progress events per item (`index`,
+    `status`: analyzing/retrying/accepted/rejected/failed/posted), ending with
+    `{"status": "complete", "post_ids": [...]}`.
+    """
+    if len(files) > batch_ingest.MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {batch_ingest.MAX_BATCH_SIZE} photos per batch")
+    # Only the encoded bytes are kept; each photo is decoded when its analysis starts
+    photos = []
+    for upload in files:
+        data = await upload.read(batch_ingest.MAX_PHOTO_BYTES + 1)
+        if len(data) > batch_ingest.MAX_PHOTO_BYTES:
+            raise HTTPException(status_code=413, detail=f"Photo larger than {batch_ingest.MAX_PHOTO_BYTES} bytes: {upload.filename}")
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                pixels = image.width * image.height
+                image.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+            raise HTTPException(status_code=400, detail=f"Not a readable image: {upload.filename}")
+        if pixels > batch_ingest.MAX_PHOTO_PIXELS:
+            raise HTTPException(status_code=413, detail=f"Photo larger than {batch_ingest.MAX_PHOTO_PIXELS} pixels: {upload.filename}")
+        photos.append(data)
+
+    progress = asyncio.Queue()
+    priv_lat, priv_lon = geo.jitter_location(lat, lon)
+    # The batch keeps running (and posting) even if the client disconnects
+    task = asyncio.create_task(batch_ingest.ingest_batch(
+        photos, provider_type, priv_lat, priv_lon, contact_info=contact_info, on_progress=progress.put_nowait,
+    ))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+    return StreamingResponse(_batch_progress_stream(task, progress), media_type="application/x-ndjson")
+
+@app.post("/analysis_jobs", status_code=202)
+async def create_analysis_job_api(file: UploadFile = File(...)):
+    """
+    Queues the AI analysis of a photo and returns the job (`id`, `status`, ...).
+    Uploading the same photo again returns the existing job.
+    Poll `GET /analysis_jobs/{id}` until `status` is `done` (see `result`) or `failed`.
+    """
+    try:
+        image = Image.open(io.BytesIO(await file.read()))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail=f"Not a readable image: {file.filename}")
+    image_hash = await db.run_async(image_store.save_image, image)
+    return await db.run_async(job_queue.submit, image_hash)
+
+@app.get("/analysis_jobs/{job_id}")
+async def get_analysis_job_api(job_id: int):
+    """
+    Returns an analysis job: `status` (queued/running/done/failed), `attempts`, `result`, `error`.
+    """
+    job = await db.run_async(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Stored images are content-addressed, so a given URL never changes content.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _stored_image_response(request: Request, digest: str, variant: str):
+    """Serves an image store file with ETag/immutable caching headers."""
+    try:
+        path = image_store.image_path(digest, variant)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    etag = f'"{digest}-{variant}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    try:
+        IMAGE_BYTES_SERVED.inc(os.path.getsize(path), source="store")
+    except OSError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+@app.post("/waste_posts/{post_id}/claim")
+async def claim_waste_post_api(post_id: int):
+    """
+    Marks an available post as claimed (picked up), removing it from listings and the map.
+    Responds 409 if the post is unknown, already claimed or expired.
+    """
+    if not await db.run_async(db.claim_waste_post, post_id):
+        raise HTTPException(status_code=409, detail="Post is not available")
+    return {'id': post_id, 'status': db.PostStatus.CLAIMED.value}
+
+@app.get("/waste_posts/{post_id}/image")
+async def get_waste_post_image_api(post_id: int, request: Request):
+    """
+    Returns the image of a single waste post.
+    """
+    image = await db.run_async(db.get_waste_post_image, post_id)
+    if image and image['image_hash']:
+        return _stored_image_response(request, image['image_hash'], 'original')
+    if not image or not image['image_blob']:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Legacy post whose image is still stored inline in the database
+    blob = image['image_blob']
+    IMAGE_BYTES_SERVED.inc(len(blob), source="db")
+    media_type = "image/png" if blob.startswith(b"\x89PNG") else "image/jpeg"
+    return Response(content=blob, media_type=media_type)
+
+@app.get("/images/{digest}")
+async def get_image_api(digest: str, request: Request):
+    """
+    Returns a stored image by its content hash (`image_hash` in list responses).
+    """
+    return _stored_image_response(request, digest, 'original')
+
+@app.get("/images/{digest}/thumb")
+async def get_image_thumbnail_api(digest: str, request: Request):
+    """
+    Returns the precomputed map-popup thumbnail of a stored image.
+    """
+    return _stored_image_response(request, digest, 'thumb')
+
+@app.get("/stats")
+async def get_stats_api(request: Request, limit: int = Query(db.STATS_DEFAULT_LIMIT, ge=1, le=366)):
+    """
+    Supply dashboard totals: post count and total weight overall and per waste
+    category, provider type, suitability tag, day (latest `limit`) and geohash
+    cell, the `limit` heaviest of each. Read from pre-aggregated tables, so the
+    cost does not grow with the number of posts.
+    """
+    return await _versioned_response(request, lambda: _db_json_response(db.get_post_stats, limit))
+
+@app.get("/analysis_cache/stats")
+async def get_analysis_cache_stats_api():
+    """
+    Hit/miss counters and hit rate of the Gemini analysis cache.
+    """
+    return await db.run_async(analysis_cache.stats)
+
+def _render_metrics() -> str:
+    cache = analysis_cache.stats()
+    return metrics.render(extra=[
+        ("ecocycle_analysis_cache_hits_total", "counter", "Analysis cache hits (all processes).", cache['hits']),
+        ("ecocycle_analysis_cache_misses_total", "counter", "Analysis cache misses (all processes).", cache['misses']),
+        ("ecocycle_analysis_cache_hit_rate", "gauge", "Analysis cache hit rate (all processes).", cache['hit_rate']),
+        ("ecocycle_analysis_cache_entries", "gauge", "Entries in the analysis cache.", cache['entries']),
+        ("ecocycle_post_index_posts", "gauge", "Posts in this process's post_index.", len(post_index.get_index())),
+        ("ecocycle_post_index_bytes", "gauge", "Array memory of this process's post_index.", post_index.get_index().nbytes),
+    ])
+
+@app.get("/metrics")
+async def get_metrics_api():
+    """
+    Prometheus metrics of this API process: request, db, serialization and
+    model latencies, db VM steps and rows, image bytes, model tokens and parse failures.
     """
-    filter_list = []
-    if filters:
-        filter_list = [f.strip() for f in filters.split(',')]
-    
-    posts = db.get_waste_posts(filters=filter_list)
-    # Remove binary image data to prevent JSON serialization errors
-    for post in posts:
-        if 'image_blob' in post:
-            del post['image_blob']
-    return posts
+    body = await db.run_async(_render_metrics)
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # You would run this API using a command like:
 # uvicorn api:app --reload --port 8000
@@ -0,0 +1,126 @@
+import asyncio
+import io
+import random
+
+from PIL import Image
+
+import ai_service
+import db
+import image_store
+
+# Photos analysed at the same time; keeps a large batch under the Gemini
+# per-minute quota instead of firing every request at once.
+BATCH_CONCURRENCY = 4
+MAX_BATCH_SIZE = 50
+# Limits per uploaded photo: encoded size, and pixels (a decoded 12MP photo
+# takes ~36 MB, so photos are only decoded inside the concurrency bound)
+MAX_PHOTO_BYTES = 20 * 2 ** 20
+MAX_PHOTO_PIXELS = 50_000_000
+# Retries of a single photo after a rate-limit (HTTP 429) response, waiting
+# RATE_LIMIT_BASE_DELAY_SECONDS * 2^attempt (plus jitter) in between.
+RATE_LIMIT_RETRIES = 4
+RATE_LIMIT_BASE_DELAY_SECONDS = 2.0
+
+# Per-item progress states
+ANALYZING = 'analyzing'
+RETRYING = 'retrying'
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+FAILED = 'failed'
+POSTED = 'posted'
+
+
+def _open_image(photo) -> Image.Image:
+    """Decodes encoded image bytes; PIL images are returned as they are."""
+    if isinstance(photo, Image.Image):
+        return photo
+    image = Image.open(io.BytesIO(photo))
+    image.load()
+    return image
+
+
+async def _analyze_with_backoff(index: int, image: Image.Image, report):
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            return await asyncio.to_thread(ai_service.analyze_image, image)
+        except Exception as e:
+            if not ai_service.is_rate_limit_error(e) or attempt == RATE_LIMIT_RETRIES:
+                raise
+            delay = RATE_LIMIT_BASE_DELAY_SECONDS * 2 ** attempt * random.uniform(1, 1.5)
+            report({'index': index, 'status': RETRYING, 'retry_in_s': round(delay, 1)})
+            await asyncio.sleep(delay)
+
+
+async def analyze_batch(images: list, on_progress=None, concurrency: int = BATCH_CONCURRENCY) -> list:
+    """
+    Analyses photos (PIL images or encoded image bytes) concurrently, at most
+    `concurrency` at a time. Bytes are decoded only once their turn comes.
+
+    `on_progress`, if given, is called on the event loop with a dict
+    (`index`, `status` and status details) whenever an item changes state.
+
+    Returns:
+        One dict per image, in input order, with `status` ACCEPTED (plus
+        `analysis`), REJECTED (plus `reason`) or FAILED (plus `error`).
+    """
+    report = on_progress or (lambda event: None)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(index: int, photo) -> dict:
+        async with semaphore:
+            report({'index': index, 'status': ANALYZING})
+            try:
+                image = await asyncio.to_thread(_open_image, photo)
+                analysis = await _analyze_with_backoff(index, image, report)
+            except Exception as e:
+                result = {'index': index, 'status': FAILED, 'error': str(e)}
+            else:
+                if analysis.get('is_organic_waste') is False:
+                    reason = analysis.get('rejection_reason') or 'Bukan limbah organik.'
+                    result = {'index': index, 'status': REJECTED, 'reason': reason}
+                else:
+                    result = {'index': index, 'status': ACCEPTED, 'analysis': analysis}
+            report(result)
+            return result
+
+    return await asyncio.gather(*(analyze(i, photo) for i, photo in enumerate(images)))
+
+
+def _store_posts(images: list, accepted: list, provider_type: db.ProviderType, lat: float, lon: float, contact_info: str):
+    # Accepted photos are decoded again here, one at a time
+    posts = [
+        {
+            'provider_type': provider_type,
+            'lat': lat,
+            'lon': lon,
+            'image_hash': image_store.put(ai_service.image_to_blob(_open_image(images[result['index']]))),
+            'ai_analysis': result['analysis'],
+            'contact_info': contact_info,
+        }
+        for result in accepted
+    ]
+    return db.add_waste_posts(posts)
+
+
+async def ingest_batch(images: list, provider_type: db.ProviderType, lat: float, lon: float,
+                       contact_info: str = None, on_progress=None, concurrency: int = BATCH_CONCURRENCY) -> list:
+    """
+    Analyses a batch of photos (PIL images or encoded image bytes) from one
+    provider location and posts every accepted one in a single database
+    transaction. `lat`/`lon` should already
+    be jittered (`geo.jitter_location`).
+
+    Returns:
+        The `analyze_batch` results; posted items get status POSTED and a `post_id`.
+    """
+    if len(images) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} photos per batch")
+    results = await analyze_batch(images, on_progress=on_progress, concurrency=concurrency)
+    accepted = [result for result in results if result['status'] == ACCEPTED]
+    if accepted:
+        post_ids = await db.run_async(_store_posts, images, accepted, provider_type, lat, lon, contact_info)
+        for result, post_id in zip(accepted, post_ids):
+            result.update(status=POSTED, post_id=post_id)
+            if on_progress:
+                on_progress({'index': result['index'], 'status': POSTED, 'post_id': post_id})
+    return results
@@ -0,0 +1,116 @@
+"""
+Benchmark: API latency under concurrent clients, async db layer vs calling
+the synchronous db functions straight from the `async def` endpoints.
+
+200 clients hit the app concurrently (in-process over ASGI, no network),
+each sending a request every `--interval` seconds: most are cheap nearby
+lookups, some are heavy viewport listings. Latency is measured from the
+scheduled send time, so time spent waiting for a stalled event loop counts.
+With blocking calls every heavy query stalls the loop for all clients; with
+`db.run_async` the loop keeps serving cheap requests.
+
+Run from the repository root:
+    python benchmarks/bench_async_api.py --clients 200 --posts 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+import api
+import db
+
+
+def blocking_app():
+    """The API as it was before the async layer: sync db calls inside async endpoints."""
+    app = FastAPI()
+
+    @app.get("/waste_posts")
+    async def get_waste_posts_api(limit: int = None):
+        return db.get_waste_posts(limit=limit)
+
+    @app.get("/waste_posts/nearby")
+    async def get_nearby_waste_posts_api(lat: float, lon: float, radius_m: float = 2000, limit: int = 50):
+        return db.get_nearby_posts(lat, lon, radius_m, limit=limit)
+
+    return app
+
+
+def populate(count: int):
+    conn = db.get_db_connection()
+    conn.executemany(
+        "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, expires_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, datetime('now', '+3 days'))",
+        [('Restoran', 'Nasi', 'Maggot BSF', 1.0, random.gauss(-6.2, 0.1), random.gauss(106.8, 0.1)) for _ in range(count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run_clients(app, clients: int, requests_per_client: int, interval: float, heavy_ratio: float, heavy_limit: int):
+    latencies = {"light": [], "heavy": []}
+
+    async def client(http, t0):
+        for i in range(requests_per_client):
+            kind = "heavy" if random.random() < heavy_ratio else "light"
+            if kind == "heavy":
+                url = f"/waste_posts?limit={heavy_limit}"
+            else:
+                url = "/waste_posts/nearby?lat=-6.2&lon=106.8&radius_m=500&limit=20"
+            scheduled = t0 + i * interval
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            response = await http.get(url)
+            response.raise_for_status()
+            latencies[kind].append(time.perf_counter() - scheduled)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http, start + random.uniform(0, interval)) for _ in range(clients)))
+        wall = time.perf_counter() - start
+    return latencies, wall
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between a client's requests")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--heavy-ratio", type=float, default=0.02)
+    parser.add_argument("--heavy-limit", type=int, default=1000, help="rows returned by a heavy listing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populate(args.posts)
+        print(f"{'layer':>9} {'kind':>6} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+        for name, app in (("blocking", blocking_app()), ("async", api.app)):
+            random.seed(1)
+            latencies, wall = asyncio.run(run_clients(
+                app, args.clients, args.requests, args.interval, args.heavy_ratio, args.heavy_limit
+            ))
+            total = sum(len(v) for v in latencies.values())
+            for kind, values in latencies.items():
+                if values:
+                    print(f"{name:>9} {kind:>6} {len(values):>6} {statistics.median(values) * 1000:>9.1f} "
+                          f"{percentile(values, 99) * 1000:>9.1f} {total / wall:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: server-side clusters vs raw posts for a map viewport.
+
+Reports, per table size, how many features the client must draw and how long
+the query takes for a country-wide view (zoom 5) and a city view (zoom 12).
+The cluster feature count is bounded by the viewport, not by the post count.
+
+Run from the repository root:
+    python benchmarks/bench_clusters.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+COUNTRY_BBOX = (95.0, -11.0, 141.0, 6.0)
+CITY_BBOX = (106.70, -6.30, 106.95, -6.10)
+CATEGORIES = ['Nasi, Sayuran', 'Kulit Buah', 'Sisa Sayur', 'Tulang Ayam']
+# A few dense cities, like real supply
+CITIES = [(-6.2, 106.82), (-6.91, 107.61), (-7.25, 112.75), (3.59, 98.67), (-5.14, 119.42)]
+
+
+def populate(count: int):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for _ in range(count):
+        city_lat, city_lon = random.choice(CITIES)
+        lat, lon = random.gauss(city_lat, 0.08), random.gauss(city_lon, 0.08)
+        category, weight = random.choice(CATEGORIES), random.uniform(0.5, 10)
+        cursor.execute(
+            "INSERT INTO waste_posts (provider_type, waste_category, weight_est, lat, lon, expires_at)"
+            " VALUES ('Restoran', ?, ?, ?, ?, datetime('now', '+3 days'))",
+            (category, weight, lat, lon),
+        )
+        db._add_to_cluster_cells(cursor, lat, lon, category, weight)
+    conn.commit()
+    conn.close()
+    return (time.perf_counter() - start) / max(count, 1)
+
+
+def timed(func, repeat: int = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'posts':>8} {'view':>8} {'mode':>9} {'features':>9} {'ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            per_insert = populate(size - populated)
+            populated = size
+            print(f"{size:>8} insert cost incl. cluster aggregates: {per_insert * 1e6:.0f} us/post")
+            for view, zoom, bbox in (("country", 5, COUNTRY_BBOX), ("city", 12, CITY_BBOX)):
+                for mode, func in (
+                    ("posts", lambda: db.get_waste_posts(columns=('id', 'lat', 'lon'), bbox=bbox)),
+                    ("clusters", lambda: db.get_clusters(zoom, bbox)),
+                ):
+                    features, elapsed = timed(func)
+                    print(f"{size:>8} {view:>8} {mode:>9} {len(features):>9} {elapsed * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
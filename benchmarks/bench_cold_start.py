@@ -0,0 +1,82 @@
+"""
+Benchmark: cold-start import time of the app modules, each measured in a
+fresh interpreter, plus which heavy dependencies an import drags in
+(streamlit, the Gemini SDK). `main.py` imports `ai_service` and `db`, so the
+`ai_service` row is its share of the startup cost.
+
+Pass `--compare-rev` to measure an older revision as well (exported with
+`git archive` into a temporary directory), e.g. the commit before the AI
+client became lazy.
+
+Run from the repository root:
+    python benchmarks/bench_cold_start.py --runs 10
+    python benchmarks/bench_cold_start.py --compare-rev HEAD~1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('streamlit', 'google.generativeai')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(tree: str, module: str, runs: int) -> dict:
+    timings, heavy = [], []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=tree, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(result['ms'])
+        heavy = result['heavy']
+    return {'median_ms': statistics.median(timings), 'min_ms': min(timings), 'heavy': heavy}
+
+
+def export_revision(rev: str, target: str):
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", target], input=archive.stdout, check=True)
+
+
+def report(label: str, module: str, result: dict):
+    if 'error' in result:
+        print(f"{label:>10} {module:>14}  import failed: {result['error']}")
+        return
+    heavy = ", ".join(result['heavy']) or "-"
+    print(f"{label:>10} {module:>14} {result['median_ms']:>9.0f} {result['min_ms']:>9.0f}  {heavy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+", default=["ai_service", "job_queue", "api"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare-rev", help="git revision to measure as the baseline")
+    args = parser.parse_args()
+
+    print(f"{'tree':>10} {'module':>14} {'median ms':>9} {'min ms':>9}  heavy imports")
+    with tempfile.TemporaryDirectory() as tmp:
+        trees = [('current', ROOT)]
+        if args.compare_rev:
+            export_revision(args.compare_rev, tmp)
+            trees.insert(0, (args.compare_rev, tmp))
+        for label, tree in trees:
+            for module in args.modules:
+                report(label, module, measure(tree, module, args.runs))
+
+
+if __name__ == "__main__":
+    main()
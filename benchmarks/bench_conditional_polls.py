@@ -0,0 +1,100 @@
+"""
+Benchmark: requests per second for polls that return unchanged data, as the
+React app's 30 second polls mostly do. Concurrent clients hit the app
+in-process over ASGI (no network) back to back:
+
+- uncached: response cache disabled, every poll queries and serializes
+- cached: plain GETs served from the in-process response cache
+- 304: clients send If-None-Match with the ETag they got, the app only
+  reads the data version
+
+Run from the repository root:
+    python benchmarks/bench_conditional_polls.py --posts 20000 --clients 50 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import api
+import db
+
+ENDPOINTS = {
+    'list': "/waste_posts?limit=500",
+    'stats': "/stats",
+    'nearby': "/waste_posts/nearby?lat=-6.2&lon=106.8&radius_m=2000&limit=50",
+}
+
+
+def populate(count: int):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    for _ in range(count):
+        lat, lon, weight = random.gauss(-6.2, 0.1), random.gauss(106.8, 0.1), random.uniform(0.5, 10)
+        cursor.execute(
+            "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, ai_analysis,"
+            " expires_at) VALUES ('Restoran', 'Nasi', 'Maggot BSF', ?, ?, ?, '{}', datetime('now', '+3 days'))",
+            (weight, lat, lon),
+        )
+        db._add_to_post_stats(cursor, 'Restoran', 'Nasi', ['Maggot BSF'], weight, lat, lon, '2025-11-26')
+    conn.commit()
+    conn.close()
+
+
+async def run_clients(url: str, clients: int, seconds: float, conditional: bool) -> tuple:
+    latencies = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Accept-Encoding": "gzip, br"}) as http:
+        etag = (await http.get(url)).headers["etag"]
+        headers = {"If-None-Match": etag} if conditional else {}
+        expected = 304 if conditional else 200
+
+        async def client(deadline: float):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await http.get(url, headers=headers)
+                assert response.status_code == expected, response.status_code
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(start + seconds) for _ in range(clients)))
+        wall = time.perf_counter() - start
+    return latencies, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populate(args.posts)
+        cache_size = api.RESPONSE_CACHE_SIZE
+        print(f"{'endpoint':>9} {'mode':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, url in ENDPOINTS.items():
+            for mode in ('uncached', 'cached', '304'):
+                api.RESPONSE_CACHE_SIZE = 0 if mode == 'uncached' else cache_size
+                api._response_cache.clear()
+                latencies, wall = asyncio.run(run_clients(url, args.clients, args.seconds, mode == '304'))
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(f"{name:>9} {mode:>9} {len(latencies) / wall:>8.0f} "
+                      f"{statistics.median(latencies) * 1000:>8.2f} {p99 * 1000:>8.2f}")
+        db._manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
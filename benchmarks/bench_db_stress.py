@@ -0,0 +1,136 @@
+"""
+Benchmark: mixed concurrent reads and writes against the database, comparing
+the old connection handling (a fresh connection per operation, rollback
+journal, synchronous=FULL) with WAL, tuned pragmas and per-thread reused
+connections.
+
+Reader threads alternate between the latest-posts listing and a nearby
+query; writer threads create posts through `db.add_waste_post`. Reports
+throughput, read latency percentiles and "database is locked" errors.
+
+Run from the repository root:
+    python benchmarks/bench_db_stress.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+LEGACY_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+CENTER = (-6.2, 106.8)
+
+
+@contextmanager
+def per_operation_connection():
+    conn = db.get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def seed(count: int):
+    for _ in range(count):
+        add_random_post()
+
+
+def add_random_post():
+    db.add_waste_post(
+        random.choice(list(db.ProviderType)),
+        CENTER[0] + random.uniform(-0.1, 0.1),
+        CENTER[1] + random.uniform(-0.1, 0.1),
+        None,
+        {
+            'main_composition': random.choice(list(db.WasteCategory)).value,
+            'suitability_tags': random.sample([t.value for t in db.SuitabilityTag], 2),
+            'estimated_weight_kg': round(random.uniform(0.5, 20), 1),
+        },
+    )
+
+
+def read_once():
+    if random.random() < 0.5:
+        db.get_waste_posts(limit=50)
+    else:
+        db.get_nearby_posts(CENTER[0], CENTER[1], 2000)
+
+
+def worker(operation, stop: threading.Event, stats: dict, lock: threading.Lock):
+    latencies, errors = [], 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            operation()
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    with lock:
+        stats['latencies'].extend(latencies)
+        stats['errors'] += errors
+
+
+def run(readers: int, writers: int, seconds: float) -> dict:
+    stop, lock = threading.Event(), threading.Lock()
+    reads = {'latencies': [], 'errors': 0}
+    writes = {'latencies': [], 'errors': 0}
+    threads = [threading.Thread(target=worker, args=(read_once, stop, reads, lock)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=(add_random_post, stop, writes, lock)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {'reads': reads, 'writes': writes}
+
+
+def report(label: str, result: dict, seconds: float):
+    reads, writes = result['reads'], result['writes']
+    read_ms = sorted(latency * 1000 for latency in reads['latencies']) or [0.0]
+    p99 = read_ms[min(len(read_ms) - 1, int(len(read_ms) * 0.99))]
+    print(
+        f"{label:>7} {len(reads['latencies']) / seconds:>9.0f} {len(writes['latencies']) / seconds:>9.0f} "
+        f"{statistics.median(read_ms):>8.2f} {p99:>8.2f} {reads['errors'] + writes['errors']:>7}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed-posts", type=int, default=5000)
+    args = parser.parse_args()
+
+    tuned_pragmas, pooled_connection = db.DB_PRAGMAS, db.pooled_connection
+    modes = {
+        'legacy': (LEGACY_PRAGMAS, per_operation_connection),
+        'tuned': (tuned_pragmas, pooled_connection),
+    }
+    print(f"{'mode':>7} {'reads/s':>9} {'writes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'locked':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (pragmas, connection) in modes.items():
+            db.DB_FILE = os.path.join(tmp, f"{label}.db")
+            db.DB_PRAGMAS, db.pooled_connection = pragmas, connection
+            db.init_db()
+            seed(args.seed_posts)
+            report(label, run(args.readers, args.writers, args.seconds), args.seconds)
+            db._manager.close_all()
+    db.DB_PRAGMAS, db.pooled_connection = tuned_pragmas, pooled_connection
+
+
+if __name__ == "__main__":
+    main()
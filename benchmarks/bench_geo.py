@@ -0,0 +1,119 @@
+"""
+Benchmark: geo.py at scale. Compares the per-point Python code the app used
+before (random/math loops, a full haversine scan per lookup) with the NumPy
+versions on synthetic posts spread around a few cities:
+
+- jitter of every point
+- haversine distance from one point to every point
+- k-nearest lookups: brute-force scan vs geo.GridIndex (build + per query)
+- supply totals per area: dict loop vs geo.aggregate_by_cell
+
+Run from the repository root:
+    python benchmarks/bench_geo.py --points 1000000 --queries 200
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import geo
+
+CITIES = [(-6.2088, 106.8456), (-6.9175, 107.6191), (-7.2575, 112.7521), (3.5952, 98.6722)]
+
+
+def make_points(count: int, rng: np.random.Generator) -> tuple:
+    city = rng.integers(len(CITIES), size=count)
+    centers = np.array(CITIES)[city]
+    lat = centers[:, 0] + rng.normal(0, 0.08, count)
+    lon = centers[:, 1] + rng.normal(0, 0.08, count)
+    return lat, lon, rng.uniform(0.5, 20, count)
+
+
+def loop_jitter(lat: float, lon: float, meters: float = 200) -> tuple:
+    # The scalar implementation geo.jitter replaces
+    lat_jitter = random.uniform(-meters, meters) / geo.METERS_PER_DEGREE_LAT
+    lon_jitter = random.uniform(-meters, meters) / (geo.METERS_PER_DEGREE_LAT * abs(math.cos(math.radians(lat))))
+    return lat + lat_jitter, lon + lon_jitter
+
+
+def loop_haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def loop_aggregate(lat: list, lon: list, weights: list, cell_m: float) -> dict:
+    ref_lat = sum(lat) / len(lat)
+    x_scale = geo.METERS_PER_DEGREE_LAT * abs(math.cos(math.radians(ref_lat))) / cell_m
+    y_scale = geo.METERS_PER_DEGREE_LAT / cell_m
+    areas = {}
+    for point_lat, point_lon, weight in zip(lat, lon, weights):
+        area = areas.setdefault((math.floor(point_lon * x_scale), math.floor(point_lat * y_scale)), [0, 0.0])
+        area[0] += 1
+        area[1] += weight
+    return areas
+
+
+def timed(func, *args, **kwargs) -> tuple:
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def row(task: str, loop_ms: float, numpy_ms: float):
+    print(f"{task:>28} {loop_ms:>11.1f} {numpy_ms:>11.2f} {loop_ms / numpy_ms:>8.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--cell-m", type=float, default=geo.GRID_CELL_M)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    lat, lon, weights = make_points(args.points, rng)
+    lat_list, lon_list, weight_list = lat.tolist(), lon.tolist(), weights.tolist()
+    print(f"{args.points} points around {len(CITIES)} cities")
+    print(f"{'task':>28} {'before ms':>11} {'geo.py ms':>11} {'speedup':>9}")
+
+    _, loop_ms = timed(lambda: [loop_jitter(a, b) for a, b in zip(lat_list, lon_list)])
+    _, numpy_ms = timed(geo.jitter, lat, lon)
+    row("jitter all points", loop_ms, numpy_ms)
+
+    query_lat, query_lon = CITIES[0]
+    _, loop_ms = timed(lambda: [loop_haversine(query_lat, query_lon, a, b) for a, b in zip(lat_list, lon_list)])
+    _, numpy_ms = timed(geo.haversine_m, query_lat, query_lon, lat, lon)
+    row("haversine to all points", loop_ms, numpy_ms)
+
+    loop_areas, loop_ms = timed(loop_aggregate, lat_list, lon_list, weight_list, args.cell_m)
+    areas, numpy_ms = timed(geo.aggregate_by_cell, lat, lon, weights, args.cell_m)
+    assert len(loop_areas) == len(areas['count'])
+    row(f"supply per {args.cell_m:.0f} m area", loop_ms, numpy_ms)
+
+    index, build_ms = timed(geo.GridIndex, lat, lon, args.cell_m)
+    queries = np.array(CITIES)[rng.integers(len(CITIES), size=args.queries)] + rng.normal(0, 0.1, (args.queries, 2))
+    scan_ms, index_ms, mismatches = [], [], 0
+    for q_lat, q_lon in queries:
+        scanned, ms = timed(lambda: np.sort(np.partition(geo.haversine_m(q_lat, q_lon, lat, lon), args.k)[:args.k]))
+        scan_ms.append(ms)
+        (_, found_distances), ms = timed(index.nearest, q_lat, q_lon, args.k)
+        index_ms.append(ms)
+        mismatches += not np.allclose(scanned, found_distances)
+    row(f"{args.k}-nearest, per query", float(np.median(scan_ms)), float(np.median(index_ms)))
+    print(f"GridIndex build {build_ms:.0f} ms (pays off after ~{build_ms / np.median(scan_ms):.0f} queries), "
+          f"{mismatches}/{args.queries} results differ from the full scan")
+    print("('before' is a Python loop, except k-nearest: a vectorized full scan)")
+
+
+if __name__ == "__main__":
+    main()
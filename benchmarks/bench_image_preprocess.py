@@ -0,0 +1,118 @@
+"""
+Benchmark: photo preprocessing before the Gemini call. Compares the payload
+the SDK would upload for the full-resolution photo with the downscaled,
+re-encoded image produced by `ai_service.preprocess_image` settings.
+
+The sample photos in "Image Sampah Makanan.zip" are upscaled to `--camera-edge`
+pixels so they resemble a 12MP phone photo.
+
+Offline mode reports preprocessing time and upload size per image. With
+`--live` (requires GEMINI_API_KEY or the key in .streamlit/secrets.toml) it
+also runs the full analysis on the original and preprocessed image, reporting
+latency and whether the JSON fields the app relies on are unchanged.
+
+Run from the repository root:
+    python benchmarks/bench_image_preprocess.py --max-edge 1024 --format JPEG
+    python benchmarks/bench_image_preprocess.py --live --limit 5
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import image_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_ZIP = os.path.join(ROOT, "Image Sampah Makanan.zip")
+# Fields that drive what gets posted and how it is filtered
+COMPARED_FIELDS = ('is_organic_waste', 'suitability_tags')
+
+
+def load_samples(camera_edge: int, limit: int = None) -> list:
+    images = []
+    with zipfile.ZipFile(SAMPLE_ZIP) as archive:
+        names = sorted(n for n in archive.namelist() if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for name in names[:limit]:
+            image = Image.open(io.BytesIO(archive.read(name))).convert('RGB')
+            scale = camera_edge / max(image.size)
+            image = image.resize((round(image.width * scale), round(image.height * scale)), Image.BICUBIC)
+            # Round-trip through a camera-quality JPEG, as the uploader would hand it over
+            images.append((os.path.basename(name), Image.open(io.BytesIO(image_store.encode_image(image, quality=95)))))
+    return images
+
+
+def sdk_payload(image: Image.Image) -> bytes:
+    # What google-generativeai uploads for a PIL Image: the full frame as JPEG
+    with io.BytesIO() as output:
+        image.save(output, format="JPEG")
+        return output.getvalue()
+
+
+def comparable(result: dict) -> tuple:
+    return tuple(
+        frozenset(result.get(f) or []) if isinstance(result.get(f), list) else result.get(f)
+        for f in COMPARED_FIELDS
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--camera-edge", type=int, default=4032)
+    parser.add_argument("--max-edge", type=int, default=1024)
+    parser.add_argument("--format", choices=["JPEG", "WEBP"], default="JPEG")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    samples = load_samples(args.camera_edge, args.limit)
+    print(f"{len(samples)} images at {args.camera_edge}px long edge -> {args.max_edge}px {args.format} q{args.quality}")
+    print(f"{'image':>8} {'orig KB':>8} {'prep KB':>8} {'prep ms':>8}")
+    original_sizes, prepared_sizes, prepare_ms = [], [], []
+    for name, image in samples:
+        original = sdk_payload(image)
+        start = time.perf_counter()
+        prepared = image_store.encode_image(image, max_edge=args.max_edge, quality=args.quality, image_format=args.format)
+        prepare_ms.append((time.perf_counter() - start) * 1000)
+        original_sizes.append(len(original))
+        prepared_sizes.append(len(prepared))
+        print(f"{name:>8} {len(original) / 1024:>8.0f} {len(prepared) / 1024:>8.0f} {prepare_ms[-1]:>8.1f}")
+    print(
+        f"total upload {sum(original_sizes) / 1e6:.1f} MB -> {sum(prepared_sizes) / 1e6:.2f} MB "
+        f"({sum(original_sizes) / sum(prepared_sizes):.0f}x smaller), median preprocessing {statistics.median(prepare_ms):.1f} ms"
+    )
+
+    if not args.live:
+        return
+
+    import ai_service
+    ai_service.MODEL_IMAGE_MAX_EDGE = args.max_edge
+    ai_service.MODEL_IMAGE_FORMAT = args.format
+    ai_service.MODEL_IMAGE_QUALITY = args.quality
+    print(f"\n{'image':>8} {'orig s':>7} {'prep s':>7} {'same':>5}")
+    original_s, prepared_s, unchanged = [], [], 0
+    for name, image in samples:
+        start = time.perf_counter()
+        original_result = ai_service._generate_analysis(image)
+        original_s.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        prepared_result = ai_service._generate_analysis(ai_service.preprocess_image(image))
+        prepared_s.append(time.perf_counter() - start)
+        same = comparable(original_result) == comparable(prepared_result)
+        unchanged += same
+        print(f"{name:>8} {original_s[-1]:>7.2f} {prepared_s[-1]:>7.2f} {'yes' if same else 'NO':>5}")
+    print(
+        f"median analysis {statistics.median(original_s):.2f} s -> {statistics.median(prepared_s):.2f} s, "
+        f"{unchanged}/{len(samples)} results unchanged ({', '.join(COMPARED_FIELDS)})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: the provider ingestion path end to end, with the model replaced by
+ai_service.FakeBackend so no Gemini quota is used and the model's latency is
+a fixed, known quantity. Each photo goes through the same steps as an upload:
+
+    preprocess -> phash -> cache_get -> model (+ parse) -> cache_put
+    -> image_to_blob -> image_store_put -> jitter -> add_waste_post
+
+`--photos` distinct synthetic phone photos are ingested at each concurrency
+level (worker threads); every level starts with an empty analysis cache and
+image store. Prints the throughput per level and the median / p95 time of
+each stage, so a regression in our own code shows up next to the constant
+fake model latency.
+
+Run from the repository root:
+    python benchmarks/bench_ingest.py --photos 100 --concurrency 1 4 16 64 --latency-ms 800
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+import ai_service
+import analysis_cache
+import db
+import geo
+import image_store
+from analysis_parser import AnalysisParseError
+
+STAGES = (
+    'preprocess', 'phash', 'cache_get', 'model', 'cache_put',
+    'image_to_blob', 'image_store_put', 'jitter', 'add_waste_post',
+)
+
+
+def make_photos(count: int, width: int, height: int, seed: int = 7) -> list:
+    """Smooth random colour fields: distinct perceptual hashes, JPEG-friendly like real photos."""
+    rng = np.random.default_rng(seed)
+    photos = []
+    for _ in range(count):
+        coarse = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8))
+        photos.append(coarse.resize((width, height), Image.BICUBIC))
+    return photos
+
+
+def ingest(photo: Image.Image) -> dict:
+    """One upload, stage by stage (mirrors ai_service.analyze_image and the provider form)."""
+    timings = {}
+
+    def stage(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    image_part = stage('preprocess', ai_service.preprocess_image, photo)
+
+    def phash():
+        with Image.open(io.BytesIO(image_part["data"])) as model_image:
+            return analysis_cache.perceptual_hash(model_image)
+
+    digest = stage('phash', phash)
+    analysis = stage('cache_get', analysis_cache.get, digest)
+    if analysis is None:
+        try:
+            analysis = stage('model', ai_service._generate_analysis, image_part)
+        except (AnalysisParseError, ai_service.FakeBackendError):
+            return {'ok': False, 'timings': timings}
+        stage('cache_put', analysis_cache.put, digest, analysis)
+    blob = stage('image_to_blob', ai_service.image_to_blob, photo)
+    image_hash = stage('image_store_put', image_store.put, blob)
+    lat, lon = stage('jitter', geo.jitter_location, -6.2088, 106.8456)
+    stage('add_waste_post', db.add_waste_post, db.ProviderType.RESTO, lat, lon, image_hash, analysis, "08123456789")
+    return {'ok': True, 'timings': timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency-ms", type=float, default=800, help="fake model latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="extra random latency, up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of model calls that fail")
+    parser.add_argument("--size", type=int, nargs=2, default=[1600, 1200], metavar=("WIDTH", "HEIGHT"))
+    args = parser.parse_args()
+
+    photos = make_photos(args.photos, *args.size)
+    backend = ai_service.FakeBackend(
+        latency_s=args.latency_ms / 1000, latency_jitter_s=args.jitter_ms / 1000, error_rate=args.error_rate,
+    )
+    ai_service.set_backend(backend)
+    print(f"{args.photos} photos of {args.size[0]}x{args.size[1]}, fake model "
+          f"{args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, error rate {args.error_rate:.0%}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        print(f"{'workers':>7} {'photos/s':>9} {'failed':>6}  "
+              + " ".join(f"{name:>15}" for name in STAGES) + "   (median/p95 ms)")
+        for workers in args.concurrency:
+            analysis_cache.CACHE_FILE = os.path.join(tmp, f"cache_{workers}.db")
+            image_store.IMAGE_DIR = os.path.join(tmp, f"images_{workers}")
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(ingest, photos))
+            elapsed = time.perf_counter() - start
+            cells = []
+            for name in STAGES:
+                ms = [r['timings'][name] * 1000 for r in results if name in r['timings']]
+                cells.append(f"{np.median(ms):>7.1f}/{np.percentile(ms, 95):<7.1f}" if ms else f"{'-':>15}")
+            failed = sum(not r['ok'] for r in results)
+            print(f"{workers:>7} {len(results) / elapsed:>9.1f} {failed:>6}  " + " ".join(cells))
+        db._manager.close_all()
+    print(f"{backend.calls} fake model calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: map query cost vs. history size with a fixed live supply. Each
+database holds `--live` available posts plus a growing history of expired
+ones. Compares, for a city viewport and the newest-first listing:
+
+- legacy: the query without the lifecycle filter (every post ever made)
+- live: `db.get_waste_posts` before the sweep (expired rows still in the table)
+- swept: `db.get_waste_posts` after `db.sweep_posts` expired the history
+  and archived it (with the archive delay set to zero)
+
+Run from the repository root:
+    python benchmarks/bench_lifecycle.py --history 10000 100000 --live 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+CITY_BBOX = (106.70, -6.30, 106.95, -6.10)
+COLUMNS = ('id', 'lat', 'lon', 'waste_category', 'weight_est')
+
+
+def populate(live: int, history: int):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    for i in range(live + history):
+        lat, lon = random.gauss(-6.2, 0.08), random.gauss(106.82, 0.08)
+        category, weight = random.choice(['Nasi', 'Sayur', 'Kulit Buah']), random.uniform(0.5, 10)
+        # History: expired long ago and due for archival at the next sweep
+        expires = "datetime('now', '+3 days')" if i >= history else "datetime('now', '-30 days')"
+        cursor.execute(
+            "INSERT INTO waste_posts (provider_type, waste_category, weight_est, lat, lon, created_at, expires_at)"
+            f" VALUES ('Restoran', ?, ?, ?, ?, datetime('now', ?), {expires})",
+            (category, weight, lat, lon, f"-{live + history - i} minutes"),
+        )
+        db._add_to_cluster_cells(cursor, lat, lon, category, weight)
+    conn.commit()
+    conn.close()
+
+
+def legacy_query(bbox: tuple = None):
+    # The listing before post lifecycle: no status filter, full history
+    query = f"SELECT {', '.join(COLUMNS)} FROM waste_posts"
+    params = []
+    if bbox:
+        query += (" WHERE id IN (SELECT id FROM waste_posts_rtree"
+                  " WHERE min_lat >= ? AND max_lat <= ? AND min_lon >= ? AND max_lon <= ?)")
+        params = [bbox[1], bbox[3], bbox[0], bbox[2]]
+    with db.pooled_connection() as conn:
+        return conn.execute(query + " ORDER BY created_at DESC, id DESC", params).fetchall()
+
+
+def timed(func, repeat: int = 10) -> tuple:
+    result = func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return len(result), (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--live", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'history':>8} {'query':>8} {'mode':>7} {'rows':>7} {'ms':>8}")
+    for history in args.history:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_FILE = os.path.join(tmp, "bench.db")
+            db.ARCHIVE_DB_FILE = os.path.join(tmp, "archive.db")
+            db.ARCHIVE_IMAGE_DIR = os.path.join(tmp, "image_archive")
+            db.init_db()
+            populate(args.live, history)
+            queries = {
+                'city': (lambda: legacy_query(CITY_BBOX), lambda: db.get_waste_posts(columns=COLUMNS, bbox=CITY_BBOX)),
+                'all': (lambda: legacy_query(), lambda: db.get_waste_posts(columns=COLUMNS)),
+            }
+            for name, (legacy, live) in queries.items():
+                for mode, func in (('legacy', legacy), ('live', live)):
+                    rows, ms = timed(func)
+                    print(f"{history:>8} {name:>8} {mode:>7} {rows:>7} {ms:>8.2f}")
+            start = time.perf_counter()
+            db.ARCHIVE_AFTER_DAYS = 0
+            swept = db.sweep_posts()
+            print(f"{history:>8} sweep: {swept} in {time.perf_counter() - start:.1f} s")
+            for name, (_, live) in queries.items():
+                rows, ms = timed(live)
+                print(f"{history:>8} {name:>8} {'swept':>7} {rows:>7} {ms:>8.2f}")
+            db._manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: listing waste posts while the number of stored images grows.
+
+Compares the metadata-only projection used by the map/API list views against
+the old `SELECT *` behaviour, reporting latency and peak Python memory.
+Pass `--inline-blobs` to store images inline in `image_blob` like databases
+created before the image store was introduced.
+
+Run from the repository root:
+    python benchmarks/bench_list_posts.py --sizes 100 500 2000 --image-kb 512
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+def populate(start: int, count: int, image_kb: int, inline_blobs: bool):
+    blob = os.urandom(image_kb * 1024)
+    analysis = {
+        "main_composition": "Nasi, Sayuran",
+        "estimated_weight_kg": 1.5,
+        "suitability_tags": ["Maggot BSF", "Pupuk Kompos"],
+    }
+    for i in range(start, start + count):
+        image_hash = hashlib.sha256(str(i).encode()).hexdigest()
+        post_id = db.add_waste_post(db.ProviderType.RESTO, -6.2 + i * 1e-5, 106.8, image_hash, analysis)
+        if inline_blobs:
+            conn = db.get_db_connection()
+            conn.execute("UPDATE waste_posts SET image_hash = NULL, image_blob = ? WHERE id = ?", (blob, post_id))
+            conn.commit()
+            conn.close()
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--image-kb", type=int, default=512)
+    parser.add_argument("--inline-blobs", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'posts':>8} {'mode':>10} {'rows':>8} {'ms':>10} {'peak MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            populate(populated, size - populated, args.image_kb, args.inline_blobs)
+            populated = size
+            for mode, columns in (("metadata", db.POST_LIST_COLUMNS), ("select *", db.POST_COLUMNS)):
+                rows, elapsed, peak = measure(lambda: db.get_waste_posts(columns=columns))
+                print(f"{size:>8} {mode:>10} {rows:>8} {elapsed * 1000:>10.1f} {peak / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
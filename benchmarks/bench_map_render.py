@@ -0,0 +1,101 @@
+"""
+Benchmark: seeker map render time vs. post count. Compares the previous
+seeker map (a folium.Marker with an f-string popup per post) with the
+current one (popups from POPUP_TEMPLATE, posts shipped as one
+FastMarkerCluster data array), split into popup rendering, building the
+folium map and serializing it to HTML (what st_folium sends to the browser).
+
+On a cached rerun main.py skips the popup and row work entirely; only the
+build and HTML columns of the current map are paid.
+
+Run from the repository root:
+    python benchmarks/bench_map_render.py --sizes 100 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium
+from folium.plugins import MarkerCluster
+
+import db
+import map_view
+
+
+def make_posts(count: int) -> list:
+    tags = [t.value for t in db.SuitabilityTag]
+    return [
+        {
+            'id': post_id,
+            'provider_type': random.choice(list(db.ProviderType)).value,
+            'waste_category': random.choice(list(db.WasteCategory)).value,
+            'suitable_for': ", ".join(random.sample(tags, 2)),
+            'weight_est': round(random.uniform(0.5, 20), 1),
+            'lat': -6.2 + random.uniform(-0.05, 0.05),
+            'lon': 106.8 + random.uniform(-0.05, 0.05),
+        }
+        for post_id in range(1, count + 1)
+    ]
+
+
+def build_legacy_map(posts: list, popups: dict) -> folium.Map:
+    # The seeker map before the marker rows: one folium.Marker per post
+    m = folium.Map(location=[-6.2, 106.8], zoom_start=15, tiles="CartoDB positron")
+    marker_cluster = MarkerCluster().add_to(m)
+    for post in posts:
+        folium.Marker(
+            location=[post['lat'], post['lon']],
+            popup=folium.Popup(popups[post['id']], max_width=300),
+            tooltip=f"{post['waste_category']}",
+            icon=folium.Icon(color=map_view.get_marker_color(post), icon="leaf", prefix="fa"),
+        ).add_to(marker_cluster)
+    return m
+
+
+def ms_since(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(label: str, size: int, prepare, build):
+    start = time.perf_counter()
+    prepared = prepare()
+    prepare_ms = ms_since(start)
+
+    start = time.perf_counter()
+    m = build(prepared)
+    build_ms = ms_since(start)
+
+    start = time.perf_counter()
+    html = m.get_root().render()
+    html_ms = ms_since(start)
+    print(f"{label:>8} {size:>6} {prepare_ms:>10.1f} {build_ms:>9.1f} {html_ms:>8.1f} {len(html) / 1024:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--skip-legacy", action="store_true", help="the legacy map takes seconds at 5000 posts")
+    args = parser.parse_args()
+
+    print(f"{'map':>8} {'posts':>6} {'popups ms':>10} {'build ms':>9} {'html ms':>8} {'html KB':>8}")
+    for size in args.sizes:
+        posts = make_posts(size)
+        if not args.skip_legacy:
+            measure(
+                "legacy", size,
+                lambda: {post['id']: map_view.render_popup(post) for post in posts},
+                lambda popups: build_legacy_map(posts, popups),
+            )
+        measure(
+            "current", size,
+            lambda: [map_view.post_marker_row(post, map_view.render_popup(post)) for post in posts],
+            lambda rows: map_view.build_seeker_map([-6.2, 106.8], 15, [], rows),
+        )
+
+
+if __name__ == "__main__":
+    main()
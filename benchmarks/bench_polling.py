@@ -0,0 +1,70 @@
+"""
+Benchmark: steady-state polling cost, full re-download vs `since` delta feed
+and keyset pages, as the table grows.
+
+Each poll round adds a fixed number of new posts; the delta poll's bytes and
+time should track that number, while the full poll tracks the table size.
+
+Run from the repository root:
+    python benchmarks/bench_polling.py --sizes 10000 100000 --new-per-poll 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+def populate(count: int):
+    conn = db.get_db_connection()
+    conn.executemany(
+        "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, ai_analysis, expires_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', '+3 days'))",
+        [('Restoran', 'Nasi', 'Maggot BSF', 1.5, -6.2, 106.8, '{"main_composition": "Nasi"}')] * count,
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(func):
+    start = time.perf_counter()
+    posts = func()
+    elapsed = time.perf_counter() - start
+    return len(posts), len(json.dumps(posts)), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--new-per-poll", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'posts':>8} {'poll':>8} {'rows':>7} {'KB':>9} {'ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            populate(size - populated)
+            populated = size
+            latest_id = db.get_waste_posts(columns=('id',), limit=1)[0]['id']
+            populate(args.new_per_poll)
+            populated += args.new_per_poll
+            middle_id = latest_id // 2
+            for poll, func in (
+                ("full", lambda: db.get_waste_posts()),
+                ("since", lambda: db.get_waste_posts(since=latest_id)),
+                ("page", lambda: db.get_waste_posts(after_id=middle_id, limit=args.page_size)),
+            ):
+                rows, size_bytes, elapsed = timed(func)
+                print(f"{size:>8} {poll:>8} {rows:>7} {size_bytes / 1024:>9.1f} {elapsed * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: post_index (in-memory arrays, NumPy scans) against the SQL path
+(db.get_waste_posts / db.get_nearby_posts on a warm connection) for the
+queries the map and listings make, plus the index's build time, memory and
+incremental refresh cost after new posts and claims.
+
+Marker queries ask only for columns the index holds; the others read the
+remaining columns of the selected page from SQLite by primary key.
+
+Run from the repository root:
+    python benchmarks/bench_post_index.py --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import post_index
+
+CITIES = [(-6.2, 106.82), (-6.91, 107.61), (-7.25, 112.75), (3.59, 98.67), (-5.14, 119.42)]
+COMPONENTS = ['Nasi', 'Sayuran', 'Tulang Ayam', 'Kulit Pisang', 'Ampas Kopi', 'Ampas Tahu', 'Roti Basi', 'Dedak']
+JAKARTA_BBOX = (106.70, -6.30, 106.95, -6.10)
+VIEWPORT_BBOX = (106.80, -6.22, 106.84, -6.18)
+MARKER_COLUMNS = ('id', 'lat', 'lon', 'weight_est', 'waste_category')
+
+QUERIES = {
+    'page of 500': ('get_waste_posts', dict(limit=500)),
+    'tag, page': ('get_waste_posts', dict(filters=["Ikan Lele"], limit=500)),
+    'markers, city': ('get_waste_posts', dict(columns=MARKER_COLUMNS, bbox=JAKARTA_BBOX)),
+    'markers, street': ('get_waste_posts', dict(columns=MARKER_COLUMNS, bbox=VIEWPORT_BBOX)),
+    'markers + tag': ('get_waste_posts', dict(columns=MARKER_COLUMNS, bbox=JAKARTA_BBOX, filters=["Biogas"])),
+    'nearby 2 km': ('get_nearby_posts', dict(lat=-6.2, lon=106.82, radius_m=2000, limit=50)),
+    'nearby + tag': ('get_nearby_posts', dict(lat=-6.2, lon=106.82, radius_m=2000, limit=50, filters=["Biogas"])),
+}
+
+
+def populate(count: int, batch: int = 10000):
+    tags = [t.value for t in db.SuitabilityTag]
+    providers = [p.value for p in db.ProviderType]
+    conn = db.get_db_connection()
+    for start in range(0, count, batch):
+        cursor = conn.cursor()
+        for _ in range(min(batch, count - start)):
+            suitable = random.sample(tags, 2)
+            composition = random.choice(COMPONENTS)
+            analysis = {'main_composition': composition, 'suitability_tags': suitable, 'estimated_weight_kg': 1.5}
+            lat, lon = random.choice(CITIES)
+            cursor.execute(
+                "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon,"
+                " ai_analysis, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', '+3 days'))",
+                (random.choice(providers), composition, ", ".join(suitable), random.uniform(0.5, 10),
+                 random.gauss(lat, 0.08), random.gauss(lon, 0.08), json.dumps(analysis)),
+            )
+            cursor.executemany("INSERT INTO post_tags (tag, post_id) VALUES (?, ?)",
+                               [(tag, cursor.lastrowid) for tag in suitable])
+        conn.commit()
+    conn.close()
+
+
+def timed(func, repeat: int = 20) -> tuple:
+    result = func()  # warm the page cache
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return len(result), (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--changes", type=int, default=100, help="posts added and claimed before a refresh")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            populate(size - populated)
+            populated = size
+            index = post_index.LivePostIndex()
+            tracemalloc.start()
+            start = time.perf_counter()
+            index.build()
+            build_s = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            post_index._index = index
+            print(f"{size} posts: built in {build_s * 1000:.0f} ms, {index.nbytes / 2 ** 20:.1f} MiB of arrays "
+                  f"({index.nbytes / len(index):.0f} bytes/post, {index.nbytes / len(index) * 100000 / 2 ** 20:.1f} "
+                  f"MiB per 100k), peak {peak / 2 ** 20:.0f} MiB while building")
+
+            print(f"{'query':>16} {'rows':>6} {'SQL ms':>8} {'index ms':>9} {'speedup':>8}")
+            for name, (func, query) in QUERIES.items():
+                rows, sql_ms = timed(lambda: getattr(db, func)(**query))
+                index_rows, index_ms = timed(lambda: getattr(post_index, func)(**query))
+                assert rows == index_rows, (name, rows, index_rows)
+                print(f"{name:>16} {rows:>6} {sql_ms:>8.2f} {index_ms:>9.2f} {sql_ms / index_ms:>7.1f}x")
+
+            start = time.perf_counter()
+            for _ in range(100):
+                index.refresh()
+            idle_ms = (time.perf_counter() - start) * 10
+            for _ in range(args.changes):
+                lat, lon = random.choice(CITIES)
+                db.add_waste_post(db.ProviderType.PASAR, random.gauss(lat, 0.08), random.gauss(lon, 0.08), None,
+                                  {'main_composition': 'Nasi', 'suitability_tags': ['Biogas'], 'estimated_weight_kg': 2})
+            for post in db.get_waste_posts(columns=('id',), limit=args.changes):
+                db.claim_waste_post(post['id'])
+            start = time.perf_counter()
+            changed = index.refresh()
+            refresh_ms = (time.perf_counter() - start) * 1000
+            print(f"refresh: {idle_ms:.3f} ms with no changes, {refresh_ms:.1f} ms for {changed} changed posts\n")
+        db._manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
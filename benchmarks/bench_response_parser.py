@@ -0,0 +1,83 @@
+"""
+Benchmark: parse success rate and speed of model replies, the old
+fence-stripping `json.loads` vs `analysis_parser.parse_analysis`.
+
+The regression corpus (benchmarks/data/analysis_responses.jsonl) holds raw
+replies, one per line, marked `valid` if they contain a usable analysis.
+Grow it with real replies by running the app with ECOCYCLE_RESPONSE_LOG set
+and labelling the logged lines.
+
+Run from the repository root:
+    python benchmarks/bench_response_parser.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis_parser
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "analysis_responses.jsonl")
+
+
+def legacy_parse(raw_text: str) -> dict:
+    # The parser ai_service used before structured output
+    clean_json_str = raw_text.strip().replace('```json', '').replace('```', '').strip()
+    result = json.loads(clean_json_str)
+    if not isinstance(result, dict):
+        raise ValueError("Not an object")
+    return result
+
+
+def evaluate(parse, corpus: list) -> tuple:
+    parsed, false_accepts, failures = 0, 0, []
+    for entry in corpus:
+        try:
+            parse(entry['raw'])
+        except ValueError:
+            if entry['valid']:
+                failures.append(entry['case'])
+            continue
+        if entry['valid']:
+            parsed += 1
+        else:
+            false_accepts += 1
+    return parsed, false_accepts, failures
+
+
+def timed(parse, corpus: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in corpus:
+            try:
+                parse(entry['raw'])
+            except ValueError:
+                pass
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="list the cases each parser fails")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    valid = sum(entry['valid'] for entry in corpus)
+    print(f"{len(corpus)} replies, {valid} with a usable analysis")
+    print(f"{'parser':>8} {'parsed':>9} {'rate':>6} {'false ok':>9} {'us/reply':>9}")
+    for name, parse in (('legacy', legacy_parse), ('tolerant', analysis_parser.parse_analysis)):
+        parsed, false_accepts, failures = evaluate(parse, corpus)
+        per_reply = timed(parse, corpus, args.repeat)
+        print(f"{name:>8} {parsed:>4}/{valid:<4} {parsed / valid:>6.0%} {false_accepts:>9} {per_reply:>9.1f}")
+        if args.verbose and failures:
+            print("         failed: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: text search latency vs number of available posts. Compares a
+`LIKE` scan over the raw ai_analysis JSON (the only option without an index)
+with `db.search_posts` (FTS5, bm25 ranking), for a common word, three common
+words, a rare word (about 1 post in 1000), and the common word within a city
+bbox and a suitability tag.
+
+Run from the repository root:
+    python benchmarks/bench_search.py --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+COMPONENTS = [
+    'Nasi', 'Sayuran', 'Tulang Ayam', 'Kulit Pisang', 'Sayur Layu', 'Ampas Kopi', 'Ampas Tahu', 'Kulit Jeruk',
+    'Roti Basi', 'Mie', 'Kepala Ikan', 'Kulit Bawang', 'Dedak', 'Ampas Kelapa', 'Buah Busuk', 'Daun Kering',
+]
+WARNINGS = ['Aman', 'Mengandung plastik, pisahkan sebelum diolah', 'Berminyak, jangan untuk ikan', 'Pedas, tidak untuk ternak']
+TIPS = ['Cacah kecil agar cepat terurai.', 'Simpan di wadah tertutup.', 'Tiriskan air sebelum diberikan ke maggot.']
+CITIES = [(-6.2, 106.82), (-6.91, 107.61), (-7.25, 112.75), (3.59, 98.67), (-5.14, 119.42)]
+JAKARTA_BBOX = (106.70, -6.30, 106.95, -6.10)
+
+QUERIES = {
+    'common word': dict(text="nasi"),
+    'three words': dict(text="kepala ikan dedak"),
+    'rare word': dict(text="durian"),
+    'word + bbox': dict(text="nasi", bbox=JAKARTA_BBOX),
+    'word + tag': dict(text="kulit", filters=["Ikan Lele"]),
+}
+
+
+def populate(count: int, batch: int = 10000):
+    tags = [t.value for t in db.SuitabilityTag]
+    providers = [p.value for p in db.ProviderType]
+    conn = db.get_db_connection()
+    for start in range(0, count, batch):
+        rows, post_tags = [], []
+        for _ in range(min(batch, count - start)):
+            composition = ", ".join(random.sample(COMPONENTS, random.randint(1, 3)))
+            if random.random() < 0.001:
+                composition += ", Kulit Durian"
+            suitable = random.sample(tags, 2)
+            analysis = {
+                'is_organic_waste': True, 'main_composition': composition, 'estimated_weight_kg': 1.5,
+                'suitability_tags': suitable, 'safety_warning': random.choice(WARNINGS),
+                'handling_tip': random.choice(TIPS),
+            }
+            lat, lon = random.choice(CITIES)
+            rows.append((random.choice(providers), composition, ", ".join(suitable), random.uniform(0.5, 10),
+                         random.gauss(lat, 0.08), random.gauss(lon, 0.08), json.dumps(analysis), suitable))
+        cursor = conn.cursor()
+        for row in rows:
+            cursor.execute(
+                "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon,"
+                " ai_analysis, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', '+3 days'))",
+                row[:7],
+            )
+            post_tags.extend((tag, cursor.lastrowid) for tag in row[7])
+        cursor.executemany("INSERT INTO post_tags (tag, post_id) VALUES (?, ?)", post_tags)
+        conn.commit()
+    conn.close()
+
+
+def like_search(text: str, filters: list = None, bbox: tuple = None) -> list:
+    # The unindexed alternative: every word must appear in the raw JSON
+    where_clauses, params = [db.LIVE_POST_CLAUSE], []
+    for word in text.split():
+        where_clauses.append("ai_analysis LIKE ?")
+        params.append(f"%{word}%")
+    if filters:
+        where_clauses.append(f"id IN (SELECT post_id FROM post_tags WHERE tag IN ({', '.join('?' * len(filters))}))")
+        params.extend(filters)
+    if bbox:
+        db._add_bbox_clause(where_clauses, params, bbox)
+    query = (f"SELECT {', '.join(db.POST_LIST_COLUMNS)} FROM waste_posts WHERE {' AND '.join(where_clauses)}"
+             f" ORDER BY created_at DESC, id DESC LIMIT {db.SEARCH_DEFAULT_LIMIT}")
+    with db.pooled_connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def timed(func, repeat: int = 5) -> tuple:
+    result = func()  # warm the page cache
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return len(result), (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'posts':>8} {'query':>12} {'rows':>5} {'LIKE ms':>9} {'FTS5 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            populate(size - populated)
+            populated = size
+            print(f"{size:>8} populated in {time.perf_counter() - start:.0f} s")
+            for name, query in QUERIES.items():
+                _, like_ms = timed(lambda: like_search(**query))
+                rows, fts_ms = timed(lambda: db.search_posts(**query))
+                print(f"{size:>8} {name:>12} {rows:>5} {like_ms:>9.1f} {fts_ms:>8.2f}")
+        db._manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: viewport (bbox) and radius queries as the nationwide post count grows.
+
+Posts are scattered uniformly over Indonesia, so a fixed city viewport holds
+roughly the same number of posts at every table size; query time should
+track that, not the total row count.
+
+Run from the repository root:
+    python benchmarks/bench_spatial.py --sizes 10000 100000 500000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+# Rough bounding box of Indonesia and a Jakarta-sized viewport
+COUNTRY_BBOX = (95.0, -11.0, 141.0, 6.0)
+CITY_BBOX = (106.70, -6.30, 106.95, -6.10)
+CITY_CENTER = (-6.2088, 106.8456)
+
+
+def populate(count: int):
+    min_lon, min_lat, max_lon, max_lat = COUNTRY_BBOX
+    rows = [
+        (db.ProviderType.RESTO.value, 'Nasi', 'Maggot BSF', 1.5,
+         random.uniform(min_lat, max_lat), random.uniform(min_lon, max_lon))
+        for _ in range(count)
+    ]
+    conn = db.get_db_connection()
+    conn.executemany(
+        "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, expires_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, datetime('now', '+3 days'))",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(func, repeat: int = 20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return len(result), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--radius-m", type=float, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'posts':>9} {'query':>8} {'rows':>7} {'ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            populate(size - populated)
+            populated = size
+            queries = {
+                "all": lambda: db.get_waste_posts(),
+                "bbox": lambda: db.get_waste_posts(bbox=CITY_BBOX),
+                "nearby": lambda: db.get_nearby_posts(*CITY_CENTER, args.radius_m, limit=100),
+            }
+            for name, func in queries.items():
+                rows, elapsed = timed(func, repeat=3 if name == "all" else 20)
+                print(f"{size:>9} {name:>8} {rows:>7} {elapsed * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
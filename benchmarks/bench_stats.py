@@ -0,0 +1,95 @@
+"""
+Benchmark: supply dashboard latency vs history size. Compares computing the
+`/stats` totals with GROUP BY scans over waste_posts (what the landing page
+would need without summary tables) against `db.get_post_stats`, which reads
+the incrementally maintained post_stats table. Also reports what the stats
+upkeep adds to each insert.
+
+Run from the repository root:
+    python benchmarks/bench_stats.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+CATEGORIES = ['Nasi, Sayuran', 'Kulit Buah', 'Sisa Sayur', 'Tulang Ayam']
+CITIES = [(-6.2, 106.82), (-6.91, 107.61), (-7.25, 112.75), (3.59, 98.67), (-5.14, 119.42)]
+DAYS = [f"2025-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+
+SCAN_QUERIES = {
+    'total': "SELECT COUNT(*), SUM(weight_est) FROM waste_posts",
+    'category': "SELECT waste_category, COUNT(*), SUM(weight_est) FROM waste_posts GROUP BY waste_category",
+    'provider_type': "SELECT provider_type, COUNT(*), SUM(weight_est) FROM waste_posts GROUP BY provider_type",
+    'tag': "SELECT t.tag, COUNT(*), SUM(p.weight_est) FROM post_tags t JOIN waste_posts p ON p.id = t.post_id GROUP BY t.tag",
+    'day': "SELECT date(created_at) AS day, COUNT(*), SUM(weight_est) FROM waste_posts GROUP BY day ORDER BY day DESC LIMIT 30",
+}
+
+
+def populate(count: int) -> tuple:
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    tags = [t.value for t in db.SuitabilityTag]
+    insert_s = stats_s = 0.0
+    for _ in range(count):
+        city_lat, city_lon = random.choice(CITIES)
+        lat, lon = random.gauss(city_lat, 0.08), random.gauss(city_lon, 0.08)
+        provider = random.choice(list(db.ProviderType)).value
+        category, weight, day = random.choice(CATEGORIES), random.uniform(0.5, 10), random.choice(DAYS)
+        post_tags = random.sample(tags, 2)
+        start = time.perf_counter()
+        cursor.execute(
+            "INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (provider, category, ", ".join(post_tags), weight, lat, lon, day),
+        )
+        db._insert_post_tags(cursor, cursor.lastrowid, post_tags)
+        middle = time.perf_counter()
+        db._add_to_post_stats(cursor, provider, category, post_tags, weight, lat, lon, day)
+        insert_s += middle - start
+        stats_s += time.perf_counter() - middle
+    conn.commit()
+    conn.close()
+    return insert_s / max(count, 1), stats_s / max(count, 1)
+
+
+def scan_stats() -> dict:
+    with db.pooled_connection() as conn:
+        return {name: conn.execute(query).fetchall() for name, query in SCAN_QUERIES.items()}
+
+
+def timed(func, repeat: int = 20) -> float:
+    func()  # warm the page cache
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'posts':>8} {'scan ms':>9} {'summary ms':>11} {'insert us':>10} {'+stats us':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            insert_s, stats_s = populate(size - populated)
+            populated = size
+            scan_ms = timed(scan_stats)
+            summary_ms = timed(db.get_post_stats)
+            print(f"{size:>8} {scan_ms:>9.2f} {summary_ms:>11.2f} {insert_s * 1e6:>10.0f} {stats_s * 1e6:>10.0f}")
+        db._manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
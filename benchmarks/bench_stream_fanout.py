@@ -0,0 +1,84 @@
+"""
+Load test: live-update fan-out latency with many idle subscribers.
+
+Opens N subscriptions on a `live_updates.PostBroker` (what each SSE client of
+/waste_posts/stream holds), commits posts from a worker thread like a normal
+writer and measures commit -> delivery latency for every subscriber, plus the
+memory held per idle subscriber.
+
+Run from the repository root:
+    python benchmarks/bench_stream_fanout.py --subscribers 1000 5000 --posts 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import live_updates
+
+ANALYSIS = {"main_composition": "Nasi", "estimated_weight_kg": 1.0, "suitability_tags": ["Maggot BSF"]}
+
+
+async def run(subscriber_count: int, post_count: int):
+    committed_at = {}
+    latencies = []
+
+    def on_commit(post_id):
+        committed_at[post_id] = time.perf_counter()
+    # Registered before the broker's own listener so the timestamp exists first
+    db.add_commit_listener(on_commit)
+    broker = live_updates.PostBroker()
+    await broker.start()
+
+    async def consume(subscription):
+        for _ in range(post_count):
+            post_id, _ = await subscription.queue.get()
+            latencies.append(time.perf_counter() - committed_at[post_id])
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    subscriptions = [broker.subscribe() for _ in range(subscriber_count)]
+    consumers = [asyncio.create_task(consume(s)) for s in subscriptions]
+    await asyncio.sleep(0.1)
+    idle_bytes = (tracemalloc.get_traced_memory()[0] - before) / subscriber_count
+    tracemalloc.stop()
+
+    def write_posts():
+        for _ in range(post_count):
+            db.add_waste_post(db.ProviderType.RESTO, -6.2, 106.8, None, ANALYSIS)
+            time.sleep(0.05)
+    await asyncio.to_thread(write_posts)
+    await asyncio.gather(*consumers)
+
+    db.remove_commit_listener(on_commit)
+    await broker.stop()
+    latencies.sort()
+    return idle_bytes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--posts", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'subs':>7} {'deliveries':>11} {'KB/sub':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        for count in args.subscribers:
+            idle_bytes, latencies = asyncio.run(run(count, args.posts))
+            p50 = statistics.median(latencies)
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            print(f"{count:>7} {len(latencies):>11} {idle_bytes / 1024:>8.2f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f} {latencies[-1] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: tag-filtered queries, indexed `post_tags` lookup vs the old
+`suitable_for LIKE '%tag%'` scan, as the table grows.
+
+Every post gets common tags except a fixed number tagged 'Biogas', so the
+Biogas result size stays constant while the table grows; the indexed lookup
+should stay flat while the LIKE scan grows linearly.
+
+Run from the repository root:
+    python benchmarks/bench_tags.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+COMMON_TAGS = ['Maggot BSF', 'Ayam/Unggas', 'Ikan Lele', 'Pupuk Kompos']
+RARE_TAG = 'Biogas'
+RARE_COUNT = 200
+
+
+def populate(start: int, count: int):
+    conn = db.get_db_connection()
+    posts, tags = [], []
+    for post_id in range(start + 1, start + count + 1):
+        post_tags = random.sample(COMMON_TAGS, 2)
+        if post_id <= RARE_COUNT:
+            post_tags = [RARE_TAG]
+        posts.append((post_id, 'Restoran', 'Nasi', ", ".join(post_tags), 1.0, -6.2, 106.8))
+        tags.extend((tag, post_id) for tag in post_tags)
+    conn.executemany(
+        "INSERT INTO waste_posts (id, provider_type, waste_category, suitable_for, weight_est, lat, lon, expires_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', '+3 days'))",
+        posts,
+    )
+    conn.executemany("INSERT INTO post_tags (tag, post_id) VALUES (?, ?)", tags)
+    conn.commit()
+    conn.close()
+
+
+def like_scan(tag: str):
+    conn = db.get_db_connection()
+    rows = conn.execute(
+        "SELECT id, lat, lon FROM waste_posts WHERE suitable_for LIKE ? ORDER BY created_at DESC", (f"%{tag}%",)
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def timed(func, repeat: int = 10):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return len(result), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'posts':>9} {'method':>8} {'rows':>6} {'ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "bench.db")
+        db.init_db()
+        populated = 0
+        for size in sorted(args.sizes):
+            populate(populated, size - populated)
+            populated = size
+            for method, func in (
+                ("like", lambda: like_scan(RARE_TAG)),
+                ("index", lambda: db.get_waste_posts(filters=[RARE_TAG], columns=('id', 'lat', 'lon'))),
+            ):
+                rows, elapsed = timed(func)
+                print(f"{size:>9} {method:>8} {rows:>6} {elapsed * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: payload size and encode time of a `/waste_posts` page per wire
+format, on synthetic rows shaped like `db.get_waste_posts` results:
+
+- json: the previous body (stdlib json, one object per post)
+- orjson: the same bytes from wire_format.encode_json
+- columnar: arrays per field, categories dictionary-encoded, via orjson
+- msgpack: the columnar table as MessagePack
+
+each uncompressed, gzip and brotli (wire_format.compress settings), for all
+list columns and for a map-marker projection (`fields=`).
+
+Run from the repository root:
+    python benchmarks/bench_wire_format.py --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import wire_format
+
+MARKER_FIELDS = ('id', 'lat', 'lon', 'waste_category', 'weight_est', 'provider_type')
+CATEGORIES = ['Nasi, Sayuran', 'Kulit Buah', 'Sisa Sayur', 'Tulang Ayam', 'Ampas Kopi']
+
+
+def make_posts(count: int) -> list:
+    tags = [t.value for t in db.SuitabilityTag]
+    posts = []
+    for i in range(count, 0, -1):
+        category, weight = random.choice(CATEGORIES), round(random.uniform(0.5, 20), 1)
+        suitable = ", ".join(random.sample(tags, 2))
+        analysis = {
+            'waste_category': category, 'weight_est': weight, 'suitable_for': suitable.split(", "),
+            'contamination': random.choice(["Tidak ada", "Sedikit plastik"]), 'confidence': round(random.random(), 2),
+        }
+        posts.append({
+            'id': i,
+            'provider_type': random.choice(list(db.ProviderType)).value,
+            'waste_category': category,
+            'suitable_for': suitable,
+            'weight_est': weight,
+            'lat': random.gauss(-6.2, 0.08),
+            'lon': random.gauss(106.82, 0.08),
+            'contact_info': f"08{random.randint(10 ** 9, 10 ** 10 - 1)}",
+            'image_hash': f"{random.getrandbits(256):064x}",
+            'ai_analysis': json.dumps(analysis, ensure_ascii=False),
+            'created_at': f"2025-11-{random.randint(1, 28):02d} {random.randint(0, 23):02d}:{random.randint(0, 59):02d}:00",
+            'status': 'available',
+            'expires_at': "2025-12-01 00:00:00",
+        })
+    return posts
+
+
+def stdlib_json(rows: list, fields: tuple) -> bytes:
+    return json.dumps(rows, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def encoders() -> dict:
+    formats = {
+        'json': stdlib_json,
+        'orjson': lambda rows, fields: wire_format.encode_rows(rows, fields, wire_format.JSON_MEDIA_TYPE),
+        'columnar': lambda rows, fields: wire_format.encode_rows(rows, fields, wire_format.COLUMNAR_MEDIA_TYPE),
+    }
+    if wire_format.msgpack is not None:
+        formats['msgpack'] = lambda rows, fields: wire_format.encode_rows(rows, fields, wire_format.MSGPACK_MEDIA_TYPE)
+    return formats
+
+
+def timed(func, *args, repeat: int = 3) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    codings = ['gzip', 'br'] if wire_format.brotli is not None else ['gzip']
+    print(f"{'posts':>7} {'fields':>7} {'format':>9} {'KiB':>8} {'enc ms':>7}"
+          + "".join(f" {coding + ' KiB':>9} {'+ms':>6}" for coding in codings))
+    for size in args.sizes:
+        posts = make_posts(size)
+        for label, fields in (('all', db.POST_LIST_COLUMNS), ('marker', MARKER_FIELDS)):
+            rows = [{field: post[field] for field in fields} for post in posts]
+            for name, encode in encoders().items():
+                body, encode_ms = timed(encode, rows, fields)
+                line = f"{size:>7} {label:>7} {name:>9} {len(body) / 1024:>8.0f} {encode_ms:>7.1f}"
+                for coding in codings:
+                    (compressed, _), compress_ms = timed(wire_format.compress, body, coding)
+                    line += f" {len(compressed) / 1024:>9.0f} {compress_ms:>6.1f}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,59 @@
 import sqlite3
 import json
+import io
+import math
+import re
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from enum import Enum
 
+import numpy as np
+from PIL import Image
+
+import geo
+import image_store
+import metrics
+
 DB_FILE = "ecocycle.db"
+# Cold storage for posts moved out of waste_posts by archive_posts, and their images
+ARCHIVE_DB_FILE = "ecocycle_archive.db"
+ARCHIVE_IMAGE_DIR = "image_archive"
+
+# Number of worker threads (each with its own connection) that run blocking
+# queries for async callers (see run_async).
+DB_POOL_SIZE = 8
+
+# How long a connection waits for a competing writer before "database is locked"
+DB_BUSY_TIMEOUT_MS = 5000
+
+# Applied to every connection. WAL lets readers proceed while a write is in
+# progress; synchronous=NORMAL is durable across application crashes in WAL
+# mode and only fsyncs at checkpoints.
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': DB_BUSY_TIMEOUT_MS,
+    'cache_size': -32000,  # KiB, i.e. 32 MB page cache per connection
+    'mmap_size': 268435456,  # 256 MB of the database file memory-mapped for reads
+    'temp_store': 'MEMORY',
+}
+
+# Every connection counts SQLite VM instructions in blocks of this size (via
+# the progress handler); the per-function total in /metrics is a proxy for
+# the rows a query had to scan, which latency alone does not show.
+DB_PROGRESS_STEPS = 1000
+
+DB_QUERY_SECONDS = metrics.Histogram("ecocycle_db_query_seconds", "Latency of db.py functions.", ("query",))
+DB_ROWS_RETURNED = metrics.Counter("ecocycle_db_rows_returned_total", "Rows returned by db.py functions.", ("query",))
+DB_VM_STEPS = metrics.Counter(
+    "ecocycle_db_vm_steps_total", "SQLite VM instructions run by db.py functions (proxy for rows scanned).", ("query",)
+)
+DB_BLOB_BYTES_READ = metrics.Counter("ecocycle_db_blob_bytes_read_total", "Inline image_blob bytes read from waste_posts.")
 
 class ProviderType(Enum):
     RUMAH_TANGGA = 'Rumah Tangga'
@@ -15,17 +66,226 @@ class WasteCategory(Enum):
     LIMBAH_DAPUR = 'Limbah Dapur'
     TAMAN = 'Taman'
 
+class PostStatus(Enum):
+    """Lifecycle of a post: only AVAILABLE ones are listed; the others wait for archive_posts."""
+    AVAILABLE = 'available'
+    CLAIMED = 'claimed'
+    EXPIRED = 'expired'
+
+class SuitabilityTag(Enum):
+    """The fixed suitability vocabulary the AI chooses from (see `ai_service.SYSTEM_PROMPT`)."""
+    MAGGOT_BSF = 'Maggot BSF'
+    AYAM_UNGGAS = 'Ayam/Unggas'
+    IKAN_LELE = 'Ikan Lele'
+    PUPUK_KOMPOS = 'Pupuk Kompos'
+    BIOGAS = 'Biogas'
+
+# Columns returned by list views (maps, API listings). `image_blob` is left out
+# on purpose so that polling the map never pulls image bytes out of SQLite.
+POST_LIST_COLUMNS = (
+    'id', 'provider_type', 'waste_category', 'suitable_for', 'weight_est',
+    'lat', 'lon', 'contact_info', 'image_hash', 'ai_analysis', 'created_at',
+    'status', 'expires_at',
+)
+POST_COLUMNS = POST_LIST_COLUMNS + ('image_blob',)
+
+# waste_posts columns copied to waste_posts_archive, with their types
+ARCHIVE_COLUMNS = (
+    ('id', 'INTEGER PRIMARY KEY'), ('provider_type', 'TEXT'), ('waste_category', 'TEXT'),
+    ('suitable_for', 'TEXT'), ('weight_est', 'REAL'), ('lat', 'REAL'), ('lon', 'REAL'),
+    ('contact_info', 'TEXT'), ('image_blob', 'BLOB'), ('ai_analysis', 'TEXT'), ('created_at', 'TIMESTAMP'),
+    ('image_hash', 'TEXT'), ('status', 'TEXT'), ('expires_at', 'TIMESTAMP'), ('status_changed_at', 'TIMESTAMP'),
+)
+
+# Bumped whenever init_db gains a one-off data migration (tracked in PRAGMA user_version)
+SCHEMA_VERSION = 9
+
+# Organic waste is perishable: a post expires POST_TTL_HOURS after it is
+# created. Claimed and expired posts stay in waste_posts for ARCHIVE_AFTER_DAYS,
+# then sweep_posts moves them to the archive, SWEEP_BATCH_SIZE rows at a time.
+POST_TTL_HOURS = 72
+ARCHIVE_AFTER_DAYS = 7
+SWEEP_BATCH_SIZE = 500
+# post_changes entries kept by the sweep; a post_index further behind rebuilds
+POST_CHANGES_KEEP = 100000
+# Condition selecting listable posts. It is inlined (not a bound parameter) so
+# SQLite can answer list queries from the partial index idx_waste_posts_live;
+# the unary + keeps the planner from range-scanning the expiry index instead.
+LIVE_POST_CLAUSE = "status = 'available' AND +expires_at > CURRENT_TIMESTAMP"
+
+# Map clustering: aggregates are kept per web-mercator tile ("cell") for every
+# level in CLUSTER_LEVELS. A map at zoom z is clustered with cells at level
+# z + CLUSTER_CELL_ZOOM_OFFSET (about 4x4 cells per 256px map tile); above
+# CLUSTER_MAX_ZOOM clients should draw individual posts instead.
+CLUSTER_CELL_ZOOM_OFFSET = 2
+CLUSTER_MAX_ZOOM = 14
+CLUSTER_LEVELS = range(CLUSTER_CELL_ZOOM_OFFSET, CLUSTER_MAX_ZOOM + CLUSTER_CELL_ZOOM_OFFSET + 1)
+_CLUSTER_LEVELS_ARRAY = np.array(CLUSTER_LEVELS)
+# Cells are further split by the post's set of SuitabilityTag values (one bit
+# each), so tag-filtered maps read aggregates too; tags outside the vocabulary
+# have no bit, and filters on them are aggregated from the posts per call.
+CLUSTER_TAG_BITS = {tag.value: 1 << i for i, tag in enumerate(SuitabilityTag)}
+
+# Supply dashboard: post_stats keeps a post count and total weight_est per
+# key of each dimension below, updated with every insert, so totals are read
+# in constant time however long the history is. The 'total' dimension has a
+# single '' key; a post counts towards every one of its tags. 'category' is
+# the first component of the free-text composition (see _stats_category).
+STATS_DIMENSIONS = ('total', 'category', 'provider_type', 'tag', 'day', 'geohash')
+STATS_GEOHASH_PRECISION = 5
+# Rows returned per dimension by get_post_stats
+STATS_DEFAULT_LIMIT = 30
+
+# Full-text search (search_posts): FTS5 columns with their bm25 weights. The
+# composition is what seekers search for; warnings and tips rank lower.
+SEARCH_COLUMN_WEIGHTS = {
+    'main_composition': 4.0,
+    'waste_category': 2.0,
+    'safety_warning': 1.0,
+    'handling_tip': 1.0,
+}
+SEARCH_DEFAULT_LIMIT = 50
+# Newest matching posts ranked per search (see search_posts)
+SEARCH_CANDIDATES = 1000
+
+# Callables invoked with the new post id after add_waste_post commits (see add_commit_listener)
+_commit_listeners = []
+
+def add_commit_listener(callback):
+    """
+    Registers `callback(post_id)` to run after every committed add_waste_post in
+    this process. Callbacks may be invoked from any thread and must be quick.
+    """
+    _commit_listeners.append(callback)
+
+def remove_commit_listener(callback):
+    if callback in _commit_listeners:
+        _commit_listeners.remove(callback)
+
+def _notify_commit(post_id: int):
+    for callback in list(_commit_listeners):
+        try:
+            callback(post_id)
+        except Exception as e:
+            print(f"Commit listener failed: {e}")
+
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_FILE)
+    """
+    Establishes a new connection to the SQLite database with DB_PRAGMAS applied.
+    Prefer `pooled_connection()`, which reuses connections.
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    conn.set_progress_handler(_count_vm_steps, DB_PROGRESS_STEPS)
     return conn
 
+# Blocks of DB_PROGRESS_STEPS VM instructions run on this thread
+_vm_steps = threading.local()
+
+def _count_vm_steps():
+    _vm_steps.count = getattr(_vm_steps, 'count', 0) + 1
+    return 0
+
+def _instrumented(func):
+    """Records the latency, VM steps and returned rows (for list results) of a db function in /metrics."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        steps = getattr(_vm_steps, 'count', 0)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, query=name)
+            DB_VM_STEPS.inc((getattr(_vm_steps, 'count', 0) - steps) * DB_PROGRESS_STEPS, query=name)
+        if isinstance(result, list):
+            DB_ROWS_RETURNED.inc(len(result), query=name)
+        return result
+
+    return wrapper
+
+class _ThreadConnection:
+    """A thread's connection; referenced only from that thread's local storage, so it is collected when the thread exits."""
+    __slots__ = ('conn', 'db_file', 'depth', 'close', '__weakref__')
+
+class ConnectionManager:
+    """
+    Hands out one long-lived SQLite connection per thread, so every query
+    after the first on a thread skips connecting and re-applying pragmas and
+    keeps a warm page cache. Nested use on the same thread shares the
+    connection; an uncommitted transaction is rolled back when the outermost
+    block exits. Connections opened for a different `DB_FILE` are replaced,
+    and a connection is closed when its thread exits (Streamlit reruns and
+    `asyncio.to_thread` come and go on fresh threads).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def _thread_connection(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None and holder.db_file != DB_FILE:
+            holder.close()
+            holder = None
+        if holder is None:
+            holder = _ThreadConnection()
+            holder.conn, holder.db_file, holder.depth = get_db_connection(), DB_FILE, 0
+            holder.close = weakref.finalize(holder, self._close, holder.conn)
+            with self._lock:
+                self._connections.add(holder.conn)
+            self._local.holder = holder
+        return holder
+
+    def _close(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        holder = self._thread_connection()
+        holder.depth += 1
+        try:
+            yield holder.conn
+        finally:
+            holder.depth -= 1
+            if holder.depth == 0 and holder.conn.in_transaction:
+                # Never leave a half-finished transaction on a reused connection
+                holder.conn.rollback()
+
+    def close_all(self):
+        """Closes every managed connection (e.g. before deleting the database file)."""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+_manager = ConnectionManager()
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="ecocycle-db")
+
+def pooled_connection():
+    """Context manager yielding this thread's reusable connection; commit explicitly before leaving it."""
+    return _manager.connection()
+
+async def run_async(func, *args, **kwargs):
+    """
+    Runs a blocking db function (e.g. `get_waste_posts`) on the bounded db
+    thread pool, so async callers never block the event loop on SQLite.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(metrics.profile_call(func), *args, **kwargs))
+
 def init_db():
     """Initializes the database and creates the waste_posts table if it doesn't exist."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS waste_posts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             provider_type TEXT NOT NULL,
@@ -37,27 +297,405 @@ def init_db():
             contact_info TEXT,
             image_blob BLOB,
             ai_analysis TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            image_hash TEXT,
+            status TEXT NOT NULL DEFAULT 'available',
+            expires_at TIMESTAMP DEFAULT (datetime('now', '+{POST_TTL_HOURS} hours')),
+            status_changed_at TIMESTAMP
+        );
+    """)
+    # Databases created before images moved to the image store lack `image_hash`,
+    # those created before the post lifecycle lack the status columns (SQLite
+    # cannot add `expires_at` with its default, so expire_posts also takes NULL).
+    columns = [row['name'] for row in cursor.execute("PRAGMA table_info(waste_posts)")]
+    if 'image_hash' not in columns:
+        cursor.execute("ALTER TABLE waste_posts ADD COLUMN image_hash TEXT")
+    if 'status' not in columns:
+        cursor.execute("ALTER TABLE waste_posts ADD COLUMN status TEXT NOT NULL DEFAULT 'available'")
+        cursor.execute("ALTER TABLE waste_posts ADD COLUMN expires_at TIMESTAMP")
+        cursor.execute("ALTER TABLE waste_posts ADD COLUMN status_changed_at TIMESTAMP")
+    # Listings are ordered newest first and paged/polled by created_at. The
+    # index only covers available posts, so its size tracks the live supply;
+    # the other two serve the expiry and archive sweeps.
+    cursor.executescript("""
+        DROP INDEX IF EXISTS idx_waste_posts_created_at;
+        CREATE INDEX IF NOT EXISTS idx_waste_posts_live ON waste_posts(created_at, id) WHERE status = 'available';
+        CREATE INDEX IF NOT EXISTS idx_waste_posts_expiry ON waste_posts(expires_at) WHERE status = 'available';
+        CREATE INDEX IF NOT EXISTS idx_waste_posts_inactive ON waste_posts(status_changed_at) WHERE status != 'available';
+    """)
+
+    # Spatial index: an R*Tree over each available post's (point) bounding box,
+    # kept in sync with waste_posts by triggers.
+    cursor.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS waste_posts_rtree USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon
         );
+        CREATE TRIGGER IF NOT EXISTS waste_posts_rtree_insert AFTER INSERT ON waste_posts BEGIN
+            INSERT INTO waste_posts_rtree VALUES (new.id, new.lat, new.lat, new.lon, new.lon);
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_rtree_update AFTER UPDATE OF lat, lon ON waste_posts BEGIN
+            UPDATE waste_posts_rtree
+            SET min_lat = new.lat, max_lat = new.lat, min_lon = new.lon, max_lon = new.lon
+            WHERE id = new.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_rtree_delete AFTER DELETE ON waste_posts BEGIN
+            DELETE FROM waste_posts_rtree WHERE id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_rtree_inactive AFTER UPDATE OF status ON waste_posts
+        WHEN new.status != 'available' BEGIN
+            DELETE FROM waste_posts_rtree WHERE id = new.id;
+        END;
     """)
+
+    # Suitability tags of available posts, one row per (tag, post). The primary
+    # key doubles as the tag -> posts index used by filtered queries.
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS post_tags (
+            tag TEXT NOT NULL,
+            post_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, post_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_post_tags_post_id ON post_tags(post_id);
+        CREATE TRIGGER IF NOT EXISTS waste_posts_tags_delete AFTER DELETE ON waste_posts BEGIN
+            DELETE FROM post_tags WHERE post_id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_tags_inactive AFTER UPDATE OF status ON waste_posts
+        WHEN new.status != 'available' BEGIN
+            DELETE FROM post_tags WHERE post_id = new.id;
+        END;
+    """)
+
+    # Full-text index over the analysis text of available posts, kept in sync
+    # by triggers. It is contentless (the text stays in waste_posts), so a row
+    # is removed with FTS5's 'delete' command, which needs the indexed values;
+    # the triggers recompute them from the unchanged row.
+    fts_columns = ", ".join(SEARCH_COLUMN_WEIGHTS)
+    cursor.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS waste_posts_fts USING fts5(
+            {fts_columns}, content='', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS waste_posts_fts_insert AFTER INSERT ON waste_posts
+        WHEN new.status = 'available' BEGIN
+            INSERT INTO waste_posts_fts (rowid, {fts_columns}) VALUES (new.id, {_fts_values('new')});
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_fts_update AFTER UPDATE OF waste_category, ai_analysis ON waste_posts
+        WHEN old.status = 'available' AND new.status = 'available' BEGIN
+            INSERT INTO waste_posts_fts (waste_posts_fts, rowid, {fts_columns}) VALUES ('delete', old.id, {_fts_values('old')});
+            INSERT INTO waste_posts_fts (rowid, {fts_columns}) VALUES (new.id, {_fts_values('new')});
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_fts_delete AFTER DELETE ON waste_posts
+        WHEN old.status = 'available' BEGIN
+            INSERT INTO waste_posts_fts (waste_posts_fts, rowid, {fts_columns}) VALUES ('delete', old.id, {_fts_values('old')});
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_fts_inactive AFTER UPDATE OF status ON waste_posts
+        WHEN old.status = 'available' AND new.status != 'available' BEGIN
+            INSERT INTO waste_posts_fts (waste_posts_fts, rowid, {fts_columns}) VALUES ('delete', old.id, {_fts_values('old')});
+        END;
+    """)
+
+    # Per-cell aggregates of available posts for server-side clustering, split by
+    # waste_category so the dominant category of a cell can be picked, and by
+    # tag_mask (CLUSTER_TAG_BITS). Updated by add_waste_post and whenever a post
+    # is claimed or expires. Tables from before tag_mask are rebuilt below.
+    cluster_columns = [row['name'] for row in cursor.execute("PRAGMA table_info(cluster_cells)")]
+    if cluster_columns and 'tag_mask' not in cluster_columns:
+        cursor.execute("DROP TABLE cluster_cells")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cluster_cells (
+            level INTEGER NOT NULL,
+            cell_x INTEGER NOT NULL,
+            cell_y INTEGER NOT NULL,
+            waste_category TEXT NOT NULL,
+            tag_mask INTEGER NOT NULL,
+            post_count INTEGER NOT NULL,
+            total_weight REAL NOT NULL,
+            sum_lat REAL NOT NULL,
+            sum_lon REAL NOT NULL,
+            PRIMARY KEY (level, cell_x, cell_y, waste_category, tag_mask)
+        ) WITHOUT ROWID;
+    """)
+
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS post_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            post_count INTEGER NOT NULL,
+            total_weight REAL NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_post_stats_weight ON post_stats(dimension, total_weight);
+    """)
+
+    # Change counter for cache invalidation: bumped by triggers on every write
+    # to waste_posts, whichever code path (or process) makes it, along with the
+    # time of that write (HTTP Last-Modified).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if 'changed_at' not in [row['name'] for row in cursor.execute("PRAGMA table_info(data_versions)")]:
+        # Older databases: add the column and recreate the triggers that set it
+        cursor.executescript("""
+            ALTER TABLE data_versions ADD COLUMN changed_at TIMESTAMP;
+            UPDATE data_versions SET changed_at = CURRENT_TIMESTAMP;
+            DROP TRIGGER IF EXISTS waste_posts_version_insert;
+            DROP TRIGGER IF EXISTS waste_posts_version_update;
+            DROP TRIGGER IF EXISTS waste_posts_version_delete;
+        """)
+    cursor.executescript("""
+        INSERT OR IGNORE INTO data_versions (name, version) VALUES ('waste_posts', 0);
+        CREATE TRIGGER IF NOT EXISTS waste_posts_version_insert AFTER INSERT ON waste_posts BEGIN
+            UPDATE data_versions SET version = version + 1, changed_at = CURRENT_TIMESTAMP WHERE name = 'waste_posts';
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_version_update AFTER UPDATE ON waste_posts BEGIN
+            UPDATE data_versions SET version = version + 1, changed_at = CURRENT_TIMESTAMP WHERE name = 'waste_posts';
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_version_delete AFTER DELETE ON waste_posts BEGIN
+            UPDATE data_versions SET version = version + 1, changed_at = CURRENT_TIMESTAMP WHERE name = 'waste_posts';
+        END;
+    """)
+
+    # Change log read by post_index.py: the id of every post inserted, or
+    # changed or deleted while available, appended by triggers whichever code
+    # path (or process) writes. sweep_posts trims it to POST_CHANGES_KEEP entries.
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS post_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS waste_posts_changes_insert AFTER INSERT ON waste_posts BEGIN
+            INSERT INTO post_changes (post_id) VALUES (new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_changes_update
+        AFTER UPDATE OF status, expires_at, lat, lon, weight_est, waste_category, provider_type, suitable_for ON waste_posts
+        WHEN old.status = 'available' OR new.status = 'available' BEGIN
+            INSERT INTO post_changes (post_id) VALUES (new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS waste_posts_changes_delete AFTER DELETE ON waste_posts
+        WHEN old.status = 'available' BEGIN
+            INSERT INTO post_changes (post_id) VALUES (old.id);
+        END;
+    """)
+
+    # Durable queue of photo analyses (see job_queue.py). One job per image
+    # digest, so resubmitting the same photo joins the existing job.
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_hash TEXT NOT NULL UNIQUE,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            locked_by TEXT,
+            locked_until REAL,
+            result_json TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_analysis_jobs_ready ON analysis_jobs(status, available_at);
+    """)
+
+    # One-off backfills for databases created by older versions
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        cursor.execute("""
+            INSERT INTO waste_posts_rtree
+                SELECT id, lat, lat, lon, lon FROM waste_posts
+                WHERE id NOT IN (SELECT id FROM waste_posts_rtree)
+        """)
+    if version < 2:
+        for row in cursor.execute("SELECT id, suitable_for FROM waste_posts").fetchall():
+            _insert_post_tags(cursor, row['id'], (row['suitable_for'] or '').split(','))
+    if version < 4:
+        _rebuild_post_stats(cursor)
+    if version < 5:
+        cursor.execute(
+            "UPDATE waste_posts SET expires_at = datetime(created_at, ?) WHERE expires_at IS NULL",
+            (f"+{POST_TTL_HOURS} hours",),
+        )
+    if version < 6:
+        cursor.execute("INSERT INTO waste_posts_fts (waste_posts_fts) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO waste_posts_fts (rowid, {fts_columns})"
+            f" SELECT id, {_fts_values('waste_posts')} FROM waste_posts WHERE status = 'available'"
+        )
+    if version < 7:
+        # Category stats were keyed by the whole composition; merge them by
+        # _stats_category (post_stats also counts archived posts, so no rebuild)
+        categories = {}
+        for row in cursor.execute("SELECT key, post_count, total_weight FROM post_stats WHERE dimension = 'category'").fetchall():
+            totals = categories.setdefault(_stats_category(row['key']), [0, 0.0])
+            totals[0] += row['post_count']
+            totals[1] += row['total_weight']
+        cursor.execute("DELETE FROM post_stats WHERE dimension = 'category'")
+        cursor.executemany(
+            "INSERT INTO post_stats (dimension, key, post_count, total_weight) VALUES ('category', ?, ?, ?)",
+            [(key, count, weight) for key, (count, weight) in categories.items()],
+        )
+    if version < 8:
+        # Rows inserted without expires_at (outside _insert_post) were never
+        # listed nor swept; give them the usual lifetime
+        cursor.execute(
+            "UPDATE waste_posts SET expires_at = datetime(created_at, ?) WHERE expires_at IS NULL",
+            (f"+{POST_TTL_HOURS} hours",),
+        )
+    if version < 9:
+        # cluster_cells gained tag_mask: rebuilt from the available posts
+        # (this replaces the version 3 backfill)
+        cursor.execute("DELETE FROM cluster_cells")
+        for row in cursor.execute(
+            "SELECT lat, lon, waste_category, weight_est, suitable_for FROM waste_posts WHERE status = 'available'"
+        ).fetchall():
+            _add_to_cluster_cells(
+                cursor, row['lat'], row['lon'], row['waste_category'], row['weight_est'], (row['suitable_for'] or '').split(','),
+            )
+    if version < SCHEMA_VERSION:
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
     conn.close()
     print("Database initialized.")
 
-def add_waste_post(provider_type: ProviderType, lat: float, lon: float, image_blob: bytes, ai_analysis: dict, contact_info: str = None):
-    """Adds a new waste post to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def _fts_values(row: str) -> str:
+    """SQL expressions for the waste_posts_fts columns of `row` (a trigger's new/old or a table)."""
+    analysis = f"CASE WHEN json_valid({row}.ai_analysis) THEN {row}.ai_analysis END"
+    return ", ".join(
+        f"{row}.{column}" if column == 'waste_category' else f"json_extract({analysis}, '$.{column}')"
+        for column in SEARCH_COLUMN_WEIGHTS
+    )
+
+def _insert_post_tags(cursor, post_id: int, tags):
+    cursor.executemany(
+        "INSERT OR IGNORE INTO post_tags (tag, post_id) VALUES (?, ?)",
+        [(tag.strip(), post_id) for tag in tags if tag and tag.strip()],
+    )
+
+def tile_xy(lat: float, lon: float, level: int) -> tuple:
+    """Returns the web-mercator (slippy map) tile containing a point at `level`."""
+    x, y = geo.tile_xy(lat, lon, level)
+    return int(x), int(y)
+
+def tile_bbox(x: int, y: int, level: int) -> tuple:
+    """Returns the `(min_lon, min_lat, max_lon, max_lat)` box of a tile."""
+    n = 2 ** level
+    def tile_lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+    return (x / n * 360.0 - 180.0, tile_lat(y + 1), (x + 1) / n * 360.0 - 180.0, tile_lat(y))
+
+def _cluster_tag_mask(tags) -> int:
+    mask = 0
+    for tag in tags:
+        mask |= CLUSTER_TAG_BITS.get(tag.strip(), 0)
+    return mask
+
+def _add_to_cluster_cells(cursor, lat: float, lon: float, waste_category: str, weight_est: float, tags=()):
+    xs, ys = geo.tile_xy(lat, lon, _CLUSTER_LEVELS_ARRAY)
+    tag_mask = _cluster_tag_mask(tags)
+    rows = [
+        (level, x, y, waste_category or 'Lainnya', tag_mask, weight_est or 0.0, lat, lon)
+        for level, x, y in zip(CLUSTER_LEVELS, xs.tolist(), ys.tolist())
+    ]
+    cursor.executemany(
+        """
+        INSERT INTO cluster_cells (level, cell_x, cell_y, waste_category, tag_mask, post_count, total_weight, sum_lat, sum_lon)
+        VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?)
+        ON CONFLICT (level, cell_x, cell_y, waste_category, tag_mask) DO UPDATE SET
+            post_count = post_count + 1,
+            total_weight = total_weight + excluded.total_weight,
+            sum_lat = sum_lat + excluded.sum_lat,
+            sum_lon = sum_lon + excluded.sum_lon
+        """,
+        rows,
+    )
+
+def _remove_from_cluster_cells(cursor, posts: list):
+    """Takes posts (rows with lat, lon, waste_category, weight_est, suitable_for) that stopped being available out of the clusters."""
+    if not posts:
+        return
+    lat = np.array([post['lat'] for post in posts])
+    lon = np.array([post['lon'] for post in posts])
+    xs, ys = geo.tile_xy(lat[:, None], lon[:, None], _CLUSTER_LEVELS_ARRAY[None, :])
+    # Summed per cell first: a batch of nearby posts shares most of its cells
+    cells = {}
+    for post, post_xs, post_ys in zip(posts, xs.tolist(), ys.tolist()):
+        category = post['waste_category'] or 'Lainnya'
+        tag_mask = _cluster_tag_mask((post['suitable_for'] or '').split(','))
+        weight = post['weight_est'] or 0.0
+        for level, x, y in zip(CLUSTER_LEVELS, post_xs, post_ys):
+            cell = cells.setdefault((level, x, y, category, tag_mask), [0, 0.0, 0.0, 0.0])
+            cell[0] += 1
+            cell[1] += weight
+            cell[2] += post['lat']
+            cell[3] += post['lon']
+    rows = [(*totals, *key) for key, totals in cells.items()]
+    cursor.executemany(
+        """
+        UPDATE cluster_cells SET
+            post_count = post_count - ?,
+            total_weight = total_weight - ?,
+            sum_lat = sum_lat - ?,
+            sum_lon = sum_lon - ?
+        WHERE level = ? AND cell_x = ? AND cell_y = ? AND waste_category = ? AND tag_mask = ?
+        """,
+        rows,
+    )
+    cursor.executemany(
+        "DELETE FROM cluster_cells"
+        " WHERE level = ? AND cell_x = ? AND cell_y = ? AND waste_category = ? AND tag_mask = ? AND post_count <= 0",
+        [row[4:] for row in rows],
+    )
+
+def _stats_category(waste_category: str) -> str:
+    """post_stats key of a composition such as 'nasi, Sayuran': its first component, title-cased ('Nasi')."""
+    return (waste_category or '').split(',')[0].strip().title() or 'Lainnya'
+
+def _add_to_post_stats(cursor, provider_type: str, waste_category: str, tags, weight_est: float,
+                       lat: float, lon: float, day: str):
+    keys = [
+        ('total', ''),
+        ('category', _stats_category(waste_category)),
+        ('provider_type', provider_type),
+        ('day', day),
+        ('geohash', geo.geohash(lat, lon, STATS_GEOHASH_PRECISION)),
+    ]
+    keys += [('tag', tag.strip()) for tag in tags if tag and tag.strip()]
+    cursor.executemany(
+        """
+        INSERT INTO post_stats (dimension, key, post_count, total_weight)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            post_count = post_count + 1,
+            total_weight = total_weight + excluded.total_weight
+        """,
+        [(dimension, key, weight_est or 0.0) for dimension, key in keys],
+    )
+
+def _rebuild_post_stats(cursor):
+    """Recomputes post_stats from waste_posts (a full scan; for migrations only)."""
+    cursor.execute("DELETE FROM post_stats")
+    rows = cursor.execute(
+        "SELECT provider_type, waste_category, suitable_for, weight_est, lat, lon, date(created_at) AS day FROM waste_posts"
+    ).fetchall()
+    for row in rows:
+        _add_to_post_stats(
+            cursor, row['provider_type'], row['waste_category'], (row['suitable_for'] or '').split(','),
+            row['weight_est'], row['lat'], row['lon'], row['day'],
+        )
+
+def _insert_post(cursor, provider_type: ProviderType, lat: float, lon: float, image_hash: str, ai_analysis: dict, contact_info: str = None):
+    """Inserts one post with its tags, cluster aggregates and stats. Returns the new post id."""
     # Extract data from AI analysis
     waste_category = ai_analysis.get('main_composition', 'Lainnya')
     suitable_for = ", ".join(ai_analysis.get('suitability_tags', []))
     weight_est = ai_analysis.get('estimated_weight_kg', 0.0)
-    
+
     cursor.execute(
         """
-        INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, contact_info, image_blob, ai_analysis)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO waste_posts (provider_type, waste_category, suitable_for, weight_est, lat, lon, contact_info, image_hash, ai_analysis, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
         """,
         (
             provider_type.value,
@@ -67,37 +705,574 @@ def add_waste_post(provider_type: ProviderType, lat: float, lon: float, image_bl
             lat,
             lon,
             contact_info,
-            image_blob,
-            json.dumps(ai_analysis)
+            image_hash,
+            json.dumps(ai_analysis),
+            f"+{POST_TTL_HOURS} hours",
         )
     )
-    conn.commit()
     post_id = cursor.lastrowid
-    conn.close()
+    _insert_post_tags(cursor, post_id, ai_analysis.get('suitability_tags', []))
+    _add_to_cluster_cells(cursor, lat, lon, waste_category, weight_est, ai_analysis.get('suitability_tags', []))
+    # created_at defaults to CURRENT_TIMESTAMP, which is UTC as well
+    _add_to_post_stats(
+        cursor, provider_type.value, waste_category, ai_analysis.get('suitability_tags', []),
+        weight_est, lat, lon, time.strftime('%Y-%m-%d', time.gmtime()),
+    )
+    return post_id
+
+@_instrumented
+def add_waste_post(provider_type: ProviderType, lat: float, lon: float, image_hash: str, ai_analysis: dict, contact_info: str = None):
+    """
+    Adds a new waste post to the database.
+    `image_hash` is the digest returned by `image_store.put`/`image_store.save_image`;
+    the image bytes themselves never go into the database.
+    """
+    with pooled_connection() as conn:
+        post_id = _insert_post(conn.cursor(), provider_type, lat, lon, image_hash, ai_analysis, contact_info)
+        conn.commit()
+    _notify_commit(post_id)
     return post_id
 
-def get_waste_posts(filters: list = None):
+@_instrumented
+def add_waste_posts(posts: list):
+    """
+    Bulk variant of `add_waste_post`: inserts every post in a single
+    transaction, so either all of them are stored or none.
+
+    Args:
+        posts: dicts with the keyword arguments of `add_waste_post`.
+
+    Returns:
+        The new post ids, in input order.
+    """
+    if not posts:
+        return []
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        post_ids = [_insert_post(cursor, **post) for post in posts]
+        conn.commit()
+    _notify_commit(post_ids[-1])
+    return post_ids
+
+def _deactivate_posts(cursor, status: PostStatus, where: str, params: tuple) -> list:
+    """Moves the available posts matching `where` to `status`. Returns their ids."""
+    posts = cursor.execute(
+        f"""
+        UPDATE waste_posts SET status = ?, status_changed_at = CURRENT_TIMESTAMP
+        WHERE status = 'available' AND {where}
+        RETURNING id, lat, lon, waste_category, weight_est, suitable_for
+        """,
+        (status.value, *params),
+    ).fetchall()
+    _remove_from_cluster_cells(cursor, posts)
+    return [post['id'] for post in posts]
+
+@_instrumented
+def claim_waste_post(post_id: int) -> bool:
+    """
+    Marks an available post as claimed, which takes it off the map.
+    Returns False if the post does not exist or is no longer available.
+    """
+    with pooled_connection() as conn:
+        claimed = _deactivate_posts(conn.cursor(), PostStatus.CLAIMED, "id = ? AND expires_at > CURRENT_TIMESTAMP", (post_id,))
+        conn.commit()
+    return bool(claimed)
+
+@_instrumented
+def expire_posts(batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Marks available posts past (or without) their `expires_at` as expired. Returns how many were expired."""
+    expired = 0
+    while True:
+        with pooled_connection() as conn:
+            ids = _deactivate_posts(
+                conn.cursor(), PostStatus.EXPIRED,
+                # Two arms (not an OR) so both are searches on idx_waste_posts_expiry
+                "id IN (SELECT id FROM waste_posts WHERE status = 'available' AND expires_at IS NULL"
+                " UNION ALL SELECT id FROM waste_posts WHERE status = 'available' AND expires_at <= CURRENT_TIMESTAMP LIMIT ?)",
+                (batch_size,),
+            )
+            conn.commit()
+        expired += len(ids)
+        if len(ids) < batch_size:
+            return expired
+
+def _archive_connection():
+    conn = sqlite3.connect(ARCHIVE_DB_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    columns = ", ".join(f"{name} {kind}" for name, kind in ARCHIVE_COLUMNS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS waste_posts_archive ({columns}, archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    return conn
+
+@_instrumented
+def archive_posts(older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = SWEEP_BATCH_SIZE) -> dict:
+    """
+    Moves claimed and expired posts whose status changed more than
+    `older_than_days` ago from waste_posts to the `waste_posts_archive` table
+    in ARCHIVE_DB_FILE, and their images (unless a remaining post uses them)
+    from the image store to ARCHIVE_IMAGE_DIR.
+    Rows are copied to the archive before they are deleted, so an interrupted
+    run at worst archives a batch twice (the copy is idempotent).
+
+    Returns:
+        Counts of archived `posts` and `images`.
+    """
+    names = ", ".join(name for name, _ in ARCHIVE_COLUMNS)
+    placeholders = ", ".join("?" * len(ARCHIVE_COLUMNS))
+    archived_posts = archived_images = 0
+    archive = _archive_connection()
+    try:
+        while True:
+            with pooled_connection() as conn:
+                rows = conn.execute(
+                    f"""
+                    SELECT {names} FROM waste_posts
+                    WHERE status != 'available' AND status_changed_at <= datetime('now', ?)
+                    LIMIT ?
+                    """,
+                    (f"-{older_than_days} days", batch_size),
+                ).fetchall()
+            if not rows:
+                break
+            archive.executemany(f"INSERT OR IGNORE INTO waste_posts_archive ({names}) VALUES ({placeholders})", rows)
+            archive.commit()
+
+            ids = [row['id'] for row in rows]
+            digests = {row['image_hash'] for row in rows if row['image_hash']}
+            id_list = ", ".join("?" * len(ids))
+            with pooled_connection() as conn:
+                conn.execute(f"DELETE FROM waste_posts WHERE id IN ({id_list})", ids)
+                conn.commit()
+                if digests:
+                    digest_list = ", ".join("?" * len(digests))
+                    still_used = {
+                        row['image_hash'] for row in conn.execute(
+                            f"SELECT DISTINCT image_hash FROM waste_posts WHERE image_hash IN ({digest_list})", list(digests)
+                        )
+                    }
+                    digests -= still_used
+            for digest in digests:
+                archived_images += bool(image_store.archive(digest, ARCHIVE_IMAGE_DIR))
+            archived_posts += len(ids)
+            if len(rows) < batch_size:
+                break
+    finally:
+        archive.close()
+    return {'posts': archived_posts, 'images': archived_images}
+
+@_instrumented
+def prune_post_changes(keep: int = POST_CHANGES_KEEP) -> int:
+    """Deletes all but the latest `keep` post_changes entries. Returns how many were deleted."""
+    with pooled_connection() as conn:
+        deleted = conn.execute(
+            "DELETE FROM post_changes WHERE seq <= (SELECT MAX(seq) FROM post_changes) - ?", (keep,)
+        ).rowcount
+        conn.commit()
+    return deleted
+
+def sweep_posts() -> dict:
+    """The periodic lifecycle job: expires stale posts, archives old inactive ones and trims the change log."""
+    expired = expire_posts()
+    archived = archive_posts(older_than_days=ARCHIVE_AFTER_DAYS)
+    return {
+        'expired': expired, 'archived_posts': archived['posts'], 'archived_images': archived['images'],
+        'pruned_changes': prune_post_changes(),
+    }
+
+@_instrumented
+def get_data_version(name: str = 'waste_posts') -> int:
+    """
+    Returns the change counter of a table; it increases with every insert,
+    update or delete, so caches keyed on it never serve stale data.
+    """
+    with pooled_connection() as conn:
+        row = conn.execute("SELECT version FROM data_versions WHERE name = ?", (name,)).fetchone()
+    return row['version'] if row else 0
+
+@_instrumented
+def get_data_version_info(name: str = 'waste_posts') -> tuple:
+    """`get_data_version` plus the UTC time of that change, as `(version, 'YYYY-MM-DD HH:MM:SS')`."""
+    with pooled_connection() as conn:
+        row = conn.execute("SELECT version, changed_at FROM data_versions WHERE name = ?", (name,)).fetchone()
+    return (row['version'], row['changed_at']) if row else (0, None)
+
+def _add_bbox_clause(where_clauses: list, params: list, bbox: tuple):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    where_clauses.append(
+        "id IN (SELECT id FROM waste_posts_rtree"
+        " WHERE min_lat >= ? AND max_lat <= ? AND min_lon >= ? AND max_lon <= ?)"
+    )
+    params.extend([min_lat, max_lat, min_lon, max_lon])
+
+@_instrumented
+def get_post_stats(limit: int = STATS_DEFAULT_LIMIT) -> dict:
+    """
+    Supply totals from post_stats: `total` (`post_count`, `total_weight`) and,
+    per other dimension in STATS_DIMENSIONS, a list of at most `limit`
+    `{key, post_count, total_weight}`: the latest days (UTC, newest first) for
+    `day`, the keys with the most weight for the others. Every query reads at
+    most `limit` index entries, so the cost does not grow with the history.
+    """
+    queries = {
+        'day': ("SELECT key, post_count, total_weight FROM post_stats WHERE dimension = 'day'"
+                " ORDER BY key DESC LIMIT ?", (limit,)),
+    }
+    rows = {}
+    with pooled_connection() as conn:
+        for dimension in STATS_DIMENSIONS:
+            query, params = queries.get(dimension, (
+                "SELECT key, post_count, total_weight FROM post_stats WHERE dimension = ?"
+                " ORDER BY total_weight DESC LIMIT ?", (dimension, limit),
+            ))
+            rows[dimension] = [dict(row) for row in conn.execute(query, params).fetchall()]
+    total = rows.pop('total')
+    return {
+        'total': {
+            'post_count': total[0]['post_count'] if total else 0,
+            'total_weight': total[0]['total_weight'] if total else 0.0,
+        },
+        **rows,
+    }
+
+@_instrumented
+def get_waste_posts(filters: list = None, columns: tuple = POST_LIST_COLUMNS, bbox: tuple = None,
+                    after_id: int = None, since=None, limit: int = None, ids: list = None):
+    """
+    Retrieves available, unexpired waste posts from the database, newest first.
+    Can be filtered by a list of suitability tags (posts matching any of them,
+    looked up in `post_tags`) and by a bounding box
+    `(min_lon, min_lat, max_lon, max_lat)`, which is answered from the spatial index,
+    or restricted to the posts in `ids`. Only the requested `columns` are read; by default this is metadata only,
+    use `get_waste_post_image` to fetch a single image.
+
+    Paging and incremental polling (all served by the `created_at` index):
+        after_id: keyset cursor, only posts listed after this post (i.e. older).
+        since: only posts newer than this post id (int) or `created_at` timestamp (str).
+        limit: maximum number of posts to return.
+    """
+    unknown = set(columns) - set(POST_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown waste_posts columns: {sorted(unknown)}")
+    projection = ", ".join(columns)
+
+    where_clauses = [LIVE_POST_CLAUSE]
+    params = []
+    tags = [f.strip() for f in filters or [] if f and f.strip()]
+    if tags:
+        placeholders = ", ".join("?" * len(tags))
+        where_clauses.append(f"id IN (SELECT post_id FROM post_tags WHERE tag IN ({placeholders}))")
+        params.extend(tags)
+    if bbox:
+        _add_bbox_clause(where_clauses, params, bbox)
+    if ids is not None:
+        where_clauses.append(f"id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    if after_id is not None:
+        where_clauses.append("(created_at, id) < (SELECT created_at, id FROM waste_posts WHERE id = ?)")
+        params.append(after_id)
+    if isinstance(since, int):
+        where_clauses.append("id > ?")
+        params.append(since)
+    elif since:
+        where_clauses.append("created_at > ?")
+        params.append(since)
+
+    query = f"SELECT {projection} FROM waste_posts WHERE {' AND '.join(where_clauses)}"
+    if isinstance(since, int):
+        # ids are assigned in insertion order, so this is the same order as below
+        # but lets SQLite range-scan the primary key instead of the whole index
+        query += " ORDER BY id DESC"
+    else:
+        query += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with pooled_connection() as conn:
+        posts = conn.execute(query, params).fetchall()
+    return [dict(row) for row in posts]
+
+def _fts_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query matching posts that contain every word,
+    quoting each word so user input can never be FTS5 syntax.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        raise ValueError("Search text must contain at least one word")
+    return " ".join(f'"{word}"' for word in words)
+
+@_instrumented
+def search_posts(text: str, filters: list = None, bbox: tuple = None, limit: int = SEARCH_DEFAULT_LIMIT,
+                 columns: tuple = POST_LIST_COLUMNS):
+    """
+    Full-text search over the composition, category, safety warning and
+    handling tip of available posts (e.g. "kulit pisang" finds posts with both
+    words, accents and case ignored). Optionally filtered by suitability tags
+    and a bounding box like `get_waste_posts`.
+
+    Matches are read newest first and only the newest SEARCH_CANDIDATES that
+    pass the filters are ranked, so a common word costs the same as a rare one.
+
+    Returns:
+        Up to `limit` posts, best match first, each with a `relevance` score
+        (bm25 weighted by SEARCH_COLUMN_WEIGHTS; higher is better).
+        Raises ValueError if `text` has no words.
+    """
+    unknown = set(columns) - set(POST_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown waste_posts columns: {sorted(unknown)}")
+    weights = ", ".join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS.values())
+
+    # Checked per candidate row while walking the matches, so they are written
+    # as row lookups rather than the set-building subqueries of get_waste_posts
+    where_clauses = ["waste_posts_fts MATCH ?", LIVE_POST_CLAUSE]
+    params = [_fts_query(text)]
+    tags = [f.strip() for f in filters or [] if f and f.strip()]
+    if tags:
+        where_clauses.append(
+            f"EXISTS (SELECT 1 FROM post_tags WHERE post_id = waste_posts.id AND tag IN ({', '.join('?' * len(tags))}))"
+        )
+        params.extend(tags)
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        where_clauses.append("lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?")
+        params.extend([min_lat, max_lat, min_lon, max_lon])
+    params.extend([SEARCH_CANDIDATES, limit])
+
+    query = f"""
+        SELECT {', '.join(columns)}, relevance FROM (
+            SELECT {', '.join(f'waste_posts.{column}' for column in columns)},
+                waste_posts.id AS match_id, -bm25(waste_posts_fts, {weights}) AS relevance
+            FROM waste_posts_fts JOIN waste_posts ON waste_posts.id = waste_posts_fts.rowid
+            WHERE {' AND '.join(where_clauses)}
+            ORDER BY waste_posts_fts.rowid DESC
+            LIMIT ?
+        )
+        ORDER BY relevance DESC, match_id DESC
+        LIMIT ?
+    """
+    with pooled_connection() as conn:
+        posts = conn.execute(query, params).fetchall()
+    return [dict(row) for row in posts]
+
+@_instrumented
+def get_post_points(provider_type: ProviderType = None, bbox: tuple = None) -> dict:
+    """
+    Location and weight of every available post (optionally of one provider type, inside
+    `bbox`) as NumPy arrays `id`, `lat`, `lon` and `weight_est`, for the batch
+    computations in geo.py.
     """
-    Retrieves waste posts from the database.
-    Can be filtered by a list of 'suitable_for' tags.
+    where_clauses, params = [LIVE_POST_CLAUSE], []
+    if provider_type:
+        where_clauses.append("provider_type = ?")
+        params.append(ProviderType(provider_type).value)
+    if bbox:
+        _add_bbox_clause(where_clauses, params, bbox)
+    query = f"SELECT id, lat, lon, COALESCE(weight_est, 0) FROM waste_posts WHERE {' AND '.join(where_clauses)}"
+
+    with pooled_connection() as conn:
+        rows = np.array(conn.execute(query, params).fetchall(), dtype=float).reshape(-1, 4)
+    return {
+        'id': rows[:, 0].astype(np.int64),
+        'lat': rows[:, 1],
+        'lon': rows[:, 2],
+        'weight_est': rows[:, 3],
+    }
+
+@_instrumented
+def get_nearby_posts(lat: float, lon: float, radius_m: float, limit: int = 50, filters: list = None, columns: tuple = POST_LIST_COLUMNS):
+    """
+    Retrieves up to `limit` posts within `radius_m` meters of a point, nearest first.
+    Candidates come from the spatial index; each result gets a `distance_m` key.
+    """
+    if 'lat' not in columns or 'lon' not in columns:
+        columns = tuple(columns) + tuple(c for c in ('lat', 'lon') if c not in columns)
+    candidates = get_waste_posts(filters=filters, columns=columns, bbox=geo.radius_bbox(lat, lon, radius_m))
+    if not candidates:
+        return []
+    distances = geo.haversine_m(
+        lat, lon, np.fromiter((p['lat'] for p in candidates), float), np.fromiter((p['lon'] for p in candidates), float)
+    )
+    nearby = []
+    for i in np.argsort(distances, kind='stable')[:limit]:
+        if distances[i] > radius_m:
+            break
+        candidates[i]['distance_m'] = float(distances[i])
+        nearby.append(candidates[i])
+    return nearby
+
+# Per provider type: (data version, geo.GridIndex, post ids) used by get_nearest_posts
+_nearest_indexes = {}
+
+def _nearest_index(provider_type: ProviderType = None) -> tuple:
+    version = get_data_version()
+    cached = _nearest_indexes.get(provider_type)
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+    points = get_post_points(provider_type=provider_type)
+    index = geo.GridIndex(points['lat'], points['lon'])
+    _nearest_indexes[provider_type] = (version, index, points['id'])
+    return index, points['id']
+
+@_instrumented
+def get_nearest_posts(lat: float, lon: float, k: int = 10, provider_type: ProviderType = None,
+                      max_distance_m: float = None, columns: tuple = POST_LIST_COLUMNS):
+    """
+    Retrieves the `k` posts nearest to a point, optionally of one provider type
+    and within `max_distance_m`, nearest first; each gets a `distance_m` key.
+    Unlike get_nearby_posts there is no radius to guess: the lookup uses an
+    in-memory geo.GridIndex, rebuilt when the data version changes.
+    """
+    index, ids = _nearest_index(ProviderType(provider_type) if provider_type else None)
+    found, distances = index.nearest(lat, lon, k, max_distance_m=max_distance_m)
+    found_ids = ids[found].tolist()
+    columns = tuple(columns) if 'id' in columns else ('id',) + tuple(columns)
+    posts = {post['id']: post for post in get_waste_posts(columns=columns, ids=found_ids)}
+    nearest = []
+    for post_id, distance in zip(found_ids, distances.tolist()):
+        # A post deleted since the index was built is skipped
+        if post_id in posts:
+            posts[post_id]['distance_m'] = distance
+            nearest.append(posts[post_id])
+    return nearest
+
+@_instrumented
+def get_area_supply(cell_m: float = geo.GRID_CELL_M, bbox: tuple = None, provider_type: ProviderType = None):
+    """
+    Post count and total estimated weight per square area of `cell_m` meters,
+    largest supply first: one dict per non-empty area with its centroid.
+    """
+    points = get_post_points(provider_type=provider_type, bbox=bbox)
+    areas = geo.aggregate_by_cell(points['lat'], points['lon'], points['weight_est'], cell_m)
+    return [
+        {'lat': lat, 'lon': lon, 'count': count, 'total_weight': total}
+        for lat, lon, count, total in zip(
+            areas['lat'].tolist(), areas['lon'].tolist(), areas['count'].tolist(), areas['total_weight'].tolist()
+        )
+    ]
+
+def _filtered_cluster_rows(level: int, min_x: int, min_y: int, max_x: int, max_y: int, tags: list) -> list:
+    """cluster_cells-like rows for the posts with any of `tags` in a range of cells, aggregated on the fly."""
+    # Tile y grows southwards: (min_x, max_y) is the south-west corner cell
+    south_west, north_east = tile_bbox(min_x, max_y, level), tile_bbox(max_x, min_y, level)
+    bbox = (south_west[0], south_west[1], north_east[2], north_east[3])
+    posts = get_waste_posts(filters=tags, bbox=bbox, columns=('lat', 'lon', 'waste_category', 'weight_est'))
+    if not posts:
+        return []
+    xs, ys = geo.tile_xy(np.array([post['lat'] for post in posts]), np.array([post['lon'] for post in posts]), level)
+    cells = {}
+    for post, x, y in zip(posts, xs.tolist(), ys.tolist()):
+        cell = cells.setdefault((x, y, post['waste_category'] or 'Lainnya'), [0, 0.0, 0.0, 0.0])
+        cell[0] += 1
+        cell[1] += post['weight_est'] or 0.0
+        cell[2] += post['lat']
+        cell[3] += post['lon']
+    return [
+        {'cell_x': x, 'cell_y': y, 'waste_category': category, 'post_count': count,
+         'total_weight': total, 'sum_lat': sum_lat, 'sum_lon': sum_lon}
+        for (x, y, category), (count, total, sum_lat, sum_lon) in cells.items()
+    ]
+
+@_instrumented
+def get_clusters(zoom: int, bbox: tuple, filters: list = None):
+    """
+    Returns pre-aggregated clusters for a map at `zoom` showing `bbox`
+    `(min_lon, min_lat, max_lon, max_lat)`: one dict per non-empty cell with its
+    post count, total `weight_est`, dominant waste category, centroid and bounds.
+    The number of cells is bounded by the viewport size, not by the post count.
+    With suitability tags in `filters`, only posts with any of them are
+    counted, read from the same aggregates by `tag_mask`; filters with tags
+    outside SuitabilityTag are aggregated from the matching posts per call.
+    """
+    level = min(max(zoom, 0) + CLUSTER_CELL_ZOOM_OFFSET, CLUSTER_LEVELS[-1])
+    min_lon, min_lat, max_lon, max_lat = bbox
+    min_x, min_y = tile_xy(max_lat, min_lon, level)
+    max_x, max_y = tile_xy(min_lat, max_lon, level)
+
+    tags = [f.strip() for f in filters or [] if f and f.strip()]
+    if any(tag not in CLUSTER_TAG_BITS for tag in tags):
+        rows = _filtered_cluster_rows(level, min_x, min_y, max_x, max_y, tags)
+    else:
+        query = """
+            SELECT cell_x, cell_y, waste_category, post_count, total_weight, sum_lat, sum_lon
+            FROM cluster_cells
+            WHERE level = ? AND cell_x BETWEEN ? AND ? AND cell_y BETWEEN ? AND ?
+        """
+        params = [level, min_x, max_x, min_y, max_y]
+        if tags:
+            query += " AND tag_mask & ? != 0"
+            params.append(_cluster_tag_mask(tags))
+        with pooled_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+    cells = {}
+    for row in rows:
+        cell = cells.setdefault((row['cell_x'], row['cell_y']), {
+            'count': 0, 'total_weight': 0.0, 'sum_lat': 0.0, 'sum_lon': 0.0, 'categories': {},
+        })
+        cell['count'] += row['post_count']
+        cell['total_weight'] += row['total_weight']
+        cell['sum_lat'] += row['sum_lat']
+        cell['sum_lon'] += row['sum_lon']
+        cell['categories'][row['waste_category']] = cell['categories'].get(row['waste_category'], 0) + row['post_count']
+
+    clusters = []
+    for (x, y), cell in cells.items():
+        clusters.append({
+            'cell_x': x,
+            'cell_y': y,
+            'level': level,
+            'count': cell['count'],
+            'total_weight': cell['total_weight'],
+            'dominant_category': max(cell['categories'], key=cell['categories'].get),
+            'lat': cell['sum_lat'] / cell['count'],
+            'lon': cell['sum_lon'] / cell['count'],
+            'bbox': tile_bbox(x, y, level),
+        })
+    return clusters
+
+@_instrumented
+def get_waste_post_image(post_id: int):
+    """
+    Returns the image reference of a single post as a dict with `image_hash` and
+    `image_blob` (the latter only for posts not yet migrated to the image store),
+    or None if the post does not exist.
+    """
+    with pooled_connection() as conn:
+        row = conn.execute("SELECT image_hash, image_blob FROM waste_posts WHERE id = ?", (post_id,)).fetchone()
+    if row and row['image_blob']:
+        DB_BLOB_BYTES_READ.inc(len(row['image_blob']))
+    return dict(row) if row else None
+
+def migrate_image_blobs(batch_size: int = 50):
+    """
+    Moves inline `image_blob` data into the image store, one batch at a time,
+    and reclaims the freed space. Returns the number of migrated posts.
     """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = "SELECT * FROM waste_posts ORDER BY created_at DESC"
-    
-    if filters:
-        # Creates a query like: WHERE suitable_for LIKE '%Filter1%' OR suitable_for LIKE '%Filter2%'
-        where_clauses = [f"suitable_for LIKE '%{f.strip()}%'" for f in filters]
-        query = f"SELECT * FROM waste_posts WHERE {' OR '.join(where_clauses)} ORDER BY created_at DESC"
-
-    cursor.execute(query)
-    posts = cursor.fetchall()
+    migrated = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, image_blob FROM waste_posts WHERE image_blob IS NOT NULL LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            with Image.open(io.BytesIO(row['image_blob'])) as image:
+                image_hash = image_store.save_image(image)
+            conn.execute(
+                "UPDATE waste_posts SET image_hash = ?, image_blob = NULL WHERE id = ?", (image_hash, row['id'])
+            )
+        conn.commit()
+        migrated += len(rows)
+    if migrated:
+        conn.execute("VACUUM")
     conn.close()
-    return [dict(row) for row in posts]
+    return migrated
 
 # Initialize the database when this module is imported
 if __name__ == '__main__':
     print("Running DB setup...")
     init_db()
+    print(f"Moved {migrate_image_blobs()} images into the image store.")
+    print("Post lifecycle sweep: {expired} expired, {archived_posts} posts and {archived_images} images archived.".format(**sweep_posts()))
     print("DB setup complete.")
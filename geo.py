@@ -0,0 +1,236 @@
+import numpy as np
+
+# Vectorized geometry shared by the app, the API and db.py. Every function
+# takes scalars or NumPy arrays (broadcast against each other), so one call
+# handles a single point or a million.
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111132
+
+# Default cell edge of GridIndex and aggregate_by_cell, in meters
+GRID_CELL_M = 500.0
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+_rng = np.random.default_rng()
+
+
+def _lon_scale(lat) -> np.ndarray:
+    """Meters per degree of longitude at `lat` (kept finite at the poles)."""
+    return METERS_PER_DEGREE_LAT * np.maximum(np.abs(np.cos(np.radians(lat))), 1e-6)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance between points in meters."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def jitter(lat, lon, meters: float = 200, rng: np.random.Generator = None) -> tuple:
+    """Adds a random offset of up to `meters` on each axis to every point, to protect privacy."""
+    rng = rng or _rng
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    lat_jitter = rng.uniform(-meters, meters, lat.shape) / METERS_PER_DEGREE_LAT
+    lon_jitter = rng.uniform(-meters, meters, lon.shape) / _lon_scale(lat)
+    return lat + lat_jitter, lon + lon_jitter
+
+
+def jitter_location(lat: float, lon: float, meters: float = 200) -> tuple:
+    """`jitter` for a single location, as plain floats."""
+    lat, lon = jitter(lat, lon, meters)
+    return float(lat), float(lon)
+
+
+def radius_bbox(lat: float, lon: float, radius_m: float) -> tuple:
+    """Returns the `(min_lon, min_lat, max_lon, max_lat)` box enclosing a circle."""
+    d_lat = radius_m / METERS_PER_DEGREE_LAT
+    d_lon = radius_m / float(_lon_scale(lat))
+    return (lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat)
+
+
+def geohash(lat: float, lon: float, precision: int = 5) -> str:
+    """Standard base32 geohash of a point (precision 5 is a cell of about 4.9 x 4.9 km)."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def tile_xy(lat, lon, level) -> tuple:
+    """Web-mercator (slippy map) tile `(x, y)` containing each point at `level`."""
+    n = np.left_shift(1, np.asarray(level, dtype=np.int64))
+    lat = np.clip(lat, -85.05112878, 85.05112878)
+    x = np.floor((np.asarray(lon, dtype=float) + 180.0) / 360.0 * n).astype(np.int64)
+    y = np.floor((1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n).astype(np.int64)
+    return np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+
+
+def weighted_centroid(lat, lon, weights=None) -> tuple:
+    """Mean location of the points, optionally weighted (e.g. by post count)."""
+    return float(np.average(lat, weights=weights)), float(np.average(lon, weights=weights))
+
+
+class _Grid:
+    """
+    Square cells of `cell_m` meters in an equirectangular projection centered
+    on `ref_lat`. Accurate for regional data (a city or province); cells get
+    distorted far from `ref_lat`.
+    """
+
+    def __init__(self, ref_lat: float, cell_m: float):
+        self.cell_m = cell_m
+        self.x_scale = float(_lon_scale(ref_lat)) / cell_m
+        self.y_scale = METERS_PER_DEGREE_LAT / cell_m
+
+    def cells(self, lat, lon) -> tuple:
+        cx = np.floor(np.asarray(lon, dtype=float) * self.x_scale).astype(np.int64)
+        cy = np.floor(np.asarray(lat, dtype=float) * self.y_scale).astype(np.int64)
+        return cx, cy
+
+    @staticmethod
+    def keys(cx, cy) -> np.ndarray:
+        # |cy| stays far below 2**31 for any cell size over a meter
+        return (cx << 32) + (cy + 2 ** 31)
+
+
+def aggregate_by_cell(lat, lon, weights, cell_m: float = GRID_CELL_M) -> dict:
+    """
+    Totals `weights` per square area of `cell_m` meters. Returns arrays with one
+    entry per non-empty area: `count`, `total_weight` and the centroid
+    (`lat`, `lon`) of its points, largest total first.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if lat.size == 0:
+        empty = np.empty(0)
+        return {'lat': empty, 'lon': empty, 'count': np.empty(0, dtype=np.int64), 'total_weight': empty}
+    grid = _Grid(float(lat.mean()), cell_m)
+    _, area = np.unique(_Grid.keys(*grid.cells(lat, lon)), return_inverse=True)
+    count = np.bincount(area)
+    areas = {
+        'lat': np.bincount(area, weights=lat) / count,
+        'lon': np.bincount(area, weights=lon) / count,
+        'count': count,
+        'total_weight': np.bincount(area, weights=weights),
+    }
+    order = np.argsort(-areas['total_weight'], kind='stable')
+    return {name: values[order] for name, values in areas.items()}
+
+
+class GridIndex:
+    """
+    Spatial index over points held as arrays: points are bucketed into square
+    cells of `cell_m` meters and sorted by cell, so each cell is a contiguous
+    slice found with a binary search. Distances returned are exact haversine
+    meters; the cell search assumes regional data (see `_Grid`).
+
+    Pick `cell_m` near the typical nearest-neighbour spacing: smaller cells
+    mean more rings to search, larger ones more candidates per ring.
+    """
+
+    def __init__(self, lat, lon, cell_m: float = GRID_CELL_M):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self._grid = _Grid(float(self.lat.mean()) if self.lat.size else 0.0, cell_m)
+        cx, cy = self._grid.cells(self.lat, self.lon)
+        keys = _Grid.keys(cx, cy)
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+        if self.lat.size:
+            self._bounds = (int(cx.min()), int(cy.min()), int(cx.max()), int(cy.max()))
+
+    def __len__(self):
+        return self.lat.size
+
+    def _points_in_cells(self, cx, cy) -> np.ndarray:
+        """Indices of the points in the given cells."""
+        keys = _Grid.keys(cx, cy)
+        lo = np.searchsorted(self._keys, keys, side='left')
+        hi = np.searchsorted(self._keys, keys, side='right')
+        lengths = hi - lo
+        # Concatenate the slices lo[i]:hi[i] without a Python loop
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(lo - offsets, lengths)
+        return self._order[positions]
+
+    @staticmethod
+    def _ring(cx: int, cy: int, r: int) -> tuple:
+        """Cells at Chebyshev distance exactly `r` from cell (cx, cy)."""
+        if r == 0:
+            return np.array([cx], dtype=np.int64), np.array([cy], dtype=np.int64)
+        side = np.arange(-r, r + 1, dtype=np.int64)
+        inner = side[1:-1]
+        xs = np.concatenate([cx + side, cx + side, np.full(inner.size, cx - r), np.full(inner.size, cx + r)])
+        ys = np.concatenate([np.full(side.size, cy - r), np.full(side.size, cy + r), cy + inner, cy + inner])
+        return xs, ys
+
+    def nearest(self, lat: float, lon: float, k: int = 10, max_distance_m: float = None) -> tuple:
+        """
+        The `k` points nearest to (`lat`, `lon`), optionally only those within
+        `max_distance_m`. Returns `(indices, distances_m)` arrays, nearest first.
+        """
+        if not len(self) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx, cy = (int(c) for c in self._grid.cells(lat, lon))
+        min_x, min_y, max_x, max_y = self._bounds
+        # Rings closer than the nearest occupied cell are empty, skip them
+        r = max(min_x - cx, cx - max_x, min_y - cy, cy - max_y, 0)
+        last_ring = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy)
+        found, distances = [], []
+        count = 0
+        while True:
+            idx = self._points_in_cells(*self._ring(cx, cy, r))
+            if idx.size:
+                found.append(idx)
+                distances.append(haversine_m(lat, lon, self.lat[idx], self.lon[idx]))
+                count += idx.size
+            # Every unsearched point lies at least r cells away from the query's cell
+            searched_m = r * self._grid.cell_m
+            if count >= k and np.partition(np.concatenate(distances), k - 1)[k - 1] <= searched_m:
+                break
+            if r >= last_ring or (max_distance_m is not None and searched_m >= max_distance_m):
+                break
+            r += 1
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        idx, dist = np.concatenate(found), np.concatenate(distances)
+        if max_distance_m is not None:
+            keep = dist <= max_distance_m
+            idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')[:k]
+        return idx[order], dist[order]
+
+    def within(self, lat: float, lon: float, radius_m: float) -> tuple:
+        """All points within `radius_m` of (`lat`, `lon`) as `(indices, distances_m)`, nearest first."""
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        min_lon, min_lat, max_lon, max_lat = radius_bbox(lat, lon, radius_m)
+        (x0, x1), (y0, y1) = self._grid.cells([min_lat, max_lat], [min_lon, max_lon])
+        min_x, min_y, max_x, max_y = self._bounds
+        xs = np.arange(max(x0, min_x), min(x1, max_x) + 1, dtype=np.int64)
+        ys = np.arange(max(y0, min_y), min(y1, max_y) + 1, dtype=np.int64)
+        if not xs.size or not ys.size:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        gx, gy = np.meshgrid(xs, ys)
+        idx = self._points_in_cells(gx.ravel(), gy.ravel())
+        dist = haversine_m(lat, lon, self.lat[idx], self.lon[idx])
+        keep = dist <= radius_m
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return idx[order], dist[order]
@@ -0,0 +1,121 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+
+from PIL import Image, ImageOps
+
+IMAGE_DIR = "image_store"
+
+# Long-edge pixel size and JPEG quality per stored variant. The original is
+# kept at full resolution but re-encoded lossy; thumbnails are what the map
+# popups load.
+VARIANTS = {
+    'original': (None, 85),
+    'thumb': (320, 75),
+}
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def encode_image(image: Image.Image, max_edge: int = None, quality: int = 85, image_format: str = 'JPEG') -> bytes:
+    """
+    Encodes a PIL Image as a compressed JPEG (or WebP), upright according to its
+    EXIF orientation and optionally downscaled to `max_edge`.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if max_edge and max(image.size) > max_edge:
+        # Cheap box reduction to just above the target first, so the LANCZOS
+        # pass filters ~1.5MP instead of a full 12MP camera frame
+        factor = max(image.size) // max_edge
+        image = image.reduce(factor) if factor > 1 else image.copy()
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    if image_format == 'WEBP':
+        options = {'quality': quality, 'method': 4}
+    else:
+        options = {'quality': quality, 'optimize': True, 'progressive': True}
+    with io.BytesIO() as output:
+        image.save(output, format=image_format, **options)
+        return output.getvalue()
+
+
+def image_path(digest: str, variant: str = 'original') -> str:
+    """Returns the on-disk path of an image variant. Raises ValueError for invalid input."""
+    if not _DIGEST_RE.match(digest or ''):
+        raise ValueError(f"Invalid image digest: {digest!r}")
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown image variant: {variant!r}")
+    suffix = '' if variant == 'original' else f"_{variant}"
+    return os.path.join(IMAGE_DIR, digest[:2], f"{digest}{suffix}.jpg")
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A unique temp file per call: threads storing the same image at once
+    # must not share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        # The content is addressed by its digest, so another writer's file is as good
+        if not os.path.exists(path):
+            raise
+
+
+def put(data: bytes) -> str:
+    """
+    Stores encoded image bytes under their SHA-256 digest and precomputes the
+    thumbnail variants. Identical uploads are stored only once.
+
+    Returns:
+        The hex digest identifying the image.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    original_path = image_path(digest)
+    if not os.path.exists(original_path):
+        _write_atomic(original_path, data)
+    for variant, (max_edge, quality) in VARIANTS.items():
+        path = image_path(digest, variant)
+        if variant == 'original' or os.path.exists(path):
+            continue
+        with Image.open(io.BytesIO(data)) as image:
+            _write_atomic(path, encode_image(image, max_edge=max_edge, quality=quality))
+    return digest
+
+
+def save_image(image: Image.Image) -> str:
+    """Compresses a PIL Image and stores it. Returns the image digest."""
+    _, quality = VARIANTS['original']
+    return put(encode_image(image, quality=quality))
+
+
+def exists(digest: str, variant: str = 'original') -> bool:
+    try:
+        return os.path.exists(image_path(digest, variant))
+    except ValueError:
+        return False
+
+
+def archive(digest: str, archive_dir: str):
+    """
+    Moves every stored variant of an image into `archive_dir` (same layout as
+    IMAGE_DIR). Returns the number of files moved.
+    """
+    moved = 0
+    for variant in VARIANTS:
+        path = image_path(digest, variant)
+        if not os.path.exists(path):
+            continue
+        target = os.path.join(archive_dir, os.path.relpath(path, IMAGE_DIR))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+        moved += 1
+    return moved
@@ -0,0 +1,190 @@
+# Durable background queue for photo analysis, stored in the `analysis_jobs`
+# table of the main SQLite database, so no external broker is needed.
+#
+# The app stores the photo (`image_store`), calls `submit` and polls `get_job`;
+# worker processes started with `python job_queue.py --workers N` claim jobs,
+# run `ai_service.analyze_image` and write the result back.
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import time
+
+from PIL import Image
+
+import ai_service
+import db
+import image_store
+
+JOB_WORKERS = int(os.environ.get("ECOCYCLE_JOB_WORKERS", "2"))
+MAX_ATTEMPTS = 5
+# Delay before retry n is RETRY_BASE_DELAY_SECONDS * 2^(n-1), capped
+RETRY_BASE_DELAY_SECONDS = 2.0
+RETRY_MAX_DELAY_SECONDS = 300.0
+# A running job not finished within its lease is considered abandoned
+LEASE_SECONDS = 120.0
+POLL_INTERVAL_SECONDS = 0.5
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _job_dict(row) -> dict:
+    job = dict(row)
+    job['result'] = json.loads(job.pop('result_json')) if job['result_json'] else None
+    return job
+
+
+def submit(image_hash: str) -> dict:
+    """
+    Queues the analysis of a stored image. Submitting an image that already
+    has a job returns that job instead (a failed one is queued again).
+    """
+    now = time.time()
+    with db.pooled_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO analysis_jobs (image_hash, status, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (image_hash) DO UPDATE SET
+                status = excluded.status,
+                attempts = 0,
+                available_at = excluded.available_at,
+                error = NULL,
+                updated_at = excluded.updated_at
+            WHERE status = 'failed'
+            """,
+            (image_hash, QUEUED, now, now, now),
+        )
+        conn.commit()
+        row = conn.execute("SELECT * FROM analysis_jobs WHERE image_hash = ?", (image_hash,)).fetchone()
+    return _job_dict(row)
+
+
+def get_job(job_id: int):
+    """Returns a job (`status`, `attempts`, `result`, `error`, ...) or None."""
+    with db.pooled_connection() as conn:
+        row = conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def claim(worker_id: str):
+    """
+    Atomically takes the oldest runnable job (queued and due, or with an
+    expired lease). A job whose lease expired after MAX_ATTEMPTS attempts
+    (e.g. its photo keeps crashing the worker) is marked failed instead.
+    """
+    now = time.time()
+    with db.pooled_connection() as conn:
+        conn.execute(
+            """
+            UPDATE analysis_jobs SET status = ?, error = ?, locked_by = NULL, updated_at = ?
+            WHERE status = ? AND locked_until < ? AND attempts >= ?
+            """,
+            (FAILED, "Lease expired on the last attempt (worker lost)", now, RUNNING, now, MAX_ATTEMPTS),
+        )
+        row = conn.execute(
+            """
+            UPDATE analysis_jobs
+            SET status = ?, attempts = attempts + 1, locked_by = ?, locked_until = ?, updated_at = ?
+            WHERE id = (
+                SELECT id FROM analysis_jobs
+                WHERE (status = ? AND available_at <= ?) OR (status = ? AND locked_until < ? AND attempts < ?)
+                ORDER BY available_at
+                LIMIT 1
+            )
+            RETURNING *
+            """,
+            (RUNNING, worker_id, now + LEASE_SECONDS, now, QUEUED, now, RUNNING, now, MAX_ATTEMPTS),
+        ).fetchone()
+        conn.commit()
+    return _job_dict(row) if row else None
+
+
+def complete(job: dict, worker_id: str, result: dict):
+    with db.pooled_connection() as conn:
+        conn.execute(
+            """
+            UPDATE analysis_jobs SET status = ?, result_json = ?, error = NULL, locked_by = NULL, updated_at = ?
+            WHERE id = ? AND locked_by = ?
+            """,
+            (DONE, json.dumps(result), time.time(), job['id'], worker_id),
+        )
+        conn.commit()
+
+
+def retry_or_fail(job: dict, worker_id: str, error: str):
+    """Schedules another attempt with exponential backoff, or marks the job failed after MAX_ATTEMPTS."""
+    now = time.time()
+    if job['attempts'] >= MAX_ATTEMPTS:
+        status, available_at = FAILED, job['available_at']
+    else:
+        status = QUEUED
+        available_at = now + min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (job['attempts'] - 1))
+    with db.pooled_connection() as conn:
+        conn.execute(
+            """
+            UPDATE analysis_jobs SET status = ?, available_at = ?, error = ?, locked_by = NULL, updated_at = ?
+            WHERE id = ? AND locked_by = ?
+            """,
+            (status, available_at, error, now, job['id'], worker_id),
+        )
+        conn.commit()
+
+
+def process_one(worker_id: str, analyze=None) -> bool:
+    """Claims and runs a single job. Returns False if there was nothing to do."""
+    job = claim(worker_id)
+    if job is None:
+        return False
+    analyze = analyze or ai_service.analyze_image
+    try:
+        with Image.open(image_store.image_path(job['image_hash'])) as image:
+            result = analyze(image)
+    except Exception as e:
+        print(f"Job {job['id']} attempt {job['attempts']} failed: {e}")
+        retry_or_fail(job, worker_id, str(e))
+    else:
+        complete(job, worker_id, result)
+    return True
+
+
+def run_worker(poll_interval: float = POLL_INTERVAL_SECONDS):
+    """Processes jobs until interrupted, sleeping `poll_interval` when the queue is empty."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Analysis worker {worker_id} started.")
+    try:
+        while True:
+            if not process_one(worker_id):
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs analysis queue worker processes.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+
+    if ai_service.AI_BACKEND != "fake":
+        try:
+            ai_service.load_api_key()
+        except ai_service.AIConfigError as e:
+            raise SystemExit(str(e))
+    db.init_db()
+    workers = [multiprocessing.Process(target=run_worker) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import db
+
+# How often the watcher checks the database when no in-process commit woke it
+# up (posts written by another process, e.g. the Streamlit app).
+POLL_INTERVAL_SECONDS = 2.0
+# Events buffered per subscriber; a slow client loses its oldest events first.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def format_sse(post: dict) -> str:
+    """Encodes a post as a Server-Sent Events message."""
+    return f"id: {post['id']}\nevent: post\ndata: {json.dumps(post)}\n\n"
+
+
+class Subscription:
+    """One connected client, optionally scoped to a bounding box and suitability tags."""
+
+    def __init__(self, bbox: tuple = None, tags: list = None, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.bbox = bbox
+        self.tags = set(tags or [])
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def matches(self, post: dict) -> bool:
+        if self.bbox:
+            min_lon, min_lat, max_lon, max_lat = self.bbox
+            if not (min_lat <= post['lat'] <= max_lat and min_lon <= post['lon'] <= max_lon):
+                return False
+        if self.tags:
+            post_tags = {t.strip() for t in (post.get('suitable_for') or '').split(',')}
+            if not self.tags & post_tags:
+                return False
+        return True
+
+    def push(self, post_id: int, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait((post_id, message))
+
+
+class PostBroker:
+    """
+    In-process pub/sub for newly created posts.
+
+    A single watcher task reads new rows (`id > last seen id`, a primary key
+    range scan) and fans them out to every matching subscriber's queue. It is
+    woken immediately by db commits in this process and otherwise polls every
+    `poll_interval` seconds, so idle subscribers cost one queue each and the
+    database sees one query per batch of new posts, not one per client.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._last_id = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        latest = await db.run_async(db.get_waste_posts, columns=('id',), limit=1)
+        self._last_id = latest[0]['id'] if latest else 0
+        db.add_commit_listener(self._on_commit)
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        db.remove_commit_listener(self._on_commit)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, bbox: tuple = None, tags: list = None) -> Subscription:
+        subscription = Subscription(bbox=bbox, tags=tags)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, post: dict):
+        """Fans a post out to all matching subscribers. Must run on the event loop."""
+        message = format_sse(post)
+        for subscription in self._subscribers:
+            if subscription.matches(post):
+                subscription.push(post['id'], message)
+
+    def _on_commit(self, post_id: int):
+        # Called from whichever thread committed the post
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _watch(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                posts = await db.run_async(db.get_waste_posts, since=self._last_id)
+            except Exception as e:
+                print(f"Live update watcher failed to read new posts: {e}")
+                continue
+            # Oldest first, so clients receive posts in creation order
+            for post in reversed(posts):
+                self._last_id = max(self._last_id, post['id'])
+                self.publish(post)
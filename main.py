@@ -1,19 +1,21 @@
 import streamlit as st
 from streamlit_folium import st_folium
 from streamlit_geolocation import streamlit_geolocation
-import folium
-from folium.plugins import MarkerCluster
 from PIL import Image
-import random
+import asyncio
 import io
-import math
 import pandas as pd
-import urllib.parse
+import time
 import numpy as np
 
 # Import local modules
 import db
 import ai_service
+import batch_ingest
+import geo
+import image_store
+import job_queue
+import map_view
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -195,30 +197,27 @@ except Exception as e:
 
 
 # --- Helper Functions ---
-def jitter_location(lat, lon, meters=200):
-    """Adds a random offset to latitude and longitude to protect privacy."""
-    lat_jitter = random.uniform(-meters, meters) / 111132
-    lon_jitter = random.uniform(-meters, meters) / (111132 * abs(math.cos(math.radians(lat))))
-    return lat + lat_jitter, lon + lon_jitter
-
-def get_marker_color(post: dict) -> str:
-    """Determines marker color based on waste suitability."""
-    suitable_for = post.get('suitable_for', '').lower()
-    if 'sayur' in post.get('waste_category', '').lower() or 'kompos' in suitable_for:
-        return 'green'
-    if 'makanan' in post.get('waste_category', '').lower() or 'ayam' in suitable_for or 'maggot' in suitable_for:
-        return 'orange'
-    return 'red'
-
-def get_suitability_emojis(tags_string: str) -> str:
-    """Returns emojis based on suitability tags."""
-    emojis = []
-    if 'Maggot' in tags_string: emojis.append("🐛")
-    if 'Ayam' in tags_string or 'Unggas' in tags_string: emojis.append("🐔")
-    if 'Pupuk Kompos' in tags_string: emojis.append("🌱")
-    if 'Ikan' in tags_string: emojis.append("🐟")
-    if 'Biogas' in tags_string: emojis.append("💨")
-    return " ".join(emojis)
+DEFAULT_MAP_CENTER = [-6.2088, 106.8456] # Jakarta
+INITIAL_MAP_RADIUS_M = 15000
+# How often the provider page checks on a queued photo analysis
+JOB_POLL_SECONDS = 1.5
+# Seeker map caches. Entries are keyed by db.get_data_version(), so a new post
+# invalidates them; otherwise reruns (filter clicks, viewport echoes) reuse the
+# query result and the rendered marker rows.
+MAP_DATA_CACHE_SIZE = 64
+POPUP_CACHE_SIZE = 20000
+
+def viewport_from_map_state(map_state) -> dict:
+    """Extracts the visible bbox, center and zoom from st_folium's returned state."""
+    try:
+        sw = map_state['bounds']['_southWest']
+        ne = map_state['bounds']['_northEast']
+        bbox = tuple(round(v, 5) for v in (sw['lng'], sw['lat'], ne['lng'], ne['lat']))
+        center = [map_state['center']['lat'], map_state['center']['lng']]
+        return {'bbox': bbox, 'center': center, 'zoom': map_state['zoom']}
+    except (KeyError, TypeError):
+        # The map has not reported its viewport yet
+        return None
 
 def change_page(page_name):
     """Callback function to change the page view."""
@@ -243,12 +242,19 @@ def show_landing_page():
         unsafe_allow_html=True
     )
 
-    # Key Traction Metrics
+    # Key Traction Metrics, read from the pre-aggregated stats tables (every provider type, latest day first)
+    stats = db.get_post_stats(limit=len(db.ProviderType))
+    today = time.strftime('%Y-%m-%d', time.gmtime())
+    latest_day = stats['day'][0] if stats['day'] and stats['day'][0]['key'] == today else {'post_count': 0, 'total_weight': 0.0}
+    umkm_posts = sum(
+        row['post_count'] for row in stats['provider_type']
+        if row['key'] in (db.ProviderType.RESTO.value, db.ProviderType.PASAR.value)
+    )
     c1, c2, c3, c4 = st.columns(4)
     metrics = [
-        ("1,247 kg", "Limbah Terolah", "↗ 12% WoW"),
-        ("Rp 18.5jt", "Valuasi Transaksi", "↗ 8% MoM"),
-        ("318", "Mitra UMKM", "+12 Hari ini"),
+        (f"{stats['total']['total_weight']:,.0f} kg", "Limbah Terdata", f"+{latest_day['total_weight']:,.1f} kg hari ini"),
+        (f"{stats['total']['post_count']:,}", "Postingan Limbah", f"+{latest_day['post_count']} hari ini"),
+        (f"{umkm_posts:,}", "Postingan UMKM", "Restoran & Pasar"),
         ("98.5%", "Akurasi AI", "Model v2.1")
     ]
     
@@ -317,6 +323,29 @@ def show_landing_page():
 # ======================================================================================
 # --- 2. PROVIDER VIEW (AI SCANNER) ---
 # ======================================================================================
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_analysis_job_status():
+    """Polls the queued analysis of the uploaded photo; reruns the page once it finishes."""
+    job_id = st.session_state.get('analysis_job_id')
+    if job_id is None:
+        return
+    job = job_queue.get_job(job_id)
+    if job is None or job['status'] in (job_queue.DONE, job_queue.FAILED):
+        del st.session_state.analysis_job_id
+        if job is None or job['status'] == job_queue.FAILED:
+            st.session_state.analysis_error = job['error'] if job else ''
+        elif job['result'].get('is_organic_waste') is False:
+            st.session_state.analysis_rejection = job['result'].get('rejection_reason', 'Bukan limbah organik.')
+        else:
+            st.session_state.ai_analysis = job['result']
+        st.rerun()
+    elif job['status'] == job_queue.QUEUED and job['attempts']:
+        st.warning(f"⏳ AI sibuk, mencoba lagi (percobaan ke-{job['attempts'] + 1})...")
+    elif job['status'] == job_queue.QUEUED:
+        st.info("⏳ Foto dalam antrean analisis...")
+    else:
+        st.info("🤖 AI sedang bekerja...")
+
 def show_provider_page():
     c1, c2 = st.columns([1, 5])
     with c1:
@@ -335,22 +364,33 @@ def show_provider_page():
 
     with c_input:
         st.selectbox("Jenis Sumber", [p.value for p in db.ProviderType], key="prov_type")
+        batch_mode = (
+            db.ProviderType(st.session_state.prov_type) in BATCH_PROVIDER_TYPES
+            and st.toggle("📦 Mode Batch (banyak foto sekaligus)", key="batch_mode")
+        )
+    if batch_mode:
+        show_batch_upload()
+        return
+
+    with c_input:
         uploaded_file = st.file_uploader("Ambil Foto / Upload", type=["jpg", "png", "jpeg"])
         
         if uploaded_file:
             if st.button("🔍 Analisis Foto", type="primary", use_container_width=True):
                 st.session_state.pil_image = Image.open(uploaded_file)
-                with st.spinner("AI sedang bekerja..."):
-                    res = ai_service.analyze_waste_multipurpose(st.session_state.pil_image)
-                    if 'error' not in res:
-                        if res.get('is_organic_waste') is False:
-                            st.error(f"❌ Foto ditolak: {res.get('rejection_reason', 'Bukan limbah organik.')}")
-                            # Clear analysis so it doesn't show the success card
-                            if 'ai_analysis' in st.session_state: del st.session_state.ai_analysis
-                        else:
-                            st.session_state.ai_analysis = res
-                    else:
-                        st.error("Gagal analisis.")
+                # The analysis runs on a queue worker; this session only polls the job
+                blob = ai_service.image_to_blob(st.session_state.pil_image)
+                st.session_state.image_hash = image_store.put(blob)
+                st.session_state.analysis_job_id = job_queue.submit(st.session_state.image_hash)['id']
+                for key in ('ai_analysis', 'analysis_rejection', 'analysis_error'):
+                    st.session_state.pop(key, None)
+
+        if 'analysis_job_id' in st.session_state:
+            show_analysis_job_status()
+        if 'analysis_rejection' in st.session_state:
+            st.error(f"❌ Foto ditolak: {st.session_state.analysis_rejection}")
+        if 'analysis_error' in st.session_state:
+            st.error(f"Gagal analisis. {st.session_state.analysis_error}")
 
     with c_preview:
         if 'pil_image' in st.session_state:
@@ -377,7 +417,7 @@ def show_provider_page():
                     </div>
                 </div>
                 <div style="background:rgba(255,255,255,0.6); padding:1rem; border-radius:12px; margin-top:1rem;">
-                    <strong>💡 Rekomendasi:</strong> {', '.join(res.get('suitability_tags', []))} {get_suitability_emojis(", ".join(res.get('suitability_tags', [])))}
+                    <strong>💡 Rekomendasi:</strong> {', '.join(res.get('suitability_tags', []))} {map_view.get_suitability_emojis(", ".join(res.get('suitability_tags', [])))}
                     <br>
                     <small style="color:#64748b;">Tip: {res.get('handling_tip', '-')}</small>
                 </div>
@@ -393,20 +433,102 @@ def show_provider_page():
             if location and location.get('latitude'):
                 st.success("Lokasi Akurat.")
                 if st.button("🚀 Posting ke Marketplace", type="primary", use_container_width=True):
-                    priv_lat, priv_lon = jitter_location(location['latitude'], location['longitude'])
-                    blob = ai_service.image_to_blob(st.session_state.pil_image)
+                    priv_lat, priv_lon = geo.jitter_location(location['latitude'], location['longitude'])
                     db.add_waste_post(
                         db.ProviderType(st.session_state.prov_type),
-                        priv_lat, priv_lon, blob, st.session_state.ai_analysis
+                        priv_lat, priv_lon, st.session_state.image_hash, st.session_state.ai_analysis
                     )
                     st.balloons()
                     st.success("Berhasil diposting!")
                     del st.session_state.ai_analysis
 
 
+# Markets and restaurants post many bins at once
+BATCH_PROVIDER_TYPES = (db.ProviderType.PASAR, db.ProviderType.RESTO)
+BATCH_STATUS_LABELS = {
+    batch_ingest.ANALYZING: "🤖 Menganalisis",
+    batch_ingest.RETRYING: "⏳ Menunggu kuota AI",
+    batch_ingest.ACCEPTED: "✅ Diterima",
+    batch_ingest.REJECTED: "❌ Ditolak",
+    batch_ingest.FAILED: "⚠️ Gagal",
+    batch_ingest.POSTED: "🚀 Terposting",
+}
+
+def show_batch_upload():
+    """Multi-photo upload: analyses all photos concurrently and posts the accepted ones together."""
+    uploaded_files = st.file_uploader(
+        "Upload Banyak Foto", type=["jpg", "png", "jpeg"], accept_multiple_files=True, key="batch_files"
+    )
+    if not uploaded_files:
+        return
+    if len(uploaded_files) > batch_ingest.MAX_BATCH_SIZE:
+        st.warning(f"Maksimal {batch_ingest.MAX_BATCH_SIZE} foto per batch.")
+        return
+
+    location = streamlit_geolocation()
+    if not (location and location.get('latitude')):
+        st.info("📍 Izinkan akses lokasi untuk memposting batch.")
+        return
+
+    if st.button(f"🚀 Analisis & Posting {len(uploaded_files)} Foto", type="primary", use_container_width=True):
+        images = [f.getvalue() for f in uploaded_files]
+        names = [f.name for f in uploaded_files]
+        statuses = ["⏸️ Antre"] * len(images)
+        details = [""] * len(images)
+        finished = set()
+        progress_bar = st.progress(0.0, text=f"0/{len(images)} foto dianalisis")
+        status_table = st.empty()
+
+        def on_progress(event):
+            index = event['index']
+            statuses[index] = BATCH_STATUS_LABELS[event['status']]
+            details[index] = event.get('reason') or event.get('error') or (
+                event['analysis'].get('main_composition', '') if 'analysis' in event else details[index]
+            )
+            if event['status'] in (batch_ingest.ACCEPTED, batch_ingest.REJECTED, batch_ingest.FAILED):
+                finished.add(index)
+            progress_bar.progress(len(finished) / len(images), text=f"{len(finished)}/{len(images)} foto dianalisis")
+            status_table.dataframe(
+                pd.DataFrame({"Foto": names, "Status": statuses, "Keterangan": details}),
+                hide_index=True, use_container_width=True,
+            )
+
+        priv_lat, priv_lon = geo.jitter_location(location['latitude'], location['longitude'])
+        results = asyncio.run(batch_ingest.ingest_batch(
+            images, db.ProviderType(st.session_state.prov_type), priv_lat, priv_lon, on_progress=on_progress,
+        ))
+        posted = sum(result['status'] == batch_ingest.POSTED for result in results)
+        if posted:
+            st.balloons()
+        st.success(f"{posted} dari {len(images)} foto berhasil diposting!")
+
+
 # ======================================================================================
 # --- 3. SEEKER VIEW (MAPS) ---
 # ======================================================================================
+@st.cache_data(max_entries=MAP_DATA_CACHE_SIZE, show_spinner=False)
+def load_map_data(data_version: int, zoom: int, bbox: tuple, filters: tuple):
+    """Clusters (zoomed out) or posts (zoomed in) for a viewport, both filtered by tag; cached per data version."""
+    if zoom <= db.CLUSTER_MAX_ZOOM:
+        return db.get_clusters(zoom, bbox, filters=list(filters)), []
+    return [], db.get_waste_posts(filters=list(filters), bbox=bbox)
+
+@st.cache_data(max_entries=POPUP_CACHE_SIZE, show_spinner=False)
+def render_post_popup(post_id: int, _post: dict) -> str:
+    # Keyed by id only: a post's popup content never changes once it is posted
+    return map_view.render_popup(_post)
+
+@st.cache_data(max_entries=MAP_DATA_CACHE_SIZE, show_spinner=False)
+def load_marker_rows(data_version: int, zoom: int, bbox: tuple, filters: tuple) -> list:
+    """
+    Marker rows (see map_view.post_marker_row) for a viewport. The folium Map
+    itself is rebuilt every rerun, as st_folium mutates the object it is given;
+    the rebuild is cheap and its output identical, so the browser is not sent
+    the map again when nothing changed.
+    """
+    _, posts = load_map_data(data_version, zoom, bbox, filters)
+    return [map_view.post_marker_row(post, render_post_popup(post['id'], post)) for post in posts]
+
 def show_seeker_page():
     st.button("← Kembali ke Dashboard", on_click=change_page, args=("landing",))
     
@@ -424,75 +546,67 @@ def show_seeker_page():
     with st.container():
         cols = st.columns([3, 2])
         with cols[0]:
-            filters = st.multiselect("Filter Kategori Pakan:", ['Maggot BSF', 'Ayam/Unggas', 'Ikan Lele', 'Pupuk Kompos'], default=['Maggot BSF'])
+            filters = st.multiselect("Filter Kategori Pakan:", [t.value for t in db.SuitabilityTag], default=[db.SuitabilityTag.MAGGOT_BSF.value])
         with cols[1]:
              st.caption("Menampilkan hasil real-time dari database.")
 
-    # Map Logic
-    posts = db.get_waste_posts(filters=filters)
-    
-    # --- AUTO FOCUS LOGIC ---
-    if posts:
-        # Calculate centroid of all posts
-        lats = [p['lat'] for p in posts]
-        lons = [p['lon'] for p in posts]
-        avg_lat = np.mean(lats)
-        avg_lon = np.mean(lons)
-        map_center = [avg_lat, avg_lon]
-        zoom_level = 13 # Closer zoom because we have data
+    # Map Logic: only the current viewport is loaded (spatial index query); when
+    # zoomed out, pre-aggregated clusters are drawn instead of individual posts
+    data_version = db.get_data_version()
+    view = st.session_state.get('seeker_view')
+    if view:
+        map_center = view['center']
+        zoom_level = view['zoom']
+        bbox = view['bbox']
     else:
-        # Fallback if no data
-        map_center = [-6.2088, 106.8456] # Jakarta
-        zoom_level = 11
-
-    # Initialize Map
-    m = folium.Map(location=map_center, zoom_start=zoom_level, tiles="CartoDB positron")
-    marker_cluster = MarkerCluster().add_to(m)
-
-    for post in posts:
-        # Content for Popup
-        emojis = get_suitability_emojis(post['suitable_for'])
-        
-        # WhatsApp Link Construction
-        phone = "6285388156854"
-        msg = f"Halo, saya lihat postingan limbah *{post['waste_category']}* ({post['weight_est']}kg) di EcoCycle Maps. Apakah masih ada?"
-        wa_url = f"https://wa.me/{phone}?text={urllib.parse.quote(msg)}"
-
-        html = f"""
-            <div style="font-family:'Plus Jakarta Sans',sans-serif; width:250px;">
-                <div style="background:#10b981; color:white; padding:4px 10px; border-radius:4px 4px 0 0; font-size:10px; font-weight:bold; text-transform:uppercase;">
-                    {post['provider_type']}
-                </div>
-                <div style="padding:12px; border:1px solid #e2e8f0; border-top:none; border-radius:0 0 8px 8px; background:white;">
-                    <h4 style="margin:0 0 5px; color:#0f172a;">{post['waste_category']}</h4>
-                    <div style="font-size:18px; font-weight:800; color:#059669; margin-bottom:8px;">{post['weight_est']:.1f} kg</div>
-                    <p style="font-size:12px; color:#64748b; margin:0 0 12px;">Cocok: {post['suitable_for']} {emojis}</p>
-                    
-                    <a href="{wa_url}" target="_blank" style="display:block; background:#25D366; color:white; text-align:center; padding:8px; border-radius:6px; text-decoration:none; font-weight:bold; font-size:13px;">
-                        💬 Hubungi via WA
-                    </a>
-                    <div style="text-align:center; margin-top:8px;">
-                        <a href="https://www.google.com/maps/dir/?api=1&destination={post['lat']},{post['lon']}" target="_blank" style="color:#3b82f6; font-size:11px; text-decoration:none;">
-                            📍 Navigasi ke Lokasi
-                        </a>
-                    </div>
-                </div>
-            </div>
-        """
-
-        folium.Marker(
-            location=[post['lat'], post['lon']],
-            popup=folium.Popup(html, max_width=300),
-            tooltip=f"{post['waste_category']}",
-            icon=folium.Icon(color=get_marker_color(post), icon="leaf", prefix="fa"),
-        ).add_to(marker_cluster)
-
-    st_folium(m, width='100%', height=600, returned_objects=[])
+        # First visit: look at the area around the default center
+        bbox = geo.radius_bbox(*DEFAULT_MAP_CENTER, INITIAL_MAP_RADIUS_M)
+        area_clusters, _ = load_map_data(data_version, 11, bbox, ())
+
+        # --- AUTO FOCUS LOGIC ---
+        if area_clusters:
+            # Calculate centroid of all posts, weighting each cluster by its post count
+            points = np.array([(c['lat'], c['lon'], c['count']) for c in area_clusters])
+            map_center = list(geo.weighted_centroid(points[:, 0], points[:, 1], weights=points[:, 2]))
+            zoom_level = 13 # Closer zoom because we have data
+        else:
+            # Fallback if no data
+            map_center = DEFAULT_MAP_CENTER # Jakarta
+            zoom_level = 11
+
+    filter_key = tuple(sorted(filters))
+
+    started = time.perf_counter()
+    clusters, posts = load_map_data(data_version, zoom_level, bbox, filter_key)
+    loaded = time.perf_counter()
+    marker_rows = load_marker_rows(data_version, zoom_level, bbox, filter_key)
+    m = map_view.build_seeker_map(map_center, zoom_level, clusters, marker_rows)
+    built = time.perf_counter()
+
+    map_state = st_folium(m, width='100%', height=600, key="seeker_map", returned_objects=["bounds", "center", "zoom"])
+    rendered = time.perf_counter()
+    timings = {
+        'points': len(posts) or len(clusters),
+        'data_ms': (loaded - started) * 1000,
+        'build_ms': (built - loaded) * 1000,
+        'render_ms': (rendered - built) * 1000,
+    }
+    new_view = viewport_from_map_state(map_state)
+    if new_view and (not view or new_view['bbox'] != view['bbox']):
+        st.session_state.seeker_view = new_view
+        st.rerun()
     
-    if posts:
-        st.success(f"Menampilkan {len(posts)} titik lokasi terdekat.")
+    if clusters:
+        total = sum(c['count'] for c in clusters)
+        st.success(f"Menampilkan {total} titik lokasi di area peta dalam {len(clusters)} klaster. Perbesar peta untuk melihat detail.")
+    elif posts:
+        st.success(f"Menampilkan {len(posts)} titik lokasi di area peta.")
     else:
         st.warning("Belum ada data limbah di area ini. Jadilah yang pertama memposting!")
+    with st.expander("⏱️ Performa peta"):
+        st.caption(
+            "{points} titik • data {data_ms:.1f} ms • bangun peta {build_ms:.1f} ms • render {render_ms:.1f} ms".format(**timings)
+        )
 
 
 # ======================================================================================
@@ -0,0 +1,119 @@
+import re
+import urllib.parse
+
+import folium
+from folium.plugins import FastMarkerCluster
+
+# Number every "Hubungi via WA" button opens
+WHATSAPP_PHONE = "6285388156854"
+
+def _compact_html(html: str) -> str:
+    # Popups are shipped to the browser once per post, so drop the indentation
+    return re.sub(r">\s+<", "><", re.sub(r"\s*\n\s*", " ", html)).strip()
+
+# Rendered once per post (see `render_popup`); every value is preformatted.
+POPUP_TEMPLATE = _compact_html("""
+    <div style="font-family:'Plus Jakarta Sans',sans-serif; width:250px;">
+        <div style="background:#10b981; color:white; padding:4px 10px; border-radius:4px 4px 0 0; font-size:10px; font-weight:bold; text-transform:uppercase;">
+            {provider_type}
+        </div>
+        <div style="padding:12px; border:1px solid #e2e8f0; border-top:none; border-radius:0 0 8px 8px; background:white;">
+            <h4 style="margin:0 0 5px; color:#0f172a;">{waste_category}</h4>
+            <div style="font-size:18px; font-weight:800; color:#059669; margin-bottom:8px;">{weight_est:.1f} kg</div>
+            <p style="font-size:12px; color:#64748b; margin:0 0 12px;">Cocok: {suitable_for} {emojis}</p>
+
+            <a href="{wa_url}" target="_blank" style="display:block; background:#25D366; color:white; text-align:center; padding:8px; border-radius:6px; text-decoration:none; font-weight:bold; font-size:13px;">
+                💬 Hubungi via WA
+            </a>
+            <div style="text-align:center; margin-top:8px;">
+                <a href="https://www.google.com/maps/dir/?api=1&destination={lat},{lon}" target="_blank" style="color:#3b82f6; font-size:11px; text-decoration:none;">
+                    📍 Navigasi ke Lokasi
+                </a>
+            </div>
+        </div>
+    </div>
+""")
+
+CLUSTER_ICON_TEMPLATE = """
+    <div style="background:rgba(16,185,129,0.85); width:{size}px; height:{size}px; border-radius:50%; border:3px solid white; box-shadow:0 2px 5px rgba(0,0,0,0.2); display:flex; align-items:center; justify-content:center; color:white; font-weight:bold; font-size:13px;">
+        {count}
+    </div>
+"""
+
+
+def get_marker_color(post: dict) -> str:
+    """Determines marker color based on waste suitability."""
+    suitable_for = (post.get('suitable_for') or '').lower()
+    if 'sayur' in (post.get('waste_category') or '').lower() or 'kompos' in suitable_for:
+        return 'green'
+    if 'makanan' in (post.get('waste_category') or '').lower() or 'ayam' in suitable_for or 'maggot' in suitable_for:
+        return 'orange'
+    return 'red'
+
+
+def get_suitability_emojis(tags_string: str) -> str:
+    """Returns emojis based on suitability tags."""
+    emojis = []
+    if 'Maggot' in tags_string: emojis.append("🐛")
+    if 'Ayam' in tags_string or 'Unggas' in tags_string: emojis.append("🐔")
+    if 'Pupuk Kompos' in tags_string: emojis.append("🌱")
+    if 'Ikan' in tags_string: emojis.append("🐟")
+    if 'Biogas' in tags_string: emojis.append("💨")
+    return " ".join(emojis)
+
+
+def render_popup(post: dict) -> str:
+    """Renders the map popup HTML of a post from POPUP_TEMPLATE."""
+    suitable_for = post.get('suitable_for') or ''
+    msg = f"Halo, saya lihat postingan limbah *{post['waste_category']}* ({post['weight_est']}kg) di EcoCycle Maps. Apakah masih ada?"
+    return POPUP_TEMPLATE.format(
+        provider_type=post['provider_type'],
+        waste_category=post['waste_category'],
+        weight_est=post['weight_est'] or 0.0,
+        suitable_for=suitable_for,
+        emojis=get_suitability_emojis(suitable_for),
+        wa_url=f"https://wa.me/{WHATSAPP_PHONE}?text={urllib.parse.quote(msg)}",
+        lat=post['lat'],
+        lon=post['lon'],
+    )
+
+
+# Builds each post marker in the browser from a `post_marker_row`. One data
+# array renders and serializes far faster than a folium.Marker per post.
+POST_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'leaf', prefix: 'fa', markerColor: row[3]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2], {maxWidth: 300});
+    marker.bindTooltip(row[4]);
+    return marker;
+}
+"""
+
+
+def post_marker_row(post: dict, popup_html: str) -> list:
+    """The `[lat, lon, popup, color, tooltip]` row POST_MARKER_CALLBACK expects."""
+    return [post['lat'], post['lon'], popup_html, get_marker_color(post), post['waste_category']]
+
+
+def build_seeker_map(center: list, zoom: int, clusters: list, marker_rows: list) -> folium.Map:
+    """
+    Builds the seeker folium map: one DivIcon marker per cluster, plus the
+    posts given as `post_marker_row`s, grouped client-side by a marker cluster.
+    """
+    m = folium.Map(location=center, zoom_start=zoom, tiles="CartoDB positron")
+
+    for cluster in clusters:
+        size = 34 if cluster['count'] < 10 else 42 if cluster['count'] < 100 else 52
+        folium.Marker(
+            location=[cluster['lat'], cluster['lon']],
+            tooltip=f"{cluster['count']} postingan • {cluster['total_weight']:.1f} kg • {cluster['dominant_category']}",
+            icon=folium.DivIcon(
+                icon_size=(size, size),
+                icon_anchor=(size // 2, size // 2),
+                html=CLUSTER_ICON_TEMPLATE.format(size=size, count=cluster['count']),
+            ),
+        ).add_to(m)
+
+    FastMarkerCluster(marker_rows, callback=POST_MARKER_CALLBACK).add_to(m)
+    return m
@@ -0,0 +1,220 @@
+import bisect
+import cProfile
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text format, served by api.py at
+# /metrics. Each module declares its own counters and histograms at import
+# time; values are per process (queue workers keep their own).
+
+# Histogram buckets in seconds, from a cached db read to a slow model call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Opt-in profiling: requests slower than PROFILE_SLOW_MS get a cProfile dump
+# (pstats format, open with `python -m pstats` or snakeviz) in PROFILE_DIR.
+PROFILE_SLOW_MS = float(os.environ.get("ECOCYCLE_PROFILE_SLOW_MS", 0)) or None
+PROFILE_DIR = os.environ.get("ECOCYCLE_PROFILE_DIR", "profiles")
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_value(key, value) for key, value in items)
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing total, e.g. failures or bytes read."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key: tuple, value: float) -> str:
+        return f"{self.name}{_format_labels(self.labels, key)} {value:g}"
+
+
+class Histogram(_Metric):
+    """Observations (latencies, sizes) counted into cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Span: observes the wall time of the `with` block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key: tuple, value: tuple) -> str:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return "\n".join(lines)
+
+
+def render(extra: list = None) -> str:
+    """
+    The current value of every registered metric in the Prometheus text
+    format. `extra` takes `(name, kind, documentation, value)` tuples for values
+    read at scrape time (e.g. totals kept in a database).
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for name, kind, documentation, value in extra or ():
+        lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value:g}"])
+    return "\n".join(lines) + "\n"
+
+
+# --- Slow request profiling ---
+# The event loop thread can run one cProfile at a time, so only one request is
+# profiled there at once; work a profiled request sends to the db thread pool
+# (`profile_call`) is profiled on the worker thread and merged into its dump.
+# On Python 3.12+ the event loop's profiler already sees the worker threads and
+# a second one cannot start, so worker calls then run without their own.
+_request_profile = contextvars.ContextVar("request_profile", default=None)
+_loop_profile_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile):
+        with self._lock:
+            self.profiles.append(profile)
+
+    def dump(self, label: str, elapsed_ms: float) -> str:
+        """Writes the merged profile to PROFILE_DIR and returns its path (None if nothing was profiled)."""
+        import pstats
+
+        if not self.profiles:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:80]
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{elapsed_ms:.0f}ms_{slug}.prof")
+        with self._lock:
+            stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(path)
+        return path
+
+
+def _enable(profile: cProfile.Profile) -> bool:
+    """
+    Starts `profile`, or returns False if another profiler is active. From
+    Python 3.12 cProfile runs on sys.monitoring, which allows one profiler per
+    process (and it sees every thread), so only one request is profiled at a time.
+    """
+    try:
+        profile.enable()
+    except ValueError:
+        return False
+    return True
+
+
+@contextmanager
+def profile_request():
+    """
+    Profiles the enclosed request handling when profiling is enabled; yields the
+    RequestProfile (or None when disabled). The caller decides whether to dump it.
+    """
+    if PROFILE_SLOW_MS is None:
+        yield None
+        return
+    request_profile = RequestProfile()
+    token = _request_profile.set(request_profile)
+    loop_profile = cProfile.Profile() if _loop_profile_lock.acquire(blocking=False) else None
+    if loop_profile is not None and not _enable(loop_profile):
+        _loop_profile_lock.release()
+        loop_profile = None
+    try:
+        yield request_profile
+    finally:
+        if loop_profile is not None:
+            loop_profile.disable()
+            _loop_profile_lock.release()
+            request_profile.add(loop_profile)
+        _request_profile.reset(token)
+
+
+def profile_call(func):
+    """
+    Wraps `func` to run under a profiler of the current request, if any. Call
+    this on the event loop before handing `func` to a worker thread.
+    """
+    request_profile = _request_profile.get()
+    if request_profile is None:
+        return func
+
+    def profiled(*args, **kwargs):
+        profile = cProfile.Profile()
+        if not _enable(profile):
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            request_profile.add(profile)
+
+    return profiled
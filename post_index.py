@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import db
+import geo
+import metrics
+
+# In-memory columnar copy of the available posts, so listing, tag filter, bbox
+# and nearby queries are answered with NumPy scans instead of SQLite. Every
+# process (e.g. each uvicorn worker) builds its own copy once, then applies
+# the post ids that triggers append to the post_changes table (see db.init_db).
+
+# The API serves /waste_posts, /filtered and /nearby from the index unless
+# ECOCYCLE_POST_INDEX=0
+ENABLED = os.environ.get("ECOCYCLE_POST_INDEX", "1") != "0"
+
+# Post columns held in memory; listings that only ask for these never read SQLite
+INDEX_COLUMNS = ('id', 'provider_type', 'waste_category', 'weight_est', 'lat', 'lon')
+# Suitability tags are a bitmask with one bit per distinct tag. Posts with
+# further tags are still indexed, but filters on those tags go to SQLite.
+MAX_TAGS = 64
+# Post ids read from SQLite per query (changed posts, rows for a listing page)
+ID_CHUNK_SIZE = 500
+
+INDEX_QUERY_SECONDS = metrics.Histogram("ecocycle_post_index_query_seconds", "Latency of post_index queries.", ("query",))
+INDEX_REFRESHES = metrics.Counter(
+    "ecocycle_post_index_refreshes_total", "post_index refreshes by kind (incremental, rebuild).", ("kind",)
+)
+
+# Available posts with everything the index keeps; expiry as epoch seconds and
+# tags separated by the unit separator character
+_POST_QUERY = """
+    SELECT id, lat, lon, weight_est, COALESCE(CAST(strftime('%s', expires_at) AS INTEGER), 0),
+        waste_category, provider_type,
+        (SELECT group_concat(tag, char(31)) FROM post_tags WHERE post_id = waste_posts.id)
+    FROM waste_posts WHERE status = 'available'
+"""
+
+
+class LivePostIndex:
+    """
+    The available posts as parallel arrays sorted by id: `id`, `lat`, `lon`,
+    `weight_est` (NaN when unknown), `expires` (epoch seconds),
+    `waste_category` and `provider_type` (codes into `dictionaries`) and
+    `tags` (bit `tag_bits[tag]` set for each tag). Posts past `expires` are
+    kept until the lifecycle sweep marks them but never returned.
+
+    A refresh builds new arrays and swaps them in, so queries read a
+    consistent snapshot without locking. Codes and tag bits are only ever
+    added, so an older snapshot still decodes correctly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = None
+        self._seq = 0
+        self.dictionaries = {'waste_category': [], 'provider_type': []}
+        self._codes = {'waste_category': {}, 'provider_type': {}}
+        self.tag_bits = {}
+        self._unindexed_tags = set()
+
+    def __len__(self):
+        columns = self._columns
+        return 0 if columns is None else columns['id'].size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays (the code dictionaries aside)."""
+        columns = self._columns
+        return 0 if columns is None else sum(values.nbytes for values in columns.values())
+
+    def _code(self, name: str, value) -> int:
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+        return code
+
+    def _tag_mask(self, tags) -> int:
+        mask = 0
+        for tag in tags.split("\x1f") if tags else ():
+            bit = self.tag_bits.get(tag)
+            if bit is None:
+                if len(self.tag_bits) >= MAX_TAGS:
+                    self._unindexed_tags.add(tag)
+                    continue
+                bit = self.tag_bits[tag] = len(self.tag_bits)
+            mask |= 1 << bit
+        return mask
+
+    def _to_columns(self, rows: list) -> dict:
+        return {
+            'id': np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+            'lat': np.fromiter((row[1] for row in rows), np.float64, len(rows)),
+            'lon': np.fromiter((row[2] for row in rows), np.float64, len(rows)),
+            'weight_est': np.fromiter((np.nan if row[3] is None else row[3] for row in rows), np.float64, len(rows)),
+            'expires': np.fromiter((row[4] for row in rows), np.int64, len(rows)),
+            'waste_category': np.fromiter((self._code('waste_category', row[5]) for row in rows), np.int32, len(rows)),
+            'provider_type': np.fromiter((self._code('provider_type', row[6]) for row in rows), np.int32, len(rows)),
+            'tags': np.fromiter((self._tag_mask(row[7]) for row in rows), np.uint64, len(rows)),
+        }
+
+    def _build(self):
+        with db.pooled_connection() as conn:
+            # Changes committed while the posts are read are applied once more
+            # by the next refresh, which re-reads their current state
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM post_changes").fetchone()[0]
+            rows = conn.execute(_POST_QUERY + " ORDER BY id").fetchall()
+        self._columns = self._to_columns(rows)
+        self._seq = seq
+        INDEX_REFRESHES.inc(kind="rebuild")
+
+    def build(self):
+        """Loads every available post (once per process, e.g. at API startup)."""
+        with self._lock:
+            self._build()
+
+    def refresh(self) -> int:
+        """
+        Applies the post_changes entries since the last build or refresh with
+        one indexed read (and one per ID_CHUNK_SIZE changed posts). Rebuilds
+        when entries it has not seen were pruned. Returns the number of changed posts.
+        """
+        with self._lock, INDEX_QUERY_SECONDS.time(query="refresh"):
+            if self._columns is None:
+                self._build()
+                return len(self)
+            with db.pooled_connection() as conn:
+                changes = conn.execute(
+                    "SELECT seq, post_id FROM post_changes WHERE seq > ? ORDER BY seq", (self._seq,)
+                ).fetchall()
+                if not changes:
+                    return 0
+                if changes[0]['seq'] != self._seq + 1:
+                    self._build()
+                    return len(self)
+                ids = sorted({change['post_id'] for change in changes})
+                rows = []
+                for start in range(0, len(ids), ID_CHUNK_SIZE):
+                    chunk = ids[start:start + ID_CHUNK_SIZE]
+                    rows.extend(conn.execute(f"{_POST_QUERY} AND id IN ({', '.join('?' * len(chunk))}) ORDER BY id", chunk))
+            current, changed = self._columns, self._to_columns(rows)
+            keep = ~np.isin(current['id'], ids)
+            columns = {name: np.concatenate([values[keep], changed[name]]) for name, values in current.items()}
+            kept_ids = current['id'][keep]
+            if changed['id'].size and kept_ids.size and kept_ids[-1] > changed['id'][0]:
+                # An older post changed (e.g. moved); new posts arrive in id order
+                order = np.argsort(columns['id'], kind='stable')
+                columns = {name: values[order] for name, values in columns.items()}
+            self._columns = columns
+            self._seq = changes[-1]['seq']
+            INDEX_REFRESHES.inc(kind="incremental")
+            return len(ids)
+
+    def covers(self, filters: list = None) -> bool:
+        """Whether tag `filters` can be answered from the bitmask."""
+        return not self._unindexed_tags.intersection(f.strip() for f in filters or [] if f)
+
+    def _mask(self, columns: dict, filters: list = None, bbox: tuple = None, provider_type=None) -> np.ndarray:
+        mask = columns['expires'] > time.time()
+        tags = [f.strip() for f in filters or [] if f and f.strip()]
+        if tags:
+            bits = 0
+            for tag in tags:
+                if tag in self.tag_bits:
+                    bits |= 1 << self.tag_bits[tag]
+            mask &= (columns['tags'] & np.uint64(bits)) != 0
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            lat, lon = columns['lat'], columns['lon']
+            mask &= (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        if provider_type:
+            code = self._codes['provider_type'].get(db.ProviderType(provider_type).value)
+            mask &= columns['provider_type'] == (-1 if code is None else code)
+        return mask
+
+    def select(self, filters: list = None, bbox: tuple = None, provider_type=None,
+               after_id: int = None, since_id: int = None, limit: int = None) -> dict:
+        """
+        The live posts matching suitability tags (any of `filters`), `bbox`
+        `(min_lon, min_lat, max_lon, max_lat)` and `provider_type`, newest
+        first, as a dict of arrays. `after_id` and `since_id` page like the
+        cursors of `db.get_waste_posts`.
+        """
+        columns = self._columns
+        mask = self._mask(columns, filters, bbox, provider_type)
+        if after_id is not None:
+            mask &= columns['id'] < after_id
+        if since_id is not None:
+            mask &= columns['id'] > since_id
+        positions = np.flatnonzero(mask)[::-1][:limit]
+        return {name: values[positions] for name, values in columns.items()}
+
+    def nearby(self, lat: float, lon: float, radius_m: float, limit: int = 50, filters: list = None) -> tuple:
+        """
+        Up to `limit` live posts within `radius_m` meters of (`lat`, `lon`),
+        nearest first: `(dict of arrays, distances_m)`.
+        """
+        columns = self._columns
+        positions = np.flatnonzero(self._mask(columns, filters, geo.radius_bbox(lat, lon, radius_m)))[::-1]
+        distances = geo.haversine_m(lat, lon, columns['lat'][positions], columns['lon'][positions])
+        keep = distances <= radius_m
+        positions, distances = positions[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')[:limit]
+        return {name: values[positions[order]] for name, values in columns.items()}, distances[order]
+
+    def rows(self, selected: dict, columns: tuple = INDEX_COLUMNS) -> list:
+        """Post dicts with `columns` (all from INDEX_COLUMNS) for the output of `select` or `nearby`."""
+        values = []
+        for name in columns:
+            column = selected[name].tolist()
+            if name in self.dictionaries:
+                dictionary = self.dictionaries[name]
+                column = [dictionary[code] for code in column]
+            elif name == 'weight_est':
+                column = [None if weight != weight else weight for weight in column]
+            values.append(column)
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+_index = LivePostIndex()
+
+
+def get_index() -> LivePostIndex:
+    return _index
+
+
+def build():
+    """Builds this process's index; call once at startup."""
+    _index.build()
+
+
+def _posts(selected: dict, columns: tuple) -> list:
+    """Rows for the selected posts in their order; columns not in memory are read by primary key."""
+    columns = tuple(columns) if 'id' in columns else ('id',) + tuple(columns)
+    if set(columns) <= set(INDEX_COLUMNS):
+        return _index.rows(selected, columns)
+    ids = selected['id'].tolist()
+    posts = {}
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        for post in db.get_waste_posts(columns=columns, ids=ids[start:start + ID_CHUNK_SIZE]):
+            posts[post['id']] = post
+    # A post claimed since the refresh is skipped
+    return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def get_waste_posts(filters: list = None, columns: tuple = db.POST_LIST_COLUMNS, bbox: tuple = None,
+                    after_id: int = None, since=None, limit: int = None) -> list:
+    """
+    `db.get_waste_posts` answered from the index (newest first by id). A
+    `since` timestamp and filters on tags without a bit go to SQLite instead,
+    as do unfiltered pages of columns the index lacks, which SQLite reads
+    straight off its created_at index.
+    """
+    full_rows = not set(columns) <= set(INDEX_COLUMNS)
+    if isinstance(since, str) or not _index.covers(filters) or (full_rows and not filters and not bbox):
+        return db.get_waste_posts(filters=filters, columns=columns, bbox=bbox, after_id=after_id, since=since, limit=limit)
+    _index.refresh()
+    with INDEX_QUERY_SECONDS.time(query="get_waste_posts"):
+        selected = _index.select(filters=filters, bbox=bbox, after_id=after_id, since_id=since, limit=limit)
+        return _posts(selected, columns)
+
+
+def get_nearby_posts(lat: float, lon: float, radius_m: float, limit: int = 50, filters: list = None,
+                     columns: tuple = db.POST_LIST_COLUMNS) -> list:
+    """`db.get_nearby_posts` answered from the index; each post gets a `distance_m` key."""
+    if not _index.covers(filters):
+        return db.get_nearby_posts(lat, lon, radius_m, limit=limit, filters=filters, columns=columns)
+    _index.refresh()
+    with INDEX_QUERY_SECONDS.time(query="get_nearby_posts"):
+        selected, distances = _index.nearby(lat, lon, radius_m, limit=limit, filters=filters)
+        posts = _posts(selected, columns)
+        distance_by_id = dict(zip(selected['id'].tolist(), distances.tolist()))
+        for post in posts:
+            post['distance_m'] = distance_by_id[post['id']]
+        return posts
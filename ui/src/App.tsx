@@ -1,5 +1,5 @@
-import { useState, useEffect } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, useMap } from 'react-leaflet';
+import { useState, useEffect, useCallback } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, useMap, useMapEvents } from 'react-leaflet';
 import L from 'leaflet'; // Import Leaflet library
 import 'leaflet/dist/leaflet.css'; // Import Leaflet CSS
 import { Leaf, Camera, Egg, Shield, Sparkles, TrendingUp, ChevronRight, MessageCircle, Navigation } from 'lucide-react';
@@ -223,10 +223,31 @@ interface WastePost {
   lat: number;
   lon: number;
   created_at: string;
-  // image_blob: string; // Not directly used on map
+  image_hash: string | null; // Content hash; thumbnail served from /images/{hash}/thumb
   // ai_analysis: string; // Not directly used on map
 }
 
+// Server-side aggregate of all posts in one grid cell (GET /waste_posts/clusters)
+interface WasteCluster {
+  cell_x: number;
+  cell_y: number;
+  level: number;
+  count: number;
+  total_weight: number;
+  dominant_category: string;
+  lat: number;
+  lon: number;
+  bbox: [number, number, number, number]; // min_lon, min_lat, max_lon, max_lat
+}
+
+// Above this zoom the API returns individual posts instead of clusters (db.CLUSTER_MAX_ZOOM)
+const CLUSTER_MAX_ZOOM = 14;
+
+interface Viewport {
+  bbox: string;
+  zoom: number;
+}
+
 // Helper function for suitability emojis (replicated from main.py)
 function getSuitabilityEmojis(tagsString: string): string {
   const emojis: string[] = [];
@@ -282,42 +303,95 @@ function getMarkerIcon(post: WastePost) {
   return redIcon;
 }
 
-// Map component with dynamic centering
-function MapUpdater({ posts }: { posts: WastePost[] }) {
-  const map = useMap();
+// Reports the visible map area (bbox as "min_lon,min_lat,max_lon,max_lat") and zoom on load and after every pan/zoom
+function ViewportWatcher({ onViewportChange }: { onViewportChange: (viewport: Viewport) => void }) {
+  const map = useMapEvents({
+    moveend: () => onViewportChange({ bbox: map.getBounds().toBBoxString(), zoom: map.getZoom() }),
+  });
 
   useEffect(() => {
-    if (posts.length > 0) {
-      const latLngs = posts.map(post => [post.lat, post.lon]);
-      // @ts-ignore
-      const bounds = L.latLngBounds(latLngs);
-      map.fitBounds(bounds, { padding: [50, 50] }); // Add some padding
-    } else {
-      map.setView([-6.2088, 106.8456], 11); // Default Jakarta
-    }
-  }, [posts, map]);
+    onViewportChange({ bbox: map.getBounds().toBBoxString(), zoom: map.getZoom() });
+  }, [map, onViewportChange]);
 
   return null;
 }
 
+const createClusterIcon = (count: number) => {
+  const size = count < 10 ? 34 : count < 100 ? 42 : 52;
+  return L.divIcon({
+    className: 'custom-div-icon',
+    html: `
+      <div style="
+        background-color: rgba(16, 185, 129, 0.85);
+        width: ${size}px;
+        height: ${size}px;
+        border-radius: 50%;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        color: white;
+        font-size: 13px;
+        font-weight: bold;
+        border: 3px solid white;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.2);
+      ">${count.toLocaleString('id-ID')}</div>`,
+    iconSize: [size, size],
+    iconAnchor: [size / 2, size / 2],
+  });
+};
+
+// One server-side cluster; clicking it zooms into its cell
+function ClusterMarker({ cluster }: { cluster: WasteCluster }) {
+  const map = useMap();
+  const [minLon, minLat, maxLon, maxLat] = cluster.bbox;
+
+  return (
+    <Marker
+      position={[cluster.lat, cluster.lon]}
+      icon={createClusterIcon(cluster.count)}
+      title={`${cluster.count} postingan • ${cluster.total_weight.toFixed(1)} kg • ${cluster.dominant_category}`}
+      eventHandlers={{ click: () => map.fitBounds([[minLat, minLon], [maxLat, maxLon]]) }}
+    />
+  );
+}
+
 
 // WasteMapPreview Component - this is the main one to replace
 function WasteMapPreview() {
   const [wastePosts, setWastePosts] = useState<WastePost[]>([]);
+  const [clusters, setClusters] = useState<WasteCluster[]>([]);
+  const [viewport, setViewport] = useState<Viewport | null>(null);
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
+  const handleViewportChange = useCallback((newViewport: Viewport) => setViewport(newViewport), []);
 
   useEffect(() => {
+    if (!viewport) return;
+
+    const useClusters = viewport.zoom <= CLUSTER_MAX_ZOOM;
+
     const fetchWastePosts = async () => {
       try {
         setLoading(true);
-        // Assuming your FastAPI runs on port 8000
-        const response = await fetch('http://localhost:8000/waste_posts');
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
+        // Assuming your FastAPI runs on port 8000. Only the viewport is requested; zoomed out, as clusters.
+        if (useClusters) {
+          const response = await fetch(`http://localhost:8000/waste_posts/clusters?z=${viewport.zoom}&bbox=${viewport.bbox}`);
+          if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+          }
+          const data: WasteCluster[] = await response.json();
+          setClusters(data);
+          setWastePosts([]);
+        } else {
+          const response = await fetch(`http://localhost:8000/waste_posts?bbox=${viewport.bbox}`);
+          if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+          }
+          const data: WastePost[] = await response.json();
+          setWastePosts(data);
+          setClusters([]);
         }
-        const data: WastePost[] = await response.json();
-        setWastePosts(data);
+        setError(null);
       } catch (err) {
         setError("Failed to fetch waste posts. Please ensure the backend API is running (e.g., uvicorn api:app --reload --port 8000).");
         console.error(err);
@@ -327,36 +401,36 @@ function WasteMapPreview() {
     };
 
     fetchWastePosts();
-    // Refresh data every 30 seconds
-    const interval = setInterval(fetchWastePosts, 30000);
-    return () => clearInterval(interval);
-  }, []);
+
+    // New posts in the viewport are pushed by the server (Server-Sent Events) instead of polling.
+    // EventSource reconnects by itself and the server replays missed posts via Last-Event-ID.
+    const stream = new EventSource(`http://localhost:8000/waste_posts/stream?bbox=${viewport.bbox}`);
+    let clusterRefresh: ReturnType<typeof setTimeout> | null = null;
+    stream.addEventListener('post', (event) => {
+      if (useClusters) {
+        // Cluster counts changed; refetch at most once every few seconds
+        if (!clusterRefresh) {
+          clusterRefresh = setTimeout(() => {
+            clusterRefresh = null;
+            fetchWastePosts();
+          }, 3000);
+        }
+        return;
+      }
+      const post: WastePost = JSON.parse((event as MessageEvent).data);
+      setWastePosts(prev => (prev.some(p => p.id === post.id) ? prev : [post, ...prev]));
+    });
+
+    return () => {
+      stream.close();
+      if (clusterRefresh) clearTimeout(clusterRefresh);
+    };
+  }, [viewport]);
 
   // Default center and zoom if no posts or still loading
   const defaultCenter: [number, number] = [-6.2088, 106.8456]; // Jakarta
   const defaultZoom = 11;
 
-  if (loading) {
-    return (
-      <section className="py-20 px-4 sm:px-6 lg:px-8 bg-gradient-to-b from-stone-50 to-emerald-50">
-        <div className="max-w-7xl mx-auto text-center">
-          <p className="text-lg text-stone-600">Loading map data...</p>
-        </div>
-      </section>
-    );
-  }
-
-  if (error) {
-    return (
-      <section className="py-20 px-4 sm:px-6 lg:px-8 bg-gradient-to-b from-stone-50 to-emerald-50">
-        <div className="max-w-7xl mx-auto text-center">
-          <p className="text-lg text-red-600">{error}</p>
-        </div>
-      </section>
-    );
-  }
-
-
   return (
     <section className="py-20 px-4 sm:px-6 lg:px-8 bg-gradient-to-b from-stone-50 to-emerald-50">
       <div className="max-w-7xl mx-auto">
@@ -370,6 +444,11 @@ function WasteMapPreview() {
         </div>
 
         <div className="relative bg-white rounded-3xl p-2 shadow-2xl overflow-hidden aspect-video"> {/* Removed p-8, added p-2, aspect-video for consistent sizing */}
+          {(loading || error) && (
+            <div className={`absolute top-4 left-1/2 -translate-x-1/2 z-[1000] bg-white/90 px-4 py-2 rounded-full shadow text-sm ${error ? 'text-red-600' : 'text-stone-600'}`}>
+              {error ?? 'Loading map data...'}
+            </div>
+          )}
           <MapContainer center={defaultCenter} zoom={defaultZoom} scrollWheelZoom={true} className="h-full w-full rounded-2xl z-0">
             <TileLayer
               attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
@@ -390,6 +469,14 @@ function WasteMapPreview() {
                       <div className="bg-emerald-100 text-emerald-800 px-2 py-1 rounded text-xs font-semibold mb-1 inline-block">
                         {post.provider_type}
                       </div>
+                      {post.image_hash && (
+                        <img
+                          src={`http://localhost:8000/images/${post.image_hash}/thumb`}
+                          alt={post.waste_category}
+                          loading="lazy"
+                          className="w-full h-28 object-cover rounded mb-1"
+                        />
+                      )}
                       <h4 className="font-bold text-stone-800 text-base mb-1">{post.waste_category}</h4>
                       <p className="text-stone-700 mb-1">
                         Berat: <span className="font-bold">{post.weight_est.toFixed(1)} kg</span>
@@ -418,7 +505,10 @@ function WasteMapPreview() {
                 </Marker>
               );
             })}
-            <MapUpdater posts={wastePosts} />
+            {clusters.map(cluster => (
+              <ClusterMarker key={`${cluster.level}/${cluster.cell_x}/${cluster.cell_y}`} cluster={cluster} />
+            ))}
+            <ViewportWatcher onViewportChange={handleViewportChange} />
           </MapContainer>
         </div>
 
@@ -0,0 +1,115 @@
+import gzip
+import json
+
+# Optional accelerators: orjson for JSON encoding, brotli for compression and
+# msgpack for the binary format. Without them the API falls back to the
+# standard library (same JSON output, gzip only) and refuses MessagePack.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+# {"count": n, "columns": {field: [values]}, "dictionaries": {field: [distinct values]}};
+# a dictionary-encoded column holds indexes into its dictionary instead of values
+COLUMNAR_MEDIA_TYPE = "application/vnd.ecocycle.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# `format=` query values, for clients that cannot set Accept
+FORMATS = {
+    'json': JSON_MEDIA_TYPE,
+    'columnar': COLUMNAR_MEDIA_TYPE,
+    'msgpack': MSGPACK_MEDIA_TYPE,
+}
+_MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK_MEDIA_TYPE}
+
+# Low-cardinality post fields sent once per distinct value in the compact formats
+DICTIONARY_FIELDS = ('provider_type', 'waste_category', 'suitable_for', 'status')
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+# Brotli quality 4 makes smaller post listings than gzip -6, in less time
+BROTLI_QUALITY = 4
+
+
+class NotAcceptable(ValueError):
+    """None of the media types the client accepts can be produced."""
+
+
+def encode_json(data) -> bytes:
+    """Compact UTF-8 JSON, the same bytes with or without orjson."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate(accept: str = None, requested_format: str = None) -> str:
+    """
+    Picks the response media type from a `format=` value or else the Accept
+    header (first supported type in the client's order; JSON by default).
+    Raises NotAcceptable for an unknown format or MessagePack without msgpack.
+    """
+    if requested_format:
+        if requested_format not in FORMATS:
+            raise NotAcceptable(f"format must be one of {', '.join(FORMATS)}")
+        media_type = FORMATS[requested_format]
+    else:
+        media_type = JSON_MEDIA_TYPE
+        for candidate in (accept or "").split(","):
+            candidate = candidate.partition(";")[0].strip().lower()
+            candidate = _MEDIA_TYPE_ALIASES.get(candidate, candidate)
+            if candidate in FORMATS.values():
+                media_type = candidate
+                break
+    if media_type == MSGPACK_MEDIA_TYPE and msgpack is None:
+        raise NotAcceptable("MessagePack is not available on this server")
+    return media_type
+
+
+def to_columns(rows: list, fields: tuple) -> dict:
+    """Transposes row dicts into one array per field, dictionary-encoding DICTIONARY_FIELDS."""
+    columns, dictionaries = {}, {}
+    for field in fields:
+        values = [row[field] for row in rows]
+        if field in DICTIONARY_FIELDS:
+            codes = {}
+            columns[field] = [codes.setdefault(value, len(codes)) for value in values]
+            dictionaries[field] = list(codes)
+        else:
+            columns[field] = values
+    return {'count': len(rows), 'columns': columns, 'dictionaries': dictionaries}
+
+
+def encode_rows(rows: list, fields: tuple, media_type: str) -> bytes:
+    """Encodes query rows in a media type returned by `negotiate`."""
+    if media_type == JSON_MEDIA_TYPE:
+        return encode_json(rows)
+    table = to_columns(rows, fields)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(table)
+    return encode_json(table)
+
+
+def compress(body: bytes, accept_encoding: str = None) -> tuple:
+    """
+    Compresses a response body with the best encoding the client accepts
+    (brotli, then gzip). Returns `(body, content_encoding)`, the encoding
+    being None when the body is sent as is.
+    """
+    if len(body) < COMPRESS_MIN_BYTES or not accept_encoding:
+        return body, None
+    accepted = {coding.partition(";")[0].strip().lower() for coding in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None